@@ -3,6 +3,11 @@ from services.auth import login
 
 st.set_page_config(page_title="DGR Suite", page_icon="⚡", layout="wide")
 
+# Nightly pre-computation of drafts (one background thread per server process)
+if st.secrets.get("SCHEDULER_ENABLED", False):
+    from services.scheduler import start_in_background
+    start_in_background()
+
 if "_authed" not in st.session_state:
     st.session_state["_authed"] = False
 
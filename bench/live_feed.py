@@ -0,0 +1,39 @@
+# bench/live_feed.py
+# Replays today's synthetic SCADA documents into a plant's collection in real
+# time, to watch util.live / the Report Builder "Live today" panel update.
+#
+#   mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017 &
+#   mongosh --eval 'rs.initiate()'
+#   export DGR_MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0&directConnection=true"
+#   python -m bench.live_feed TMD --every 1 &
+#   python -m util.live TMD
+import argparse
+import time
+from datetime import date, datetime
+
+from bench.synthetic import generate_docs
+from util.profiles import get_profile
+from util.ts_normalize import normalize_doc
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Insert today's synthetic SCADA rows in real time.")
+    parser.add_argument("customer")
+    parser.add_argument("--interval", type=int, default=5, help="Sampling minutes of the synthetic data")
+    parser.add_argument("--every", type=float, default=1.0, help="Seconds between inserts")
+    parser.add_argument("--string-ratio", type=float, default=0.0, help="Share of string timestamps")
+    args = parser.parse_args(argv)
+
+    from util.data_loader import mongo, _collection_for
+    coll = mongo()[_collection_for(args.customer)]
+    tz = get_profile(args.customer)["timezone"]
+    now = datetime.now()
+    for doc in generate_docs(args.customer, date.today(), date.today(), args.interval, args.string_ratio):
+        ts = doc["timestamp"]
+        if (datetime.strptime(ts, "%Y-%m-%d %H:%M") if isinstance(ts, str) else ts) > now:
+            break
+        coll.insert_one(normalize_doc(doc, tz))
+        print(f"inserted {ts}")
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
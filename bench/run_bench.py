@@ -0,0 +1,179 @@
+# bench/run_bench.py
+# End-to-end DGR benchmark on synthetic SCADA data: per-stage latency and peak memory
+# for 1-day, MTD and YTD windows at several sampling intervals.
+#
+#   python -m bench.run_bench --mongo-uri mongodb://localhost:27017      # local mongod (full pipeline)
+#                                                                         # into the scratch db "dgr_bench"
+#   python -m bench.run_bench --plants TMD PGCIL --intervals 5 15        # mongomock (no server needed)
+#
+# mongomock cannot run the loader's aggregation pipeline ($type / $regexMatch ...), so in that
+# mode the "load" stage is a plain find() + in-Python normalization instead of load_period().
+#
+# Server runs write only to --database (never the app's database) and use a temporary
+# CACHE_DIR; collections that already exist there are left alone and the run stops.
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from bench.synthetic import generate_docs, load_into, loader_frame, daily_frame
+from util.profiles import get_profile
+from util.ts_normalize import backfill
+
+DEFAULT_PLANTS = ["TMD", "PGCIL", "BEL1", "Vinathi_3"]
+BENCH_DATABASE = "dgr_bench"
+APP_DATABASE = "scada_db"
+WINDOWS = ("day", "mtd", "ytd")
+
+def _window(name: str, data_day: date):
+    if name == "day":
+        return data_day, data_day
+    if name == "mtd":
+        return data_day.replace(day=1), data_day
+    return data_day.replace(month=1, day=1), data_day
+
+def _find_window(coll, start: date, end: date):
+    """mongomock stand-in for load_period(): find() + normalization, then the day window."""
+    df = loader_frame(coll.find({}, {"_id": 0}))
+    mask = (df["day"] >= start.isoformat()) & (df["day"] <= end.isoformat())
+    return df[mask].reset_index(drop=True)
+
+class StageTimer:
+    """Collects (stage, seconds, peak MB above the stage's starting point) for one case."""
+
+    def __init__(self, track_memory: bool):
+        self.track_memory = track_memory
+        self.rows = []
+
+    def run(self, stage, fn, *args, **kwargs):
+        base = 0
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        secs = time.perf_counter() - t0
+        # peak allocated above what was live when the stage started
+        peak = (tracemalloc.get_traced_memory()[1] - base) / 2**20 if self.track_memory else float("nan")
+        self.rows.append((stage, secs, peak))
+        return out
+
+def run_case(customer, interval, window, report_date, coll, use_server, track_memory):
+    from util.agg import clean_dataframe, get_daily_monthly_yearly_data, calculate_kpis
+    from services.excel_writer import render_report_bytes
+    from services.report import TEMPLATE_PATH, report_context, inverter_rows
+
+    data_day = report_date - timedelta(days=1)
+    start, end = _window(window, data_day)
+    timer = StageTimer(track_memory)
+
+    if use_server:
+        from util.data_loader import load_period
+        from util import disk_cache
+        from util.result_cache import RESULTS
+        disk_cache.invalidate(customer)
+        RESULTS.purge()
+        raw = timer.run("load_raw", load_period, customer, start, end)
+        disk_cache.invalidate(customer)
+        RESULTS.purge()
+        daily = timer.run("load_daily", load_period, customer, start, end, daily=True)
+    else:
+        raw = timer.run("load_raw", _find_window, coll, start, end)
+        daily = timer.run("load_daily", daily_frame, raw)
+
+    timer.run("clean_raw", clean_dataframe, raw.copy(), customer)
+    df_clean, inverter_cols, irradiation_col = timer.run("clean", clean_dataframe, daily.copy(), customer)
+    final_df, dg, mg, yg, _, _ = timer.run(
+        "aggregate", get_daily_monthly_yearly_data, df_clean, inverter_cols, report_date, irradiation_col, customer
+    )
+    total_daily, total_mtd, plf, total_ytd = timer.run("kpis", calculate_kpis, customer, dg, mg, yg)
+    rep = {"customer": customer, "data_day": data_day, "total_daily": total_daily,
+           "total_mtd": total_mtd, "total_ytd": total_ytd, "plf_percent": plf}
+    timer.run("excel", render_report_bytes, TEMPLATE_PATH, report_context(rep, {}), inverter_rows(final_df))
+
+    return [(customer, interval, window, len(raw), stage, secs, peak) for stage, secs, peak in timer.rows]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DGR pipeline on synthetic SCADA data.")
+    parser.add_argument("--plants", nargs="+", default=DEFAULT_PLANTS)
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 5, 15], help="Sampling minutes")
+    parser.add_argument("--windows", nargs="+", choices=WINDOWS, default=list(WINDOWS))
+    parser.add_argument("--date", help="Report date YYYY-MM-DD (default: today)")
+    parser.add_argument("--mongo-uri", help="Local mongod to load into (default: mongomock)")
+    parser.add_argument("--database", default=BENCH_DATABASE, help=f"Scratch database (default: {BENCH_DATABASE})")
+    parser.add_argument("--string-ratio", type=float, default=0.3, help="Share of string timestamps")
+    parser.add_argument("--normalized", action="store_true",
+                        help="Ingest with ts_utc + index (range-first query plan)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, no peak MB)")
+    parser.add_argument("--csv", help="Also write results to this CSV file")
+    args = parser.parse_args(argv)
+
+    report_date = date.fromisoformat(args.date) if args.date else date.today()
+    data_day = report_date - timedelta(days=1)
+    ytd_start = data_day.replace(month=1, day=1)
+
+    if args.database == APP_DATABASE:
+        parser.error(f"refusing to benchmark into the app database {APP_DATABASE!r}")
+
+    # the app modules read these at import time; mongomock runs never connect to the URI
+    os.environ["DGR_MONGO_URI"] = args.mongo_uri or os.environ.get("DGR_MONGO_URI", "mongodb://localhost:27017")
+    os.environ["DGR_DATABASE"] = args.database
+    cache_dir = os.environ["DGR_CACHE_DIR"] = tempfile.mkdtemp(prefix="dgr_bench_cache_")
+    try:
+        run_all(args, report_date, data_day, ytd_start)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def run_all(args, report_date, data_day, ytd_start):
+    if args.mongo_uri:
+        from util.data_loader import mongo, _collection_for
+        db = mongo()
+        if db.name != args.database:  # util.data_loader imported before DGR_DATABASE was set
+            sys.exit(f"loader points at {db.name!r}, expected {args.database!r}")
+    else:
+        import mongomock
+        db = mongomock.MongoClient()[args.database]
+        _collection_for = lambda c: c.lower() + "_data"
+
+    track_memory = not args.no_memory
+    if track_memory:
+        tracemalloc.start()
+
+    results = []
+    for customer in args.plants:
+        for interval in args.intervals:
+            coll = db[_collection_for(customer)]
+            if coll.name in db.list_collection_names():
+                sys.exit(f"{db.name}.{coll.name} already exists; not touching it (drop it yourself or use --database)")
+            try:
+                t0 = time.perf_counter()
+                tz = get_profile(customer)["timezone"] if args.normalized else None
+                n = load_into(coll, generate_docs(customer, ytd_start, data_day, interval, args.string_ratio), tz=tz)
+                if args.normalized:
+                    backfill(coll, tz)
+                print(f"# {customer} @ {interval} min: {n} docs generated in {time.perf_counter() - t0:.1f}s",
+                      file=sys.stderr)
+                for window in args.windows:
+                    results += run_case(customer, interval, window, report_date, coll,
+                                        bool(args.mongo_uri), track_memory)
+            finally:
+                coll.drop()  # created above by this run
+
+    header = ("plant", "interval_min", "window", "raw_rows", "stage", "seconds", "peak_mb")
+    print(f"{'plant':<10}{'int':>4} {'window':<6}{'rows':>9}  {'stage':<11}{'seconds':>9}{'peak MB':>9}")
+    for plant, interval, window, rows, stage, secs, peak in results:
+        print(f"{plant:<10}{interval:>4} {window:<6}{rows:>9}  {stage:<11}{secs:>9.3f}{peak:>9.1f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench/synthetic.py
+# Synthetic SCADA documents shaped like each plant's collection:
+#   TMD        T1_CIS* / T2_INV* *_GenPowerToday counters
+#   PGCIL      Total_Daily_Generation (MWh, scaled x1000 by the profile)
+#   BEL1/BEL2  Meter_Generation
+#   others     Daily_Generation_INV1..N
+# plus a cumulative Irradiation column and a mix of BSON-date / 'YYYY-MM-DD HH:MM' timestamps.
+import math
+import random
+from datetime import datetime, timedelta, date
+import pandas as pd
+from util.profiles import get_profile
+from util.ts_normalize import normalize_doc
+
+IRRADIATION_COL = "GHI_Irradiation"
+SUNRISE_H, SUNSET_H = 6.0, 18.5
+CUF = 0.18           # typical daily capacity utilisation
+PEAK_IRRADIATION = 5.5  # kWh/m2 on a clear day
+
+def plant_columns(customer: str) -> list:
+    """Generation columns a plant's SCADA documents carry."""
+    p = get_profile(customer)
+    if p["generation_columns"]:
+        return list(p["generation_columns"])
+    if p["layout"] == "single":
+        return ["Meter_Generation"]
+    return [f"Daily_Generation_INV{i}" for i in range(1, max(p["inverters"], 1) + 1)]
+
+def _day_fraction(hour: float) -> float:
+    """Share of the day's energy produced by `hour` (smooth sunrise -> sunset curve)."""
+    if hour <= SUNRISE_H:
+        return 0.0
+    if hour >= SUNSET_H:
+        return 1.0
+    return (1 - math.cos(math.pi * (hour - SUNRISE_H) / (SUNSET_H - SUNRISE_H))) / 2
+
+def generate_docs(customer: str, start: date, end: date, interval_minutes: int = 5,
+                  string_ratio: float = 0.3, seed: int = 0):
+    """
+    Yield one document per `interval_minutes` for every day in [start, end].
+    Counters are cumulative per day and reset at midnight, like *_GenPowerToday.
+    `string_ratio` of the documents use the legacy 'YYYY-MM-DD HH:MM' timestamp.
+    """
+    rnd = random.Random(seed)
+    p = get_profile(customer)
+    cols = plant_columns(customer)
+    per_col_kw = (p["plf_base"] or 3.0) * (p["inverters"] or 1) / len(cols)
+    daily_kwh = per_col_kw * 24 * CUF / p["scale"]
+
+    day = start
+    while day <= end:
+        weather = rnd.uniform(0.55, 1.1)
+        targets = [daily_kwh * weather * rnd.uniform(0.9, 1.05) for _ in cols]
+        irr_target = PEAK_IRRADIATION * weather
+        t = datetime(day.year, day.month, day.day)
+        for _ in range(24 * 60 // interval_minutes):
+            f = _day_fraction(t.hour + t.minute / 60)
+            doc = {
+                "timestamp": t.strftime("%Y-%m-%d %H:%M") if rnd.random() < string_ratio else t,
+                IRRADIATION_COL: round(irr_target * f, 4),
+            }
+            for c, target in zip(cols, targets):
+                doc[c] = round(target * f, 3)
+            yield doc
+            t += timedelta(minutes=interval_minutes)
+        day += timedelta(days=1)
+
+def load_into(coll, docs, batch_size: int = 5000, tz: str = None) -> int:
+    """
+    insert_many in batches (works with pymongo and mongomock collections).
+    tz given: apply the ingest hook so documents carry the indexed `ts_utc`.
+    """
+    batch, n = [], 0
+    for d in docs:
+        batch.append(normalize_doc(d, tz) if tz else d)
+        if len(batch) >= batch_size:
+            coll.insert_many(batch, ordered=False)
+            n += len(batch)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+        n += len(batch)
+    return n
+
+def loader_frame(docs) -> pd.DataFrame:
+    """
+    What fetch_cleaned_data() returns for these documents (normalized `ts` + `day`),
+    for stores that cannot run the aggregation pipeline (e.g. mongomock).
+    """
+    df = pd.DataFrame(list(docs))
+    if df.empty:
+        return df
+    ts = df["timestamp"].map(lambda v: datetime.strptime(v, "%Y-%m-%d %H:%M") if isinstance(v, str) else v)
+    df["ts"] = pd.to_datetime(ts)
+    df["day"] = df["ts"].dt.strftime("%Y-%m-%d")
+    return df.sort_values("ts").reset_index(drop=True)
+
+def daily_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """Per-day max of every counter, i.e. what load_period(daily=True) returns."""
+    value_cols = [c for c in raw.columns if c not in ("_id", "timestamp", "ts", "ts_utc", "day")]
+    out = raw.groupby("day", sort=True).agg({**{c: "max" for c in value_cols}, "ts": "max"})
+    out["rows"] = raw.groupby("day", sort=True).size()
+    return out.reset_index()
@@ -1,42 +1,97 @@
-import streamlit as st
-from datetime import date
-from util.data_loader import mongo, list_customers
-
-st.set_page_config(page_title="O&M Inputs", page_icon="🛠️", layout="wide")
-
-if st.session_state.get("role") not in ["O&M", "Admin"]:
-    st.error("Access Denied")
-    st.stop()
-
-st.title("🛠️ O&M Daily Inputs Form")
-customer = st.selectbox("Customer", list_customers())
-day = st.date_input("Data Day", value=date.today())
-
-c1, c2 = st.columns(2)
-breakdown = c1.number_input("Breakdown Hours", min_value=0.0, step=0.5)
-weather = c2.text_input("Weather Condition")
-
-c3, c4 = st.columns(2)
-gen_hours = c3.number_input("Generation Hours", min_value=0.0, step=0.5)
-op_hours = c4.number_input("Operating Hours", min_value=0.0, step=0.5)
-
-notes = st.text_area("Remarks (Optional)")
-
-if st.button("Save"):
-    db = mongo()
-    coll = db["dgr_manual_inputs"]
-    coll.update_one(
-        {"customer": customer, "day": str(day)},
-        {"$set": {
-            "customer": customer,
-            "day": str(day),
-            "breakdown_hours": breakdown,
-            "weather": weather,
-            "generation_hours": gen_hours,
-            "operating_hours": op_hours,
-            "notes": notes,
-            "user": st.session_state.get("username")
-        }},
-        upsert=True
-    )
-    st.success("✅ Saved successfully")
+import streamlit as st
+import pandas as pd
+from datetime import date, timedelta
+from util.data_loader import mongo, list_customers
+from services.manual_inputs import COLLECTION, GRID_COLUMNS, ensure_index, prefetch, validate, changed, save
+
+st.set_page_config(page_title="O&M Inputs", page_icon="🛠️", layout="wide")
+
+if st.session_state.get("role") not in ["O&M", "Admin"]:
+    st.error("Access Denied")
+    st.stop()
+
+st.title("🛠️ O&M Daily Inputs Form")
+coll = mongo()[COLLECTION]
+duplicates = ensure_index(coll)
+if duplicates:
+    st.warning(
+        f"{len(duplicates)} plant/day combination(s) are stored more than once, so the unique index "
+        "could not be built. Saving still works. An admin should review them and run "
+        "`python -m services.manual_inputs dedupe --apply`."
+    )
+    with st.expander("Duplicated rows"):
+        st.dataframe(pd.DataFrame([{"customer": d["customer"], "day": d["day"], "rows": len(d["ids"])}
+                                   for d in duplicates]), use_container_width=True)
+customers = list_customers()
+user = st.session_state.get("username")
+
+def _report(records, errors, result):
+    for e in errors:
+        st.error(e)
+    if result is not None:
+        st.success(f"✅ Saved {len(records)} row(s) "
+                   f"({result.upserted_count} new, {result.modified_count} updated)")
+    elif not errors:
+        st.info("Nothing changed")
+
+single, grid, upload = st.tabs(["Single day", "Grid (many plants / days)", "CSV upload"])
+
+with single:
+    customer = st.selectbox("Customer", customers)
+    day = st.date_input("Data Day", value=date.today())
+
+    c1, c2 = st.columns(2)
+    breakdown = c1.number_input("Breakdown Hours", min_value=0.0, step=0.5)
+    weather = c2.text_input("Weather Condition")
+
+    c3, c4 = st.columns(2)
+    gen_hours = c3.number_input("Generation Hours", min_value=0.0, step=0.5)
+    op_hours = c4.number_input("Operating Hours", min_value=0.0, step=0.5)
+
+    notes = st.text_area("Remarks (Optional)")
+
+    if st.button("Save"):
+        records, errors = validate(pd.DataFrame([{
+            "customer": customer,
+            "day": str(day),
+            "breakdown_hours": breakdown,
+            "weather": weather,
+            "generation_hours": gen_hours,
+            "operating_hours": op_hours,
+            "notes": notes,
+        }]), customers)
+        _report(records, errors, None if errors else save(coll, records, user))
+
+with grid:
+    g1, g2, g3 = st.columns([2, 1, 1])
+    plants = g1.multiselect("Plants", customers, default=customers)
+    start = g2.date_input("From", value=date.today() - timedelta(days=6), key="grid_from")
+    end = g3.date_input("To", value=date.today(), key="grid_to")
+
+    if plants and start <= end:
+        # one query for the visible window; only rows that differ from it are written
+        existing = prefetch(coll, plants, start, end)
+        edited = st.data_editor(
+            existing, key=f"grid_{start}_{end}_{len(plants)}", hide_index=True,
+            use_container_width=True, disabled=["customer", "day"],
+        )
+        if st.button("Save all", key="grid_save"):
+            records, errors = validate(edited, customers)
+            records = changed(records, existing)
+            _report(records, errors, None if errors else save(coll, records, user))
+    else:
+        st.info("Pick at least one plant and a valid date range")
+
+with upload:
+    st.caption("Columns: " + ", ".join(GRID_COLUMNS) + " (day as YYYY-MM-DD)")
+    st.download_button("Download template", pd.DataFrame(columns=GRID_COLUMNS).to_csv(index=False),
+                       "om_inputs_template.csv", mime="text/csv")
+    f = st.file_uploader("CSV file", type=["csv"])
+    if f is not None:
+        df = pd.read_csv(f, dtype={"customer": str, "day": str, "weather": str, "notes": str})
+        records, errors = validate(df, customers)
+        st.dataframe(pd.DataFrame(records), use_container_width=True)
+        for e in errors:
+            st.error(e)
+        if records and not errors and st.button("Import", key="csv_save"):
+            _report(records, [], save(coll, records, user))
@@ -2,9 +2,18 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from util.data_loader import list_customers, load_period, mongo
-from util.agg import clean_dataframe, get_daily_monthly_yearly_data, calculate_kpis
-from services.excel_writer import write_report_from_template
+from util.data_loader import list_customers, mongo
+from util import metrics
+from util.mongo_pool import pool_stats, ping
+from util.live import get_live
+from util.result_cache import RESULTS
+from util.singleflight import FLIGHTS
+from services.artifacts import render_artifact
+from services.scheduler import recent_runs
+from services.report import (
+    TEMPLATE_PATH, EXPORT_DIR, report_window, compute_report, report_context, intraday_chart,
+    inverter_rows, export_path, export_filename, draft_update,
+)
 import os
 
 st.set_page_config(page_title="DGR Builder", page_icon="📊", layout="wide")
@@ -16,31 +25,39 @@ if st.session_state.get("role") not in ["O&M", "CRM", "Admin"]:
 st.title("📊 Generate Daily Generation Report")
 
 customer = st.selectbox("Customer", list_customers())
-report_date = st.date_input("Report Date", value=date.today())
-data_day = (pd.to_datetime(report_date) - pd.Timedelta(days=1)).date()
 
-month_start = data_day.replace(day=1)
-ytd_start = data_day.replace(month=1, day=1)
+# Live running totals for today (in-memory, fed by a change stream / ts_utc polling)
+LIVE_REFRESH = float(st.secrets.get("LIVE_REFRESH_SECONDS", 5))
+
+@st.fragment(run_every=LIVE_REFRESH)
+def live_today(customer):
+    snap = get_live(customer).snapshot()
+    l1, l2, l3 = st.columns(3)
+    l1.metric(f"Today so far ({snap['day']}, kWh)", f"{snap['total_kwh']:.2f}")
+    l2.metric("Irradiation", "-" if snap["irradiation"] is None else f"{snap['irradiation']:.2f}")
+    l3.metric("Samples today", snap["rows"])
+    st.caption(f"Last sample (UTC): {snap['last_ts']} · source: {snap['mode'] or 'starting'}")
+    if snap["error"]:
+        st.warning(snap["error"])
+    if snap["generation"]:
+        st.bar_chart(pd.Series(snap["generation"], name="kWh"))
+
+if st.toggle("🔴 Live today"):
+    live_today(customer)
+report_date = st.date_input("Report Date", value=date.today())
+data_day, month_start, ytd_start = report_window(report_date)
 st.caption(f"Data day: **{data_day}** · Month start: **{month_start}** · YTD start: **{ytd_start}**")
 
 with st.spinner("Loading data..."):
-    # Load YTD window (covers daily & MTD windows too)
-    df_ytd_full = load_period(customer, ytd_start, data_day)
+    # Load YTD window (reduced to one row per day in Mongo), clean, Daily / MTD / YTD, KPIs
+    rep = compute_report(customer, report_date)
 
-if df_ytd_full.empty:
+if rep is None:
     st.warning("No data found for the selected customer/day.")
     st.stop()
 
-# Clean + detect using your logic
-df_clean, inverter_cols, irradiation_col = clean_dataframe(df_ytd_full.copy(), customer)
-
-# Compute Daily / MTD / YTD using your core
-final_df, daily_gen, monthly_gen, ytd_gen, daily_irr, monthly_avg_irr = get_daily_monthly_yearly_data(
-    df_clean, inverter_cols, report_date, irradiation_col, customer
-)
-
-# KPIs (daily, monthly, PLF, yearly)
-total_daily, total_mtd, plf_percent, total_ytd = calculate_kpis(customer, daily_gen, monthly_gen, ytd_gen)
+final_df = rep["final_df"]
+total_daily, total_mtd, total_ytd, plf_percent = rep["total_daily"], rep["total_mtd"], rep["total_ytd"], rep["plf_percent"]
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Daily (kWh)", f"{total_daily:.2f}")
@@ -51,56 +68,92 @@ c4.metric("PLF (%)", f"{plf_percent:.2f}")
 st.subheader("Inverter-wise Summary")
 st.dataframe(final_df, use_container_width=True)
 
+# Intraday curves (raw rows of the data day, downsampled server-side)
+with st.expander("📉 Intraday generation & irradiation"):
+    i1, i2 = st.columns(2)
+    points = i1.select_slider("Points per series", [200, 500, 1000, 2000], value=500)
+    method = i2.radio("Downsampling", ["lttb", "minmax"], horizontal=True)
+    curves = intraday_chart(customer, data_day, points, method)
+    if curves is None:
+        st.info("No intraday rows for this day.")
+    else:
+        st.line_chart(curves["generation"], x="ts", y="value", color="series")
+        if curves["irradiation"] is not None:
+            st.line_chart(curves["irradiation"], x="ts", y="value", color="series")
+
 # Pull O&M manual inputs
 omi = mongo()["dgr_manual_inputs"].find_one({"customer": customer, "day": str(data_day)}) or {}
 
-# Excel export via template (already has total_ytd mapping)
-out_dir = "exports"
-os.makedirs(out_dir, exist_ok=True)
-file_path = os.path.join(out_dir, f"{customer}_DGR_{data_day}.xlsx")
-
-ctx = {
-    "date": str(data_day),
-    "customer": customer,
-    "total_daily": float(total_daily),
-    "total_mtd": float(total_mtd),
-    "total_ytd": float(total_ytd),
-    "plf_percent": f"{plf_percent:.2f}%",
-    "breakdown_hours": omi.get("breakdown_hours", 0),
-    "weather": omi.get("weather", ""),
-    "generation_hours": omi.get("generation_hours", 0),
-    "operating_hours": omi.get("operating_hours", 0),
-}
-
-inv_rows = list(zip(
-    final_df["Inverter"],
-    final_df["Daily Generation (kWh)"],
-    final_df["Monthly Generation (kWh)"],
-))
+# Excel export via template, stored once per distinct content in the artifact store
+# (disk copy only if EXPORT_TO_DISK is set)
+save_to_disk = bool(st.secrets.get("EXPORT_TO_DISK", False))
+file_name = export_filename(customer, data_day)
+
+ctx = report_context(rep, omi)
+inv_rows = inverter_rows(final_df)
 
 colA, colB = st.columns(2)
 if colA.button("Generate Excel Report"):
-    out_file = write_report_from_template("data/Energy report template.xlsx", file_path, ctx, inv_rows)
-    st.success(f"✅ Excel exported: {out_file}")
-    with open(out_file, "rb") as f:
-        st.download_button("Download Report", f, os.path.basename(out_file))
+    _, xlsx = render_artifact(TEMPLATE_PATH, ctx, inv_rows, file_name=file_name)
+    if save_to_disk:
+        file_path = export_path(customer, data_day)
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(xlsx)
+        st.success(f"✅ Excel exported: {file_path}")
+    else:
+        st.success(f"✅ Excel ready: {file_name}")
+    st.download_button("Download Report", xlsx, file_name,
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 if colB.button("Save Draft for CRM"):
+    key, _ = render_artifact(TEMPLATE_PATH, ctx, inv_rows, file_name=file_name)
     db = mongo()
-    db["dgr_reports"].update_one(
-        {"customer": customer, "day": str(data_day)},
-        {"$set": {
-            "customer": customer,
-            "day": str(data_day),
-            "kpis": {
-                "daily": float(total_daily),
-                "mtd": float(total_mtd),
-                "ytd": float(total_ytd),
-                "plf": float(plf_percent)
-            },
-            "file_path": file_path,
-            "status": "draft"
-        }},
-        upsert=True
-    )
+    db["dgr_reports"].update_one(*draft_update(rep, key), upsert=True)
     st.success("💾 Draft saved")
+
+# Performance panel (admin only) + Prometheus textfile for the node exporter
+metrics.write_prometheus(st.secrets.get("METRICS_FILE", ""))
+if st.session_state.get("role") == "Admin":
+    with st.expander("⚙️ Performance (admin)"):
+        stages = metrics.stage_stats()
+        st.markdown("**Pipeline stages** (since process start)")
+        st.dataframe(pd.DataFrame.from_dict(stages, orient="index").sort_values("seconds", ascending=False)
+                     if stages else pd.DataFrame(), use_container_width=True)
+        st.markdown("**Mongo commands**")
+        cmds = metrics.COMMANDS.snapshot()
+        st.dataframe(pd.DataFrame.from_dict(cmds, orient="index") if cmds else pd.DataFrame(),
+                     use_container_width=True)
+        events = metrics.event_counts()
+        if events:
+            st.markdown("**Events**")
+            st.json(events)
+        st.markdown("**Connection pool**")
+        if ping(reconnect=False):
+            st.success("MongoDB reachable")
+        else:
+            st.error("MongoDB unreachable")
+            if st.button("Reconnect MongoDB"):
+                # swaps in a fresh pool; the old client is retired, not closed under its users
+                ping(reconnect=True)
+                st.rerun()
+        st.json(pool_stats())
+        explains = metrics.last_explains()
+        if explains:
+            st.markdown("**Last explain() per collection**")
+            st.json(explains, expanded=False)
+        st.markdown("**Result cache**")
+        st.json(RESULTS.stats())
+        st.markdown("**Coalesced loads**")
+        st.json(FLIGHTS.stats())
+        st.markdown("**Nightly pre-computation** (latest runs)")
+        runs = recent_runs(10)
+        st.dataframe(pd.DataFrame([{k: r.get(k) for k in ("data_day", "tz", "status", "catch_up",
+                                                           "duration_s", "drafts_written", "started_at")}
+                                   for r in runs]), use_container_width=True)
+        if st.button("Purge result cache"):
+            RESULTS.purge()
+            st.rerun()
+        if st.button("Reset metrics"):
+            metrics.reset()
+            st.rerun()
@@ -1,6 +1,8 @@
+import os
 import streamlit as st
-from util.data_loader import mongo
-from services.mailer import send_report_email
+from util.data_loader import mongo, list_customers
+from services.approvals import ensure_indexes, report_filter, list_reports, report_detail, PAGE_SIZE
+from services.dispatch import get_dispatcher, report_attachment
 
 st.set_page_config(page_title="CRM Approval", page_icon="✅")
 
@@ -11,17 +13,78 @@ if st.session_state.get("role") not in ["CRM", "Admin"]:
 st.title("✅ Approve & Send Reports")
 
 db = mongo()
-recs = list(db["dgr_reports"].find().sort("day", -1))
+reports = db["dgr_reports"]
+ensure_indexes(reports)
+dispatcher = get_dispatcher()
+# optional per-plant recipients: [RECIPIENTS] Imagica = ["a@x.com", "b@x.com"]
+RECIPIENTS = st.secrets.get("RECIPIENTS", {})
+
+default_to = st.text_input("Default recipient (plants without RECIPIENTS)", value="customer@mail.com")
+
+def recipients_for(doc):
+    return list(RECIPIENTS.get(doc["customer"], [])) or [default_to]
+
+if st.button("📨 Send all approved"):
+    n = dispatcher.enqueue_approved(recipients_for)
+    st.success(f"Queued {n} report(s) for delivery")
+
+# ----------------------------
+# Filters + keyset pagination
+# ----------------------------
+c1, c2, c3 = st.columns(3)
+statuses = c1.multiselect("Status", ["draft", "approved", "sent"], default=["draft", "approved"])
+customers = c2.multiselect("Customer", list_customers())
+days = c3.date_input("Day range", value=(), help="Leave empty for all days")
+start, end = (tuple(days) + (None, None))[:2]
+
+query = report_filter(statuses, customers, start, end)
+# a new filter starts again at the first page
+if st.session_state.get("crm_query") != repr(query):
+    st.session_state["crm_query"] = repr(query)
+    st.session_state["crm_cursors"] = [None]
+cursors = st.session_state["crm_cursors"]
+
+recs, next_cursor = list_reports(reports, query, cursors[-1], PAGE_SIZE)
 
 for r in recs:
-    with st.expander(f"{r['customer']} | {r['day']} | {r['status']}"):
-        st.json(r)
-        to = st.text_input("Send Email To", value="customer@mail.com")
+    delivery = r.get("delivery") or {}
+    label = f"{r['customer']} | {r['day']} | {r['status']}"
+    if delivery:
+        label += f" | mail: {delivery.get('status')}"
+    with st.expander(label):
+        kpis = r.get("kpis") or {}
+        st.write({k: round(v, 2) for k, v in kpis.items()})
+        # expander bodies always run, so the full document is only fetched on request
+        if st.checkbox("Show details", key=f"detail_{r['_id']}"):
+            st.json(report_detail(reports, r["_id"]))
+            attachment = report_attachment(reports.find_one(
+                {"_id": r["_id"]}, {"artifact_key": 1, "file_path": 1}
+            ))
+            if isinstance(attachment, str) and os.path.exists(attachment):
+                with open(attachment, "rb") as f:
+                    attachment = f.read()
+            if isinstance(attachment, bytes):
+                st.download_button("Download Report", attachment, r.get("file_name") or "DGR_Report.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                   key=f"dl_{r['_id']}")
+        to = st.text_input("Send Email To", value=", ".join(recipients_for(r)), key=f"to_{r['_id']}")
 
         if st.button(f"Approve_{r['_id']}"):
-            db["dgr_reports"].update_one({"_id": r["_id"]},{"$set":{"status":"approved"}})
+            reports.update_one({"_id": r["_id"]},{"$set":{"status":"approved"}})
             st.success("Approved ✅")
 
         if st.button(f"Send_{r['_id']}"):
-            send_report_email([to], "DGR Report", "Find report attached", r["file_path"])
-            st.success("📧 Sent successfully")
+            dispatcher.enqueue(r["_id"], [a.strip() for a in to.split(",")])
+            st.success("📧 Queued for delivery")
+
+p1, p2, p3 = st.columns([1, 2, 1])
+if p1.button("◀ Newer", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+p2.caption(f"Page {len(cursors)} · {len(recs)} report(s)")
+if p3.button("Older ▶", disabled=next_cursor is None):
+    cursors.append(next_cursor)
+    st.rerun()
+
+with st.expander("Mail queue"):
+    st.json(dispatcher.stats())
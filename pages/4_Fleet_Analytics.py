@@ -0,0 +1,65 @@
+# pages/4_Fleet_Analytics.py
+import io
+import streamlit as st
+from datetime import date, timedelta
+from util.data_loader import list_customers
+from util.fleet import fleet_matrix, rankings, monthly_generation
+from services.consolidated import build_daily, write_monthly
+
+st.set_page_config(page_title="Fleet Analytics", page_icon="📈", layout="wide")
+
+if st.session_state.get("role") not in ["O&M", "CRM", "Admin"]:
+    st.error("Access Denied")
+    st.stop()
+
+st.title("📈 Fleet Analytics")
+
+c1, c2, c3 = st.columns([2, 1, 1])
+plants = c1.multiselect("Plants", list_customers(), default=list_customers())
+yesterday = date.today() - timedelta(days=1)
+start = c2.date_input("From", value=yesterday.replace(month=1, day=1))
+end = c3.date_input("To", value=yesterday)
+
+if not plants or start > end:
+    st.info("Pick at least one plant and a valid date range")
+    st.stop()
+
+with st.spinner("Computing fleet KPIs..."):
+    m = fleet_matrix(start, end, plants)
+
+st.subheader("Rankings")
+st.dataframe(rankings(m), use_container_width=True)
+
+st.subheader("Daily PLF")
+st.line_chart(m["plf"].T)
+
+left, right = st.columns(2)
+left.subheader("Monthly generation (kWh)")
+left.bar_chart(monthly_generation(m))
+right.subheader("YTD (kWh)")
+right.line_chart(m["ytd"].T)
+
+metric = st.selectbox("Matrix", ["plf", "daily", "mtd", "ytd"])
+st.dataframe(m[metric].rename(columns=lambda d: d.strftime("%Y-%m-%d")), use_container_width=True)
+st.download_button("Download CSV", m[metric].to_csv(), f"fleet_{metric}_{start}_{end}.csv", mime="text/csv")
+
+st.subheader("Consolidated workbooks")
+d1, d2 = st.columns(2)
+if d1.button(f"Build daily workbook ({end})"):
+    with st.spinner("Rendering one sheet per plant..."):
+        st.session_state["fleet_daily_xlsx"] = (end, build_daily(end + timedelta(days=1), plants))
+if "fleet_daily_xlsx" in st.session_state:
+    day, data = st.session_state["fleet_daily_xlsx"]
+    d1.download_button("Download daily workbook", data, f"DGR_fleet_{day}.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+month = end.strftime("%Y-%m")
+if d2.button(f"Build monthly detail ({month})"):
+    with st.spinner("Streaming day x inverter rows..."):
+        buf = io.BytesIO()
+        rows = write_monthly(month, buf, plants)
+        st.session_state["fleet_monthly_xlsx"] = (month, rows, buf.getvalue())
+if "fleet_monthly_xlsx" in st.session_state:
+    m_name, rows, data = st.session_state["fleet_monthly_xlsx"]
+    d2.download_button(f"Download monthly detail ({rows} rows)", data, f"DGR_fleet_{m_name}.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
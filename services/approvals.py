@@ -0,0 +1,66 @@
+# services/approvals.py
+# Server-side listing of dgr_reports for the CRM page: filters, projection and
+# keyset pagination on (day desc, _id desc), backed by compound indexes.
+from datetime import date
+
+from pymongo import ASCENDING, DESCENDING
+
+# fields shown in the list; full documents are fetched per row on demand
+LIST_PROJECTION = {"customer": 1, "day": 1, "status": 1, "kpis": 1, "file_name": 1,
+                   "delivery.status": 1}
+PAGE_SIZE = 25
+
+_ORDER = [("day", DESCENDING), ("_id", DESCENDING)]
+INDEXES = [
+    ("status_day", [("status", ASCENDING)] + _ORDER),
+    ("customer_day", [("customer", ASCENDING)] + _ORDER),
+    ("customer_status_day", [("customer", ASCENDING), ("status", ASCENDING)] + _ORDER),
+    ("day", list(_ORDER)),
+]
+
+_indexed = set()  # (db, collection) whose indexes were ensured in this process
+
+def ensure_indexes(coll):
+    key = (coll.database.name, coll.name)
+    if key in _indexed:
+        return
+    for name, keys in INDEXES:
+        coll.create_index(keys, name=name)
+    _indexed.add(key)
+
+def report_filter(status=None, customer=None, start: date = None, end: date = None) -> dict:
+    """status / customer: a value or a list of values. Days are inclusive."""
+    q = {}
+    for field, value in (("status", status), ("customer", customer)):
+        if isinstance(value, (list, tuple, set)):
+            if value:
+                q[field] = {"$in": list(value)}
+        elif value:
+            q[field] = value
+    if start or end:
+        q["day"] = {}
+        if start:
+            q["day"]["$gte"] = str(start)
+        if end:
+            q["day"]["$lte"] = str(end)
+    return q
+
+def list_reports(coll, query: dict = None, after: tuple = None, limit: int = PAGE_SIZE):
+    """
+    One page of reports, newest first. `after` is the cursor returned for the
+    previous page ((day, _id) of its last row). Returns (rows, next_cursor | None).
+    """
+    q = dict(query or {})
+    if after is not None:
+        day, _id = after
+        keyset = {"$or": [{"day": {"$lt": day}}, {"day": day, "_id": {"$lt": _id}}]}
+        q = {"$and": [q, keyset]} if q else keyset
+    rows = list(coll.find(q, LIST_PROJECTION).sort(_ORDER).limit(limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]["day"], rows[-1]["_id"])
+
+def report_detail(coll, report_id) -> dict:
+    """Full document for the detail view."""
+    return coll.find_one({"_id": report_id})
@@ -0,0 +1,148 @@
+# services/artifacts.py
+# Content-addressed store for rendered DGR workbooks.
+#
+# The key is a SHA-256 of everything that goes into the .xlsx: the template
+# version, the template context (KPIs + O&M manual inputs) and the inverter
+# rows. Rendering an unchanged report is a lookup; drafts only keep the key.
+#
+# Backends (ARTIFACT_STORE secret / DGR_ARTIFACT_STORE env):
+#   "gridfs"        GridFS bucket `dgr_artifacts` in scada_db (default)
+#   "dir:<path>"    one file per key under <path> (single-server / dev)
+import hashlib
+import json
+import os
+import shutil
+
+import gridfs
+from pymongo.errors import DuplicateKeyError
+
+from services.excel_writer import compiled_template, render_report_bytes
+from util import metrics
+
+BUCKET = "dgr_artifacts"
+
+def artifact_key(template_version: str, context: dict, rows) -> str:
+    payload = {
+        "template": template_version,
+        "context": context,
+        "rows": [[str(name), float(daily), float(monthly)] for name, daily, monthly in rows],
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+# ----------------------------
+# Backends
+# ----------------------------
+class GridFSStore:
+    """
+    Files are stored with _id = key, so concurrent puts of one key collapse to one file.
+    Without an explicit db the bucket is resolved through mongo() on each use, so a
+    reconnect (util.mongo_pool.reset_client) never leaves it on a retired client.
+    """
+
+    def __init__(self, db=None, bucket: str = BUCKET):
+        self.db = db
+        self.bucket_name = bucket
+
+    @property
+    def bucket(self):
+        if self.db is not None:
+            return gridfs.GridFSBucket(self.db, bucket_name=self.bucket_name)
+        from util.data_loader import mongo
+        return gridfs.GridFSBucket(mongo(), bucket_name=self.bucket_name)
+
+    def exists(self, key: str) -> bool:
+        return next(iter(self.bucket.find({"_id": key}).limit(1)), None) is not None
+
+    def open(self, key: str):
+        """Readable stream, or None if the key is unknown."""
+        try:
+            return self.bucket.open_download_stream(key)
+        except gridfs.errors.NoFile:
+            return None
+
+    def put(self, key: str, data: bytes, metadata: dict = None):
+        try:
+            filename = (metadata or {}).get("file_name") or key
+            self.bucket.upload_from_stream_with_id(key, filename, data, metadata=metadata)
+        except (DuplicateKeyError, gridfs.errors.FileExists):
+            pass  # same content already stored
+
+class DirStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".xlsx")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def open(self, key: str):
+        try:
+            return open(self._path(key), "rb")
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes, metadata: dict = None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+_store = None
+
+def get_store():
+    """Configured store for this process."""
+    global _store
+    if _store is None:
+        spec = os.environ.get("DGR_ARTIFACT_STORE")
+        if spec is None:
+            import streamlit as st
+            spec = st.secrets.get("ARTIFACT_STORE", "gridfs")
+        if spec.startswith("dir:"):
+            _store = DirStore(spec[4:])
+        else:
+            _store = GridFSStore()
+    return _store
+
+# ----------------------------
+# Render / fetch
+# ----------------------------
+def read_artifact(key: str, store=None):
+    """Workbook bytes for key, or None."""
+    stream = (store or get_store()).open(key)
+    if stream is None:
+        return None
+    with stream:
+        return stream.read()
+
+def stream_artifact(key: str, out, store=None, chunk_size: int = 1 << 16) -> bool:
+    """Copy the artifact into a writable file object without holding it all twice."""
+    stream = (store or get_store()).open(key)
+    if stream is None:
+        return False
+    with stream:
+        shutil.copyfileobj(stream, out, chunk_size)
+    return True
+
+def render_artifact(template_path: str, context: dict, rows, store=None, file_name: str = None):
+    """
+    (key, xlsx bytes) for the report, rendering and storing it only if this exact
+    content has not been rendered before.
+    """
+    store = store or get_store()
+    rows = list(rows)
+    tpl = compiled_template(template_path)
+    key = artifact_key(tpl.version, context, rows)
+    with metrics.stage("artifact_lookup"):
+        data = read_artifact(key, store)
+    if data is not None:
+        return key, data
+    data = render_report_bytes(template_path, context, rows)
+    with metrics.stage("artifact_store"):
+        store.put(key, data, {"file_name": file_name, "template": tpl.version,
+                              "customer": context.get("customer"), "day": context.get("date")})
+    return key, data
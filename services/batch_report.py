@@ -0,0 +1,115 @@
+# services/batch_report.py
+# Headless DGR generation for the whole fleet (or a subset) in parallel.
+#   python -m services.batch_report                        # all plants, report date = today
+#   python -m services.batch_report --date 2025-11-07 TMD PGCIL --workers 4
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pymongo import UpdateOne
+from util.data_loader import list_customers, mongo
+from util import metrics
+from services.artifacts import render_artifact
+from services.report import (
+    TEMPLATE_PATH, EXPORT_DIR, report_window, compute_report, report_context,
+    inverter_rows, export_path, export_filename, draft_update, locked_reports,
+)
+
+def prefetch_manual_inputs(customers, data_day) -> dict:
+    """All dgr_manual_inputs of the day in one query, keyed by customer."""
+    cursor = mongo()["dgr_manual_inputs"].find(
+        {"day": str(data_day), "customer": {"$in": list(customers)}}, {"_id": 0}
+    )
+    return {d["customer"]: d for d in cursor}
+
+def build_plant(customer: str, report_date, omi: dict, out_dir: str = None) -> dict:
+    """Load → clean → aggregate → KPIs → Excel for one plant (runs in a worker process)."""
+    timings = {}
+    result = {"customer": customer, "timings": timings, "error": None, "update": None}
+    t_start = time.perf_counter()
+    metrics.reset()  # worker-local; shipped back to the parent below
+    try:
+        rep = compute_report(customer, report_date, timings=timings)
+        if rep is None:
+            result["error"] = "no data"
+            return result
+
+        t0 = time.perf_counter()
+        key, xlsx = render_artifact(TEMPLATE_PATH, report_context(rep, omi), inverter_rows(rep["final_df"]),
+                                    file_name=export_filename(customer, rep["data_day"]))
+        file_path = None
+        if out_dir:
+            file_path = export_path(customer, rep["data_day"], out_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(xlsx)
+        timings["excel"] = time.perf_counter() - t0
+
+        result["update"] = draft_update(rep, key, file_path)
+        result["total_daily"] = float(rep["total_daily"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        timings["total"] = time.perf_counter() - t_start
+        result["metrics"] = (metrics.stage_stats(), metrics.COMMANDS.snapshot())
+    return result
+
+def run_batch(report_date, customers=None, workers=None, out_dir: str = None) -> list:
+    """Build every plant's DGR in a process pool and upsert all drafts with one bulk_write."""
+    customers = list(customers or list_customers())
+    data_day, _, _ = report_window(report_date)
+    manual_inputs = prefetch_manual_inputs(customers, data_day)
+
+    results = []
+    # spawn: workers open their own pooled MongoClient (pymongo clients are not fork-safe)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [
+            pool.submit(build_plant, c, report_date, manual_inputs.get(c, {}), out_dir)
+            for c in customers
+        ]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+            metrics.merge(*results[-1]["metrics"])
+
+    reports = mongo()["dgr_reports"]
+    # approved / sent reports keep their status; a rerun only refreshes drafts
+    locked = locked_reports(reports, data_day, customers)
+    ops = [UpdateOne(*r["update"], upsert=True) for r in results
+           if r["update"] and r["customer"] not in locked]
+    if ops:
+        reports.bulk_write(ops, ordered=False)
+
+    return sorted(results, key=lambda r: r["customer"])
+
+def print_summary(results: list):
+    stages = ["load", "clean", "aggregate", "kpis", "excel", "total"]
+    print(f"{'Plant':<12}" + "".join(f"{s:>11}" for s in stages) + "  Status")
+    for r in results:
+        t = r["timings"]
+        cells = "".join(f"{t[s]:>10.2f}s" if s in t else f"{'-':>11}" for s in stages)
+        status = r["error"] or f"ok ({r['total_daily']:.0f} kWh)"
+        print(f"{r['customer']:<12}{cells}  {status}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate DGRs for all (or some) plants.")
+    parser.add_argument("customers", nargs="*", help="Plants to build (default: all)")
+    parser.add_argument("--date", help="Report date YYYY-MM-DD (data day = date - 1; default: today)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--out-dir", nargs="?", const=EXPORT_DIR, default=None,
+                        help=f"Also write .xlsx files to disk (default dir: {EXPORT_DIR})")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics (textfile collector) here")
+    args = parser.parse_args(argv)
+
+    report_date = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else date.today()
+    t0 = time.perf_counter()
+    results = run_batch(report_date, args.customers or None, args.workers, args.out_dir)
+    print_summary(results)
+    print(f"{len(results)} plant(s) in {time.perf_counter() - t0:.2f}s")
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# services/consolidated.py
+# Fleet-wide workbooks for management:
+#   daily    Summary sheet + one template-styled sheet per plant (one loaded template)
+#   monthly  every day x inverter row of the month, streamed with openpyxl
+#            write-only mode, one plant in memory at a time
+#
+#   python -m services.consolidated --date 2025-11-07            # data day 2025-11-06
+#   python -m services.consolidated --month 2025-10 TMD PGCIL --out oct.xlsx
+import argparse
+import calendar
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from util.agg import clean_dataframe, get_daily_monthly_yearly_range
+from util.data_loader import list_customers, load_period
+from services.batch_report import prefetch_manual_inputs
+from services.excel_writer import render_consolidated, write_streaming, workbook_bytes
+from services.report import (
+    TEMPLATE_PATH, EXPORT_DIR, report_window, compute_report, report_context, inverter_rows,
+)
+
+DETAIL_HEADER = ("Date", "Plant", "Inverter", "Daily (kWh)", "MTD (kWh)")
+DETAIL_STYLES = ("date", "text", "text", "kwh", "kwh")
+TOTALS_HEADER = ("Date", "Plant", "Daily (kWh)", "MTD (kWh)")
+TOTALS_STYLES = ("date", "text", "kwh", "kwh")
+
+# ----------------------------
+# Daily: summary + one sheet per plant
+# ----------------------------
+def build_daily(report_date, customers=None, workers: int = 8) -> bytes:
+    """Consolidated DGR .xlsx for report_date (data day = report_date - 1)."""
+    customers = list(customers or list_customers())
+    data_day, _, _ = report_window(report_date)
+    omi = prefetch_manual_inputs(customers, data_day)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        reps = list(pool.map(lambda c: compute_report(c, report_date), customers))
+
+    reports, summary = [], []
+    for customer, rep in zip(customers, reps):
+        if rep is None:
+            summary.append((customer, data_day, None, None, None, None))
+            continue
+        reports.append((customer, report_context(rep, omi.get(customer, {})), inverter_rows(rep["final_df"])))
+        summary.append((customer, data_day, float(rep["total_daily"]), float(rep["total_mtd"]),
+                        float(rep["total_ytd"]), round(float(rep["plf_percent"]), 2)))
+    return workbook_bytes(render_consolidated(TEMPLATE_PATH, reports, summary))
+
+# ----------------------------
+# Monthly: streamed day x inverter detail
+# ----------------------------
+def month_bounds(month: str) -> tuple:
+    """'YYYY-MM' -> (first day, last day), the last day capped at yesterday."""
+    first = datetime.strptime(month, "%Y-%m").date()
+    last = first.replace(day=calendar.monthrange(first.year, first.month)[1])
+    return first, min(last, date.today() - timedelta(days=1))
+
+def _num(v):
+    return None if v != v else float(v)  # NaN -> empty cell
+
+def monthly_rows(customer: str, start: date, end: date):
+    """(day, plant, inverter, daily kWh, MTD kWh) for every day x inverter of [start, end]."""
+    df = load_period(customer, start, end, daily=True)
+    if df.empty:
+        return
+    df_clean, inverter_cols, irradiation_col = clean_dataframe(df.copy(), customer)
+    if not inverter_cols:
+        return
+    res = get_daily_monthly_yearly_range(df_clean, inverter_cols, start, end, irradiation_col, customer)
+    names = res["inverter_names"]
+    for day, daily, mtd in zip(res["daily"].index, res["daily"].to_numpy(), res["mtd"].to_numpy()):
+        for name, d, m in zip(names, daily, mtd):
+            yield day.date(), customer, name, _num(d), _num(m)
+
+def write_monthly(month: str, out, customers=None) -> int:
+    """
+    Stream the month's detail workbook into out (path or binary buffer).
+    Sheets: "Detail" (day x inverter) then "Plant totals" (day x plant), the
+    latter accumulated while the detail rows go by. Returns the detail row count.
+    """
+    customers = list(customers or list_customers())
+    start, end = month_bounds(month)
+    totals = {}
+
+    def detail():
+        for customer in customers:
+            for row in monthly_rows(customer, start, end):
+                key = (row[0], customer)
+                d, m = totals.get(key, (0.0, 0.0))
+                totals[key] = (d + (row[3] or 0.0), m + (row[4] or 0.0))
+                yield row
+
+    def plant_totals():
+        # evaluated after "Detail" has been fully written
+        for (day, customer), (d, m) in sorted(totals.items()):
+            yield day, customer, d, m
+
+    written = write_streaming(TEMPLATE_PATH, out, [
+        ("Detail", DETAIL_HEADER, detail(), DETAIL_STYLES),
+        ("Plant totals", TOTALS_HEADER, plant_totals(), TOTALS_STYLES),
+    ])
+    return written - len(totals)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consolidated fleet DGR workbooks.")
+    parser.add_argument("customers", nargs="*", help="Plants (default: all)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--date", help="Report date YYYY-MM-DD (data day = date - 1)")
+    group.add_argument("--month", help="YYYY-MM: streamed day x inverter workbook")
+    parser.add_argument("--out", help=f"Output .xlsx (default: {EXPORT_DIR}/DGR_fleet_<day|month>.xlsx)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.date:
+        report_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+        out = args.out or os.path.join(EXPORT_DIR, f"DGR_fleet_{report_window(report_date)[0]}.xlsx")
+        data = build_daily(report_date, args.customers or None)
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "wb") as f:
+            f.write(data)
+        print(f"{out}: {len(data) / 1024:.0f} KiB in {time.perf_counter() - t0:.2f}s")
+    else:
+        out = args.out or os.path.join(EXPORT_DIR, f"DGR_fleet_{args.month}.xlsx")
+        rows = write_monthly(args.month, out, args.customers or None)
+        print(f"{out}: {rows} rows in {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+# services/dispatch.py
+# Background mail dispatch for approved DGRs.
+#
+# Pages enqueue report ids and return immediately; a small pool of worker
+# threads keeps SMTP connections open, sends queued reports in batches over
+# the same connection, retries transient failures with exponential backoff and
+# records the outcome on the dgr_reports document:
+#
+#   status    "sent" once delivered
+#   delivery  {status: queued|sending|retrying|sent|failed, to, attempts,
+#              last_error, queued_at, updated_at, sent_at}
+#
+# The queue itself is in memory. Deliveries left queued / sending / retrying by a
+# process that stopped are re-queued when the next dispatcher starts, once they
+# have not moved for STALE_SECONDS (at-least-once: a mail sent just before a crash
+# may go out twice); running dispatchers repeat that sweep while idle. Outcome
+# writes that fail (Mongo unreachable) are kept and retried by the workers, so a
+# sent mail is not recovered as stale and sent again.
+#
+# Try it against a local debugging SMTP server:
+#   python -m aiosmtpd -n -l localhost:1025
+#   DGR_SMTP_PORT=1025 python -m services.dispatch --to ops@example.com
+import argparse
+import atexit
+import os
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from services.artifacts import read_artifact
+from services.mailer import build_report_email, smtp_connect
+
+REPORTS_COLLECTION = "dgr_reports"
+STALE_SECONDS = float(os.environ.get("DGR_MAIL_STALE_SECONDS", 900))
+IN_FLIGHT = ["queued", "sending", "retrying"]
+SUBJECT = "DGR Report"
+BODY = "Find report attached"
+
+# 4xx replies, dropped connections and Mongo failovers are worth retrying; 5xx are not
+_TRANSIENT = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError,
+              ConnectionFailure)
+
+@dataclass
+class MailJob:
+    report_id: object
+    to_addrs: list
+    subject: str = SUBJECT
+    body: str = BODY
+    attempts: int = 0
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def report_attachment(doc: dict):
+    """Workbook for a dgr_reports document: artifact store first, then the disk path."""
+    if doc.get("artifact_key"):
+        data = read_artifact(doc["artifact_key"])
+        if data is not None:
+            return data
+    return doc.get("file_path")
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, _TRANSIENT)
+
+class MailDispatcher:
+    def __init__(self, reports=None, workers: int = 2, batch_size: int = 20,
+                 max_attempts: int = 5, backoff: float = 2.0, idle_close: float = 60.0,
+                 connect=smtp_connect):
+        self._reports = reports
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_close = idle_close
+        self._connect = connect
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0  # queued + sending + waiting for a retry
+        self._unsaved = {}  # report id -> final $set Mongo did not accept yet
+        self._recovered_at = None
+        self.counters = {"queued": 0, "sent": 0, "failed": 0, "retries": 0,
+                         "connections": 0, "batches": 0}
+
+    @property
+    def reports(self):
+        if self._reports is not None:
+            return self._reports
+        from util.data_loader import mongo
+        return mongo()[REPORTS_COLLECTION]  # resolved per use: survives reset_client()
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"dgr-mail-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def enqueue(self, report_id, to_addrs, subject: str = SUBJECT, body: str = BODY):
+        to_addrs = [a for a in to_addrs if a]
+        now = _now()
+        self.reports.update_one({"_id": report_id}, {"$set": {"delivery": {
+            "status": "queued", "to": to_addrs, "attempts": 0, "last_error": None,
+            "queued_at": now, "updated_at": now, "sent_at": None,
+        }}})
+        self._put(MailJob(report_id, to_addrs, subject, body))
+
+    def _put(self, job: MailJob):
+        with self._lock:
+            self._pending += 1
+            self.counters["queued"] += 1
+        self._queue.put(job)
+
+    def recover_stale(self, stale_after: float = STALE_SECONDS) -> int:
+        """
+        Re-queue deliveries another (stopped) process left queued / sending / retrying:
+        no progress for stale_after seconds. Each document is claimed atomically, so
+        two dispatchers starting together do not both pick it up. Returns the count.
+        """
+        cutoff = _now() - timedelta(seconds=stale_after)
+        stale = {"delivery.status": {"$in": IN_FLIGHT},
+                 "$or": [{"delivery.updated_at": {"$lt": cutoff}},
+                         {"delivery.updated_at": None, "delivery.queued_at": {"$lt": cutoff}}]}
+        n = 0
+        while True:
+            doc = self.reports.find_one_and_update(
+                stale, {"$set": {"delivery.status": "queued", "delivery.updated_at": _now()}},
+                projection={"_id": 1, "delivery": 1},
+            )
+            if doc is None:
+                return n
+            with self._lock:
+                outcome = self._unsaved.get(doc["_id"])
+            if outcome is not None:  # ours, already delivered or failed: record that instead
+                self._save_unsaved(doc["_id"], outcome)
+                continue
+            to = (doc.get("delivery") or {}).get("to") or []
+            if not to:
+                self.reports.update_one({"_id": doc["_id"]}, {"$set": {
+                    "delivery.status": "failed", "delivery.last_error": "No recipients recorded"}})
+                continue
+            self._put(MailJob(doc["_id"], to, attempts=(doc.get("delivery") or {}).get("attempts", 0)))
+            n += 1
+
+    def _recover_due(self, every: float = STALE_SECONDS):
+        """recover_stale() at most once per `every` seconds per dispatcher; Mongo errors wait for the next turn."""
+        with self._lock:
+            now = time.monotonic()
+            if self._recovered_at is not None and now - self._recovered_at < every:
+                return
+            self._recovered_at = now
+        try:
+            self.recover_stale()
+        except PyMongoError:
+            pass
+
+    def enqueue_approved(self, recipients_for, query: dict = None) -> int:
+        """
+        Queue every approved, not yet queued/sent report. recipients_for(doc) -> list of
+        addresses (reports without recipients are skipped). Returns the number queued.
+        """
+        q = {"status": "approved",
+             "delivery.status": {"$nin": IN_FLIGHT + ["sent"]}}
+        q.update(query or {})
+        n = 0
+        for doc in self.reports.find(q, {"_id": 1, "customer": 1, "day": 1}):
+            to = recipients_for(doc)
+            if to:
+                self.enqueue(doc["_id"], to)
+                n += 1
+        return n
+
+    def drain(self, timeout: float = None) -> bool:
+        """Wait until nothing is queued, sending or waiting to retry."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self._flush_unsaved()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, pending=self._pending, unsaved=len(self._unsaved),
+                        workers=sum(t.is_alive() for t in self._threads))
+
+    # ----------------------------
+    # Workers
+    # ----------------------------
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.idle_close)
+        except queue.Empty:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        conn = None
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            self._flush_unsaved()
+            if not batch:
+                conn = self._close(conn)  # idle: release the SMTP connection
+                self._recover_due()
+                continue
+            with self._lock:
+                self.counters["batches"] += 1
+            for job in batch:
+                try:
+                    conn = self._deliver(conn, job)
+                except Exception as e:  # keep the worker alive and the job accounted for
+                    conn = self._close(conn)
+                    self._finish(job, "failed", repr(e))
+        self._close(conn)
+
+    def _close(self, conn):
+        if conn is not None:
+            try:
+                conn.quit()
+            except Exception:
+                pass
+        return None
+
+    def _open(self, conn):
+        """Reuse conn if it still answers NOOP, else reconnect."""
+        if conn is not None:
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            self._close(conn)
+        conn = self._connect()
+        with self._lock:
+            self.counters["connections"] += 1
+        return conn
+
+    def _deliver(self, conn, job: MailJob):
+        job.attempts += 1
+        try:
+            self._mark(job, "sending")
+            doc = self.reports.find_one({"_id": job.report_id},
+                                        {"artifact_key": 1, "file_path": 1, "file_name": 1})
+            attachment = doc and report_attachment(doc)
+            msg = build_report_email(job.to_addrs, job.subject, job.body, attachment,
+                                     doc and doc.get("file_name"))
+            if msg is None:
+                self._finish(job, "failed", "No report file stored for this draft")
+                return conn
+            conn = self._open(conn)
+            conn.send_message(msg)
+        except Exception as e:
+            conn = self._close(conn)
+            if is_transient(e) and job.attempts < self.max_attempts:
+                self._retry(job, e)
+            else:
+                self._finish(job, "failed", repr(e))
+            return conn
+        self._finish(job, "sent")
+        return conn
+
+    def _retry(self, job: MailJob, exc: Exception):
+        delay = self.backoff * 2 ** (job.attempts - 1)
+        try:
+            self._mark(job, "retrying", repr(exc))
+        except PyMongoError:
+            pass  # informational; the job still goes back on the queue
+        with self._lock:
+            self.counters["retries"] += 1
+        t = threading.Timer(delay, self._queue.put, (job,))
+        t.daemon = True
+        t.start()
+
+    def _mark(self, job: MailJob, status: str, error: str = None):
+        upd = {"delivery.status": status, "delivery.attempts": job.attempts, "delivery.updated_at": _now()}
+        if error is not None:
+            upd["delivery.last_error"] = error
+        self.reports.update_one({"_id": job.report_id}, {"$set": upd})
+
+    def _save(self, report_id, upd: dict) -> bool:
+        try:
+            self.reports.update_one({"_id": report_id}, {"$set": upd})
+            return True
+        except PyMongoError:
+            return False
+
+    def _flush_unsaved(self):
+        with self._lock:
+            todo = list(self._unsaved.items())
+        for rid, upd in todo:
+            self._save_unsaved(rid, upd)
+
+    def _save_unsaved(self, report_id, upd: dict):
+        if self._save(report_id, upd):
+            with self._lock:
+                if self._unsaved.get(report_id) is upd:
+                    del self._unsaved[report_id]
+
+    def _finish(self, job: MailJob, status: str, error: str = None):
+        upd = {"delivery.status": status, "delivery.attempts": job.attempts,
+               "delivery.last_error": error, "delivery.updated_at": _now()}
+        if status == "sent":
+            upd.update({"status": "sent", "delivery.sent_at": _now()})
+        saved = self._save(job.report_id, upd)
+        with self._lock:
+            if saved:
+                self._unsaved.pop(job.report_id, None)
+            else:
+                self._unsaved[job.report_id] = upd
+        with self._idle:
+            self.counters[status] += 1
+            self._pending -= 1
+            self._idle.notify_all()
+
+# ----------------------------
+# Process-wide dispatcher
+# ----------------------------
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher() -> MailDispatcher:
+    """Started dispatcher shared by every session of this process."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = MailDispatcher(
+                workers=int(os.environ.get("DGR_MAIL_WORKERS", 2)),
+                batch_size=int(os.environ.get("DGR_MAIL_BATCH", 20)),
+            ).start()
+            atexit.register(_dispatcher.stop)
+            _dispatcher._recover_due()
+        return _dispatcher
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send every approved DGR that has not been sent yet.")
+    parser.add_argument("--to", nargs="+", required=True, help="Recipient address(es)")
+    parser.add_argument("--customer", help="Only this customer's reports")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for delivery")
+    args = parser.parse_args(argv)
+
+    d = get_dispatcher()
+    n = d.enqueue_approved(lambda doc: args.to, {"customer": args.customer} if args.customer else None)
+    print(f"queued {n} report(s)")
+    done = d.drain(args.timeout)
+    print(d.stats() if done else f"timed out: {d.stats()}")
+
+if __name__ == "__main__":
+    main()
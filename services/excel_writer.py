@@ -1,11 +1,21 @@
 # services/excel_writer.py
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image
+from openpyxl.styles import NamedStyle
 from openpyxl.utils import get_column_letter
-from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
-from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.utils.cell import coordinate_to_tuple
+from copy import copy
+from datetime import date
+from functools import lru_cache
 import pandas as pd
 import numpy as np
+import hashlib
+import io
 import os
+import re
+import threading
+from util import metrics
 
 CELL_MAP = {
     "date": "B4",
@@ -20,6 +30,17 @@ CELL_MAP = {
     "operating_hours": "C23",
 }
 
+# Template cells whose look is reused by sheets built outside the template
+# (consolidated summary, streamed detail sheets).
+STYLE_SOURCES = {
+    "header": "B8",   # table header: filled, bordered
+    "date": "B11",    # dd/mm/yyyy
+    "kwh": "C11",     # #,##0
+    "text": "B4",
+}
+
+SUMMARY_HEADER = ("Plant", "Date", "Daily (kWh)", "MTD (kWh)", "YTD (kWh)", "PLF (%)")
+
 def _to_scalar(v):
     if v is None:
         return None
@@ -29,53 +50,271 @@ def _to_scalar(v):
         return v.iloc[0]
     if isinstance(v, (pd.Series, pd.Index, pd.DataFrame, list, tuple, dict, set)):
         return str(v)
-    if isinstance(v, (str, float, int, bool)):
+    if isinstance(v, (str, float, int, bool, date)):
         return v
     try:
         return float(v)
     except Exception:
         return str(v)
 
-def _top_left_if_merged(ws: Worksheet, coord: str) -> str:
-    """If coord lies inside a merged range, return that range’s top-left coordinate."""
-    try:
-        col_letters, row = coordinate_from_string(coord)
-        col = column_index_from_string(col_letters)
-    except Exception:
-        return coord  # if invalid, just return as-is
+class CompiledTemplate:
+    """
+    A report template parsed once per process.
+
+    Keeps one parsed workbook per process plus a coordinate -> anchor index of
+    merged cells, the resolved CELL_MAP targets and the inverter table region.
+    save() fills that workbook under a lock, saves it and puts the touched cells
+    back, so a report costs the cell writes and the save, not a template parse.
+    (openpyxl workbooks do not survive copy.deepcopy/pickle intact, so callers
+    that need a workbook of their own still get one from new_workbook().)
+    """
+
+    TABLE_START_ROW = 30
+    TABLE_COLUMNS = ("A", "B", "C")  # name, daily kWh, monthly kWh
+
+    @metrics.timed("excel_template_compile")
+    def __init__(self, template_path: str):
+        if not os.path.exists(template_path):
+            raise FileNotFoundError(f"Template not found: {template_path}")
+        with open(template_path, "rb") as f:
+            self.data = f.read()
+        self.path = template_path
+        self.version = hashlib.sha256(self.data).hexdigest()[:16]
+
+        # data_only=False keeps formulas; header/footer warnings can be ignored
+        self._wb = self.new_workbook()
+        self._lock = threading.Lock()
+        ws = self._wb.active
+        # loaded images keep their bytes in a BytesIO that saving closes
+        self._images = [(img, img.ref.getvalue()) for s in self._wb.worksheets for img in s._images]
+        self.merged_anchor = {}
+        for rng in ws.merged_cells.ranges:
+            min_col, min_row, max_col, max_row = rng.bounds
+            anchor = f"{get_column_letter(min_col)}{min_row}"
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    self.merged_anchor[f"{get_column_letter(col)}{row}"] = anchor
+
+        self.cells = {key: self.anchor(coord) for key, coord in CELL_MAP.items()}
+
+    def anchor(self, coord: str) -> str:
+        """If coord lies inside a merged range, return that range’s top-left coordinate."""
+        return self.merged_anchor.get(coord.upper(), coord)
+
+    def new_workbook(self):
+        """Fresh copy of the template workbook, cloned from the in-memory package."""
+        return load_workbook(io.BytesIO(self.data), data_only=False)
+
+    def table_cells(self, i: int):
+        """Coordinates (name, daily, monthly) of the i-th inverter table row."""
+        r = self.TABLE_START_ROW + i
+        return tuple(f"{c}{r}" for c in self.TABLE_COLUMNS)
+
+    def fill(self, ws, context, inverter_rows):
+        """Write KPI cells and the inverter table into a sheet cloned from the template."""
+        # Fill header / KPI cells (merged cells already resolved to their anchor)
+        for key, coord in self.cells.items():
+            ws[coord].value = _to_scalar(context.get(key, ""))
+
+        # Write inverter table
+        for i, row in enumerate(inverter_rows):
+            for coord, v in zip(self.table_cells(i), row):
+                ws[coord].value = _to_scalar(v)
+        return ws
+
+    def render(self, context, inverter_rows):
+        """New workbook with KPI cells and the inverter table filled in (parses the template)."""
+        wb = self.new_workbook()
+        self.fill(wb.active, context, inverter_rows)
+        return wb
+
+    @metrics.timed("excel_render")
+    def save(self, context, inverter_rows, out):
+        """Fill the shared workbook, save it to out (path or binary buffer) and restore it."""
+        with self._lock:
+            ws = self._wb.active
+            coords = list(self.cells.values())
+            coords += [c for i in range(len(inverter_rows)) for c in self.table_cells(i)]
+            saved = {}
+            for coord in coords:
+                key = coordinate_to_tuple(coord)
+                if key not in saved:
+                    # cells the template does not have are removed again afterwards
+                    cell = ws._cells.get(key)
+                    saved[key] = (cell.value, True) if cell is not None else (None, False)
+            try:
+                self.fill(ws, context, inverter_rows)
+                for img, data in self._images:
+                    img.ref = io.BytesIO(data)
+                with metrics.stage("excel_save"):
+                    self._wb.save(out)
+            finally:
+                for key, (value, existed) in saved.items():
+                    if existed:
+                        ws._cells[key].value = value
+                    else:
+                        ws._cells.pop(key, None)
+
+    @property
+    def styles(self) -> dict:
+        """STYLE_SOURCES name -> (font, fill, border, alignment, number_format), read once."""
+        if not hasattr(self, "_styles"):
+            ws = self.new_workbook().active
+            self._styles = {
+                name: (copy(c.font), copy(c.fill), copy(c.border), copy(c.alignment), c.number_format)
+                for name, c in ((n, ws[coord]) for n, coord in STYLE_SOURCES.items())
+            }
+        return self._styles
 
-    for rng in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = rng.bounds
-        if (min_col <= col <= max_col) and (min_row <= row <= max_row):
-            # Redirect to top-left of merged block
-            return f"{get_column_letter(min_col)}{min_row}"
-    return coord
+    def add_styles(self, wb):
+        """Register the template styles on wb as named styles ("dgr_header", "dgr_kwh", ...)."""
+        for name, (font, fill, border, alignment, number_format) in self.styles.items():
+            if f"dgr_{name}" not in wb.named_styles:
+                wb.add_named_style(NamedStyle(
+                    f"dgr_{name}", font=copy(font), fill=copy(fill), border=copy(border),
+                    alignment=copy(alignment), number_format=number_format,
+                ))
+
+@lru_cache(maxsize=8)
+def _compiled(template_path: str, mtime: float) -> CompiledTemplate:
+    return CompiledTemplate(template_path)
+
+def compiled_template(template_path: str) -> CompiledTemplate:
+    """Process-wide CompiledTemplate (re-compiled if the file changes on disk)."""
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template not found: {template_path}")
+    path = os.path.abspath(template_path)
+    return _compiled(path, os.path.getmtime(path))
+
+def render_report_bytes(template_path, context, inverter_rows) -> bytes:
+    """Render a report straight into memory and return the .xlsx bytes."""
+    buf = io.BytesIO()
+    compiled_template(template_path).save(context, inverter_rows, buf)
+    return buf.getvalue()
 
 def write_report_from_template(template_path, out_path, context, inverter_rows):
     """
     context: dict with keys from CELL_MAP
     inverter_rows: list of tuples (name, daily_kwh, monthly_kwh)
+    out_path: file path (returns the path), writable binary buffer such as
+              BytesIO (returns the buffer) or None (returns the .xlsx bytes)
     """
-    if not os.path.exists(template_path):
-        raise FileNotFoundError(f"Template not found: {template_path}")
+    if out_path is None:
+        return render_report_bytes(template_path, context, inverter_rows)
 
-    # data_only=False keeps formulas; header/footer warnings can be ignored
-    wb = load_workbook(template_path, data_only=False)
-    ws = wb.active
-
-    # Fill header / KPI cells (handle merged cells)
-    for key, coord in CELL_MAP.items():
-        safe_coord = _top_left_if_merged(ws, coord)
-        ws[safe_coord].value = _to_scalar(context.get(key, ""))
-
-    # Write inverter table (adjust start row to match your template)
-    start_row = 30
-    for i, (name, dval, mval) in enumerate(inverter_rows):
-        r = start_row + i
-        ws[f"A{r}"].value = _to_scalar(name)
-        ws[f"B{r}"].value = _to_scalar(dval)
-        ws[f"C{r}"].value = _to_scalar(mval)
-
-    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-    wb.save(out_path)
+    if not hasattr(out_path, "write"):
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    compiled_template(template_path).save(context, inverter_rows, out_path)
     return out_path
+
+# ----------------------------
+# Consolidated (multi-plant) workbooks
+# ----------------------------
+def sheet_title(name: str, taken: set) -> str:
+    """Valid, unique worksheet title: no []:*?/\\, at most 31 characters."""
+    base = re.sub(r"[\[\]:*?/\\]", "_", str(name)).strip("'") or "Sheet"
+    title, n = base[:31], 1
+    while title.lower() in taken:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    taken.add(title.lower())
+    return title
+
+def _copy_images(src, dst):
+    # copy_worksheet() copies cells, styles and merges but not drawings (the logo).
+    # Loaded images hold their bytes in a BytesIO; Image._data() would close it.
+    for img in src._images:
+        clone = Image(io.BytesIO(img.ref.getvalue()))
+        clone.anchor = copy(img.anchor)
+        clone.width, clone.height = img.width, img.height
+        dst.add_image(clone)
+
+def _styled_row(ws, values, styles):
+    """Write-only cells carrying the named styles (None: unstyled)."""
+    row = []
+    for v, style in zip(values, styles):
+        cell = WriteOnlyCell(ws, value=_to_scalar(v))
+        if style:
+            cell.style = style
+        row.append(cell)
+    return row
+
+@metrics.timed("excel_render_consolidated")
+def render_consolidated(template_path, reports, summary_rows=None):
+    """
+    One workbook with a "Summary" sheet followed by one template-styled sheet
+    per plant. reports: list of (title, context, inverter_rows);
+    summary_rows: rows under SUMMARY_HEADER (omitted when None).
+
+    The plant sheets are clones of the template sheet inside a single loaded
+    workbook; the first plant reuses the original so the template's table and
+    formulas keep resolving.
+    """
+    tpl = compiled_template(template_path)
+    wb = tpl.new_workbook()
+    base = wb.active
+    taken = set()
+    if reports:
+        sheets = [base] + [wb.copy_worksheet(base) for _ in reports[1:]]
+        for ws, (title, context, rows) in zip(sheets, reports):
+            if ws is not base:
+                _copy_images(base, ws)
+            ws.title = sheet_title(title, taken)
+            tpl.fill(ws, context, rows)
+
+    if summary_rows is not None:
+        tpl.add_styles(wb)
+        ws = wb.create_sheet(sheet_title("Summary", taken), 0)
+        ws.append(SUMMARY_HEADER)
+        for cell in ws[1]:
+            cell.style = "dgr_header"
+        styles = ("dgr_text", "dgr_date", "dgr_kwh", "dgr_kwh", "dgr_kwh", None)
+        for r in summary_rows:
+            ws.append([_to_scalar(v) for v in r])
+            for cell, style in zip(ws[ws.max_row], styles):
+                if style:
+                    cell.style = style
+        for col, width in zip("ABCDEF", (24, 12, 16, 16, 16, 10)):
+            ws.column_dimensions[col].width = width
+        wb.active = 0
+    elif not reports:
+        base.title = "Empty"
+    return wb
+
+@metrics.timed("excel_write_streaming")
+def write_streaming(template_path, out, sheets) -> int:
+    """
+    Write large tabular sheets with openpyxl's write-only mode: rows go straight
+    to the zip stream, so memory stays flat however many rows are written.
+
+    sheets: iterable of (title, header, rows, styles); rows is any iterable of
+    tuples (a generator is fine), styles names one template style per column
+    ("date", "kwh", "text" or None). out: path or writable binary buffer.
+    Returns the number of data rows written.
+    """
+    tpl = compiled_template(template_path)
+    wb = Workbook(write_only=True)
+    tpl.add_styles(wb)
+    taken, written = set(), 0
+    for title, header, rows, styles in sheets:
+        ws = wb.create_sheet(sheet_title(title, taken))
+        ws.freeze_panes = "A2"
+        ws.append(_styled_row(ws, header, ["dgr_header"] * len(header)))
+        names = [f"dgr_{s}" if s else None for s in styles]
+        for row in rows:
+            ws.append(_styled_row(ws, row, names))
+            written += 1
+    if not taken:
+        wb.create_sheet("Empty")
+    with metrics.stage("excel_save"):
+        if isinstance(out, str):
+            os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        wb.save(out)
+    return written
+
+def workbook_bytes(wb) -> bytes:
+    buf = io.BytesIO()
+    with metrics.stage("excel_save"):
+        wb.save(buf)
+    return buf.getvalue()
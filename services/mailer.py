@@ -1,20 +1,44 @@
 import smtplib, ssl, os
 from email.message import EmailMessage
 
-def send_report_email(to_addrs, subject, body, attachment):
-    if not os.path.exists(attachment): return False
+XLSX_SUBTYPE = "vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# SMTP relay; point at a local debugging server for testing, e.g.
+#   python -m aiosmtpd -n -l localhost:1025   +   DGR_SMTP_PORT=1025
+SMTP_HOST = os.environ.get("DGR_SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("DGR_SMTP_PORT", 25))
+FROM_ADDR = os.environ.get("DGR_MAIL_FROM", "no-reply@company.com")
+
+def smtp_connect(timeout: float = 30):
+    return smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=timeout)
+
+def build_report_email(to_addrs, subject, body, attachment, filename=None):
+    """EmailMessage with the report attached, or None if there is no report to attach."""
+    if isinstance(attachment, (bytes, bytearray, memoryview)):
+        data = bytes(attachment)
+        filename = filename or "DGR_Report.xlsx"
+    else:
+        if not attachment or not os.path.exists(attachment): return None
+        with open(attachment,"rb") as f:
+            data = f.read()
+        filename = filename or os.path.basename(attachment)
 
     msg = EmailMessage()
     msg["Subject"]=subject
-    msg["From"]="no-reply@company.com"
+    msg["From"]=FROM_ADDR
     msg["To"]=", ".join(to_addrs)
     msg.set_content(body)
 
-    with open(attachment,"rb") as f:
-        msg.add_attachment(f.read(), maintype="application",
-        subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=os.path.basename(attachment))
+    msg.add_attachment(data, maintype="application",
+    subtype=XLSX_SUBTYPE,
+    filename=filename)
+    return msg
 
-    with smtplib.SMTP("localhost",25) as s:
+def send_report_email(to_addrs, subject, body, attachment, filename=None):
+    """attachment: path to the .xlsx on disk, or the report bytes themselves."""
+    msg = build_report_email(to_addrs, subject, body, attachment, filename)
+    if msg is None:
+        return False
+    with smtp_connect() as s:
         s.send_message(msg)
-    return True
\ No newline at end of file
+    return True
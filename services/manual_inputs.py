@@ -0,0 +1,198 @@
+# services/manual_inputs.py
+# O&M manual inputs (dgr_manual_inputs): prefetch a (customer x day) window,
+# validate edited / uploaded rows and upsert them with one bulk_write.
+#
+# Duplicate (customer, day) rows block the unique index; they are only reported
+# here. Removing them is an explicit, reviewed step:
+#   python -m services.manual_inputs dedupe            # list duplicates
+#   python -m services.manual_inputs dedupe --apply    # keep newest per (customer, day), build index
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateMany
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+COLLECTION = "dgr_manual_inputs"
+HOURS_FIELDS = ["breakdown_hours", "generation_hours", "operating_hours"]
+TEXT_FIELDS = ["weather", "notes"]
+FIELDS = HOURS_FIELDS + TEXT_FIELDS
+GRID_COLUMNS = ["customer", "day"] + FIELDS
+
+_indexed = set()
+
+def _create_index(coll):
+    coll.create_index([("customer", ASCENDING), ("day", ASCENDING)], unique=True,
+                      name="customer_day_unique")
+
+def ensure_index(coll) -> list:
+    """
+    Unique (customer, day). Returns [] once the index exists; if duplicate rows
+    prevent it, nothing is deleted and the duplicates (find_duplicates()) are returned.
+    """
+    key = (coll.database.name, coll.name)
+    if key in _indexed:
+        return []
+    try:
+        _create_index(coll)
+    except (DuplicateKeyError, OperationFailure) as e:
+        if getattr(e, "code", None) != 11000:
+            raise
+        return find_duplicates(coll)
+    _indexed.add(key)
+    return []
+
+def find_duplicates(coll) -> list:
+    """[{customer, day, ids}] for every (customer, day) stored more than once, newest _id first."""
+    dupes = coll.aggregate([
+        {"$sort": {"_id": -1}},
+        {"$group": {"_id": {"customer": "$customer", "day": "$day"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+        {"$sort": {"_id.customer": 1, "_id.day": 1}},
+    ], allowDiskUse=True)
+    return [{"customer": d["_id"].get("customer"), "day": d["_id"].get("day"), "ids": d["ids"]} for d in dupes]
+
+def drop_duplicates(coll) -> int:
+    """Keep the most recently inserted document per (customer, day). Returns documents removed."""
+    stale = [i for d in find_duplicates(coll) for i in d["ids"][1:]]
+    if stale:
+        coll.delete_many({"_id": {"$in": stale}})
+    return len(stale)
+
+def prefetch(coll, customers, start: date, end: date) -> pd.DataFrame:
+    """
+    Every (customer, day) of the window, filled from existing documents in one
+    query. Of duplicated (customer, day) documents only the newest is shown.
+    """
+    days = [str(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+    grid = pd.DataFrame([(c, d) for c in customers for d in days], columns=["customer", "day"])
+    docs = list(coll.find(
+        {"customer": {"$in": list(customers)}, "day": {"$gte": str(start), "$lte": str(end)}},
+        {"_id": 0, "customer": 1, "day": 1, **{f: 1 for f in FIELDS}},
+    ).sort("_id", -1))
+    existing = pd.DataFrame(docs, columns=["customer", "day"] + FIELDS).drop_duplicates(["customer", "day"])
+    out = grid.merge(existing, on=["customer", "day"], how="left")
+    out[HOURS_FIELDS] = out[HOURS_FIELDS].astype(float)
+    out[TEXT_FIELDS] = out[TEXT_FIELDS].fillna("")
+    return out[GRID_COLUMNS]
+
+def validate(df: pd.DataFrame, customers) -> tuple:
+    """
+    (records, errors). Rows with no values at all are skipped; errors are
+    human-readable strings referring to 1-based row numbers.
+    """
+    missing = [c for c in ("customer", "day") if c not in df.columns]
+    if missing:
+        return [], [f"missing column(s): {', '.join(missing)}"]
+
+    known = set(customers)
+    today = date.today()
+    records, errors = [], []
+    for n, row in enumerate(df.to_dict("records"), start=1):
+        values = {f: row.get(f) for f in FIELDS if f in row}
+        if all(pd.isna(v) or v == "" for v in values.values()):
+            continue
+        customer = str(row.get("customer") or "").strip()
+        if customer not in known:
+            errors.append(f"row {n}: unknown customer {customer!r}")
+            continue
+        raw_day = row.get("day")
+        if _blank(raw_day):
+            errors.append(f"row {n}: invalid day (empty)")
+            continue
+        try:
+            day = pd.to_datetime(raw_day)
+        except (ValueError, TypeError):
+            day = pd.NaT
+        if pd.isna(day):  # also "NaT" / "none" strings
+            errors.append(f"row {n}: invalid day {raw_day!r}")
+            continue
+        day = day.date()
+        if day > today:
+            errors.append(f"row {n}: {day} is in the future")
+            continue
+
+        rec = {"customer": customer, "day": str(day)}
+        bad = False
+        for f in HOURS_FIELDS:
+            v = values.get(f)
+            if v is None or v == "" or pd.isna(v):
+                rec[f] = 0.0
+                continue
+            try:
+                v = float(v)
+            except (ValueError, TypeError):
+                errors.append(f"row {n}: {f} must be a number")
+                bad = True
+                continue
+            if not 0 <= v <= 24:
+                errors.append(f"row {n}: {f} must be between 0 and 24")
+                bad = True
+            rec[f] = v
+        for f in TEXT_FIELDS:
+            v = values.get(f)
+            rec[f] = "" if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v).strip()
+        if not bad:
+            records.append(rec)
+
+    seen = {}
+    for r in records:
+        seen.setdefault((r["customer"], r["day"]), 0)
+        seen[(r["customer"], r["day"])] += 1
+    errors += [f"{c} {d} appears {k} times" for (c, d), k in seen.items() if k > 1]
+    return records, errors
+
+def _blank(v) -> bool:
+    return v is None or (isinstance(v, str) and not v.strip()) or (not isinstance(v, str) and pd.isna(v))
+
+def changed(records: list, existing: pd.DataFrame) -> list:
+    """Records that differ from the prefetched rows (new rows included)."""
+    if existing is None or existing.empty:
+        return records
+    before = {(r["customer"], r["day"]): r for r in existing.to_dict("records")}
+    out = []
+    for rec in records:
+        old = before.get((rec["customer"], rec["day"]))
+        if old is None or any(_differs(rec[f], old.get(f)) for f in FIELDS):
+            out.append(rec)
+    return out
+
+def _differs(new, old) -> bool:
+    if isinstance(new, float):  # missing hours read as 0 in the report, like here
+        return abs(new - (0.0 if old is None or pd.isna(old) else float(old))) > 1e-9
+    return new != ("" if old is None or (not isinstance(old, str) and pd.isna(old)) else old)
+
+def save(coll, records: list, user: str = None):
+    """
+    Upsert all records with one bulk_write. Returns the BulkWriteResult (None if
+    nothing to do). Duplicated (customer, day) documents are all updated.
+    """
+    if not records:
+        return None
+    ensure_index(coll)
+    ops = [UpdateMany({"customer": r["customer"], "day": r["day"]},
+                     {"$set": {**r, "user": user}}, upsert=True)
+           for r in records]
+    return coll.bulk_write(ops, ordered=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance of dgr_manual_inputs.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    dd = sub.add_parser("dedupe", help="List duplicate (customer, day) rows; --apply removes them")
+    dd.add_argument("--apply", action="store_true", help="Delete all but the newest row, then build the index")
+    args = parser.parse_args(argv)
+
+    from util.data_loader import mongo
+    coll = mongo()[COLLECTION]
+    dupes = find_duplicates(coll)
+    for d in dupes:
+        print(f"{d['customer']} {d['day']}: {len(d['ids'])} rows (keeping {d['ids'][0]})")
+    if not args.apply:
+        print(f"{len(dupes)} duplicated (customer, day); re-run with --apply to keep the newest of each")
+        return
+    print(f"removed {drop_duplicates(coll)} row(s)")
+    _create_index(coll)
+    print("unique index customer_day_unique in place")
+
+if __name__ == "__main__":
+    main()
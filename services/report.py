@@ -0,0 +1,169 @@
+# services/report.py
+# Report computation shared by the Report Builder page and headless batch runs.
+import os
+import time
+import pandas as pd
+from util.data_loader import load_period
+from util.agg import (
+    clean_dataframe, detect_columns, get_daily_monthly_yearly_data, calculate_kpis, _generation_values,
+)
+from util.downsample import downsample_frame
+from util.profiles import get_profile, profile_key
+from util.result_cache import RESULTS
+
+TEMPLATE_PATH = "data/Energy report template.xlsx"
+EXPORT_DIR = "exports"  # only used when writing reports to disk is enabled
+
+def report_window(report_date):
+    """data_day = report_date - 1; returns (data_day, month_start, ytd_start) as dates."""
+    data_day = (pd.to_datetime(report_date) - pd.Timedelta(days=1)).date()
+    return data_day, data_day.replace(day=1), data_day.replace(month=1, day=1)
+
+def compute_report(customer: str, report_date, df_ytd_full: pd.DataFrame = None, timings: dict = None):
+    """
+    Load (unless df_ytd_full is given), clean and aggregate one plant's DGR.
+    Returns None when there is no data, else a dict with final_df and KPIs.
+    `timings`, if given, is filled with per-stage seconds (on a cache miss).
+
+    Loaded reports are cached per (customer, data day, profile); closed data days
+    are kept for RESULT_CACHE_CLOSED_TTL. The returned dict is shared - do not mutate it.
+    """
+    if df_ytd_full is not None:
+        return _compute_report(customer, report_date, df_ytd_full, timings)
+
+    data_day, _, _ = report_window(report_date)
+    key = ("report", customer, data_day, profile_key(customer))
+    hit, rep = RESULTS.get(key)
+    if hit:
+        return rep
+    rep = _compute_report(customer, report_date, None, timings)
+    if rep is not None:
+        RESULTS.put(key, rep, RESULTS.ttl_for(data_day, get_profile(customer)["timezone"]))
+    return rep
+
+def _compute_report(customer: str, report_date, df_ytd_full: pd.DataFrame = None, timings: dict = None):
+    timings = timings if timings is not None else {}
+    data_day, month_start, ytd_start = report_window(report_date)
+
+    t0 = time.perf_counter()
+    if df_ytd_full is None:
+        # YTD window covers daily & MTD windows too, one row per day
+        df_ytd_full = load_period(customer, ytd_start, data_day, daily=True)
+    timings["load"] = time.perf_counter() - t0
+    if df_ytd_full.empty:
+        return None
+
+    t0 = time.perf_counter()
+    # clean_dataframe fills in place; loaded frames are shared via the result cache
+    df_clean, inverter_cols, irradiation_col = clean_dataframe(df_ytd_full.copy(), customer)
+    timings["clean"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    final_df, daily_gen, monthly_gen, ytd_gen, daily_irr, monthly_avg_irr = get_daily_monthly_yearly_data(
+        df_clean, inverter_cols, report_date, irradiation_col, customer
+    )
+    timings["aggregate"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    total_daily, total_mtd, plf_percent, total_ytd = calculate_kpis(customer, daily_gen, monthly_gen, ytd_gen)
+    timings["kpis"] = time.perf_counter() - t0
+
+    return {
+        "customer": customer,
+        "data_day": data_day,
+        "month_start": month_start,
+        "ytd_start": ytd_start,
+        "final_df": final_df,
+        "total_daily": total_daily,
+        "total_mtd": total_mtd,
+        "total_ytd": total_ytd,
+        "plf_percent": plf_percent,
+        "daily_irradiation": daily_irr,
+        "monthly_avg_irradiation": monthly_avg_irr,
+    }
+
+def intraday_chart(customer: str, data_day, points: int = 500, method: str = "lttb"):
+    """
+    Intraday curves of one data day, each series downsampled server-side to about
+    `points` samples: {"generation": long (ts, series, value) frame in kWh,
+    "irradiation": same or None}, or None without data. ts is plant local time.
+    Cached per (customer, day, points, method).
+    """
+    key = ("intraday", customer, data_day, points, method, profile_key(customer))
+    return RESULTS.get_or_compute(key, lambda: _intraday_chart(customer, data_day, points, method), data_day,
+                                  get_profile(customer)["timezone"])
+
+def _intraday_chart(customer: str, data_day, points: int, method: str):
+    raw = load_period(customer, data_day, data_day, typed=True)
+    if raw.empty:
+        return None
+    inverter_cols, irradiation_col, _ = detect_columns(raw.columns, customer)
+    if not inverter_cols:
+        return None
+    ts = raw["ts"].dt.tz_localize("UTC").dt.tz_convert(get_profile(customer)["timezone"]).dt.tz_localize(None)
+
+    values, names = _generation_values(raw, inverter_cols, customer)
+    gen = values.set_axis(names, axis=1).assign(ts=ts)
+    irr = None
+    if irradiation_col:
+        irr = downsample_frame(raw[[irradiation_col]].assign(ts=ts), [irradiation_col], points, method)
+    return {"generation": downsample_frame(gen, names, points, method), "irradiation": irr}
+
+def report_context(rep: dict, omi: dict) -> dict:
+    """CELL_MAP values for the Excel template (omi = dgr_manual_inputs doc or {})."""
+    return {
+        "date": str(rep["data_day"]),
+        "customer": rep["customer"],
+        "total_daily": float(rep["total_daily"]),
+        "total_mtd": float(rep["total_mtd"]),
+        "total_ytd": float(rep["total_ytd"]),
+        "plf_percent": f"{rep['plf_percent']:.2f}%",
+        "breakdown_hours": omi.get("breakdown_hours", 0),
+        "weather": omi.get("weather", ""),
+        "generation_hours": omi.get("generation_hours", 0),
+        "operating_hours": omi.get("operating_hours", 0),
+    }
+
+def inverter_rows(final_df: pd.DataFrame) -> list:
+    return list(zip(
+        final_df["Inverter"],
+        final_df["Daily Generation (kWh)"],
+        final_df["Monthly Generation (kWh)"],
+    ))
+
+def export_path(customer: str, data_day, out_dir: str = EXPORT_DIR) -> str:
+    return os.path.join(out_dir, f"{customer}_DGR_{data_day}.xlsx")
+
+def export_filename(customer: str, data_day) -> str:
+    return os.path.basename(export_path(customer, data_day))
+
+def locked_reports(reports, data_day, customers) -> set:
+    """Customers whose report for data_day the CRM already approved / sent: never reset to draft."""
+    return {d["customer"] for d in reports.find(
+        {"day": str(data_day), "customer": {"$in": list(customers)}, "status": {"$nin": ["draft", None]}},
+        {"customer": 1})}
+
+def draft_update(rep: dict, artifact_key: str = None, file_path: str = None):
+    """
+    (filter, update) pair for upserting the dgr_reports draft of a report.
+    The rendered .xlsx lives in the artifact store (services/artifacts.py); the
+    draft keeps its key so CRM / mailer never need local disk.
+    """
+    fields = {
+        "customer": rep["customer"],
+        "day": str(rep["data_day"]),
+        "kpis": {
+            "daily": float(rep["total_daily"]),
+            "mtd": float(rep["total_mtd"]),
+            "ytd": float(rep["total_ytd"]),
+            "plf": float(rep["plf_percent"])
+        },
+        "file_name": export_filename(rep["customer"], rep["data_day"]),
+        "file_path": file_path,
+        "artifact_key": artifact_key,
+        "status": "draft"
+    }
+    return (
+        {"customer": rep["customer"], "day": str(rep["data_day"])},
+        {"$set": fields},
+    )
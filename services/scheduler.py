@@ -0,0 +1,300 @@
+# services/scheduler.py
+# Pre-computes the previous day's DGR for every plant shortly after midnight
+# (plant timezone), so the first page view of the day is already warm:
+#   refresh dgr_daily_rollup -> compute_report (result / disk caches)
+#   -> render artifact -> upsert the dgr_reports draft
+# Every run is recorded in dgr_job_runs with per-plant durations.
+#
+#   python -m services.scheduler                 # standalone, runs forever
+#   python -m services.scheduler --catch-up 7    # run missed days of the last week, then exit
+#   python -m services.scheduler --once          # yesterday for every plant, now
+#
+# In-app: set SCHEDULER_ENABLED = true in secrets and app.py starts it in a
+# background thread. Run one scheduler per deployment (in-app or standalone).
+#
+# Secrets ([SCHEDULER] table, all optional):
+#   cron = "15 0 * * *"     minute hour day-of-month month day-of-week, plant local time
+#   catch_up_days = 3       missed days re-run when the scheduler starts
+#   workers = 4             plants computed concurrently
+import argparse
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from util.data_loader import list_customers, mongo, refresh_daily_rollup
+from util.profiles import get_profile
+from util.ts_normalize import zone
+from services.artifacts import render_artifact
+from services.report import (
+    TEMPLATE_PATH, compute_report, report_context, inverter_rows, export_filename, draft_update,
+    locked_reports,
+)
+
+JOB_NAME = "precompute_dgr"
+RUNS_COLLECTION = "dgr_job_runs"
+DEFAULTS = {"cron": "15 0 * * *", "catch_up_days": 3, "workers": 4}
+STALE_RUN = timedelta(hours=2)  # a "running" record older than this is treated as dead
+
+# ----------------------------
+# Cron expressions
+# ----------------------------
+_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+def _parse_field(text: str, lo: int, hi: int) -> set:
+    values = set()
+    for part in text.split(","):
+        rng, _, step = part.partition("/")
+        if rng == "*":
+            a, b = lo, hi
+        elif "-" in rng:
+            a, b = (int(x) for x in rng.split("-"))
+        else:
+            a = b = int(rng)
+            if step:
+                b = hi
+        if not (lo <= a <= b <= hi):
+            raise ValueError(f"cron field {part!r} out of range {lo}-{hi}")
+        values.update(range(a, b + 1, int(step or 1)))
+    return values
+
+class Cron:
+    """Five-field cron expression (day-of-week 0 = Sunday; 7 is accepted as Sunday too)."""
+
+    def __init__(self, spec: str):
+        parts = spec.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron needs 5 fields, got {spec!r}")
+        self.spec = spec
+        self.minute, self.hour, self.dom, self.month, dow = (
+            _parse_field(p, lo, hi) for p, (lo, hi) in zip(parts, _FIELDS)
+        )
+        self.dow = {d % 7 for d in dow}
+        self._any_dom = parts[2] == "*"
+        self._any_dow = parts[4] == "*"
+
+    def matches(self, t: datetime) -> bool:
+        if t.minute not in self.minute or t.hour not in self.hour or t.month not in self.month:
+            return False
+        dom_ok = t.day in self.dom
+        dow_ok = (t.isoweekday() % 7) in self.dow
+        if self._any_dom or self._any_dow:
+            return dom_ok and dow_ok
+        return dom_ok or dow_ok  # classic cron: either day field may match
+
+    def fired_since(self, start: datetime, end: datetime) -> bool:
+        """True if a scheduled minute falls in [start, end]."""
+        t = start.replace(second=0, microsecond=0)
+        while t <= end:
+            if self.matches(t):
+                return True
+            t += timedelta(minutes=1)
+        return False
+
+# ----------------------------
+# Job history
+# ----------------------------
+_indexed = False
+
+def _runs():
+    global _indexed
+    coll = mongo()[RUNS_COLLECTION]
+    if not _indexed:
+        coll.create_index([("job", ASCENDING), ("tz", ASCENDING), ("data_day", DESCENDING)])
+        _indexed = True
+    return coll
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def already_done(tz: str, data_day: date) -> bool:
+    """A successful run exists, or one is still running (and not stale)."""
+    return _runs().find_one({
+        "job": JOB_NAME, "tz": tz, "data_day": str(data_day),
+        "$or": [{"status": {"$in": ["ok", "partial"]}},
+                {"status": "running", "started_at": {"$gt": _now() - STALE_RUN}}],
+    }) is not None
+
+def recent_runs(limit: int = 20) -> list:
+    return list(_runs().find({"job": JOB_NAME}).sort("started_at", DESCENDING).limit(limit))
+
+# ----------------------------
+# One run
+# ----------------------------
+def _precompute_plant(customer: str, report_date: date, omi: dict) -> dict:
+    t0 = time.perf_counter()
+    out = {"customer": customer, "error": None, "update": None}
+    try:
+        refresh_daily_rollup(customer)
+        rep = compute_report(customer, report_date)
+        if rep is None:
+            out["error"] = "no data"
+        else:
+            key, _ = render_artifact(TEMPLATE_PATH, report_context(rep, omi), inverter_rows(rep["final_df"]),
+                                     file_name=export_filename(customer, rep["data_day"]))
+            out["update"] = draft_update(rep, key)
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+        out["trace"] = traceback.format_exc(limit=5)
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+def run_precompute(data_day: date, customers: list, tz: str = "UTC", workers: int = 4,
+                   catch_up: bool = False) -> dict:
+    """Compute, render and store drafts for `customers`; returns the job history record."""
+    db = mongo()
+    report_date = data_day + timedelta(days=1)
+    run = {"job": JOB_NAME, "tz": tz, "data_day": str(data_day), "customers": list(customers),
+           "catch_up": catch_up, "status": "running", "started_at": _now()}
+    run_id = _runs().insert_one(run).inserted_id
+    t0 = time.perf_counter()
+
+    omi = {d["customer"]: d for d in db["dgr_manual_inputs"].find(
+        {"day": str(data_day), "customer": {"$in": list(customers)}}, {"_id": 0})}
+    # never push a report the CRM has already approved / sent back to draft
+    locked = locked_reports(db["dgr_reports"], data_day, customers)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda c: _precompute_plant(c, report_date, omi.get(c, {})), customers))
+
+    ops = [UpdateOne(*r["update"], upsert=True) for r in results
+           if r["update"] and r["customer"] not in locked]
+    if ops:
+        db["dgr_reports"].bulk_write(ops, ordered=False)
+
+    failed = [r for r in results if r["error"] and r["error"] != "no data"]
+    status = "ok" if not failed else ("failed" if len(failed) == len(results) else "partial")
+    summary = {
+        "status": status,
+        "finished_at": _now(),
+        "duration_s": round(time.perf_counter() - t0, 3),
+        "drafts_written": len(ops),
+        "plants": [{k: r.get(k) for k in ("customer", "seconds", "error")}
+                   for r in results],
+    }
+    _runs().update_one({"_id": run_id}, {"$set": summary})
+    return {**run, **summary, "_id": run_id}
+
+# ----------------------------
+# Scheduling
+# ----------------------------
+def load_config() -> dict:
+    cfg = dict(DEFAULTS)
+    try:
+        import streamlit as st
+        cfg.update(st.secrets.get("SCHEDULER", {}))
+    except Exception:
+        pass
+    return cfg
+
+def plants_by_timezone(customers=None) -> dict:
+    groups = {}
+    for c in customers or list_customers():
+        groups.setdefault(get_profile(c)["timezone"], []).append(c)
+    return groups
+
+def _local_now(tz: str) -> datetime:
+    return datetime.now(zone(tz)).replace(tzinfo=None)
+
+def missed_days(cron: Cron, tz: str, days: int) -> list:
+    """Data days within the last `days` whose scheduled run should already have happened."""
+    now = _local_now(tz)
+    today = now.date()
+    out = [today - timedelta(days=i) for i in range(days, 1, -1)]
+    # yesterday's figures are due once today's first scheduled minute has passed
+    if cron.fired_since(datetime.combine(today, datetime.min.time()), now):
+        out.append(today - timedelta(days=1))
+    return [d for d in out if not already_done(tz, d)]
+
+def catch_up(cfg: dict = None, days: int = None, log=print) -> list:
+    cfg = cfg or load_config()
+    cron = Cron(cfg["cron"])
+    days = cfg["catch_up_days"] if days is None else days
+    runs = []
+    for tz, customers in plants_by_timezone().items():
+        for d in missed_days(cron, tz, days):
+            log(f"[scheduler] catch-up {d} ({tz}): {len(customers)} plant(s)")
+            runs.append(run_precompute(d, customers, tz, cfg["workers"], catch_up=True))
+    return runs
+
+class Scheduler:
+    """Wakes every minute and runs the job for each timezone whose local time matches the cron."""
+
+    def __init__(self, cfg: dict = None, log=print):
+        self.cfg = cfg or load_config()
+        self.cron = Cron(self.cfg["cron"])
+        self.log = log
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tick(self):
+        for tz, customers in plants_by_timezone().items():
+            now = _local_now(tz)
+            if not self.cron.matches(now):
+                continue
+            data_day = now.date() - timedelta(days=1)
+            if already_done(tz, data_day):
+                continue
+            run = run_precompute(data_day, customers, tz, self.cfg["workers"])
+            self.log(f"[scheduler] {data_day} ({tz}): {run['status']} in {run['duration_s']:.1f}s")
+
+    def run_forever(self):
+        try:
+            catch_up(self.cfg, log=self.log)
+        except Exception:
+            self.log(traceback.format_exc())
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                self.log(traceback.format_exc())
+            # sleep to the start of the next minute
+            self._stop.wait(60 - time.time() % 60 + 0.5)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="dgr-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_in_background() -> Scheduler:
+    """Process-wide scheduler thread (idempotent; safe to call on every script run)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler().start()
+        return _scheduler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-compute previous-day DGR drafts on a schedule.")
+    parser.add_argument("--once", action="store_true", help="Run yesterday (plant time) now and exit")
+    parser.add_argument("--catch-up", type=int, metavar="DAYS", help="Run missed days of the last DAYS and exit")
+    parser.add_argument("--cron", help="Override the cron expression")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    if args.cron:
+        cfg["cron"] = args.cron
+    if args.once:
+        for tz, customers in plants_by_timezone().items():
+            run = run_precompute(_local_now(tz).date() - timedelta(days=1), customers, tz, cfg["workers"])
+            print(f"{run['data_day']} ({tz}): {run['status']} in {run['duration_s']:.1f}s")
+            for p in run["plants"]:
+                print(f"  {p['customer']:<12}{p['seconds']:>8.2f}s  {p['error'] or 'ok'}")
+    elif args.catch_up is not None:
+        runs = catch_up(cfg, args.catch_up)
+        print(f"{len(runs)} catch-up run(s)")
+    else:
+        Scheduler(cfg).run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# tests/test_agg.py
+# Regression: the vectorized range engine matches the original per-report-date logic.
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.agg import get_daily_monthly_yearly_data, get_daily_monthly_yearly_range, summary_table
+
+INVERTERS = ["Daily_Generation_INV1", "Daily_Generation_INV2"]
+IRRADIATION = "POA_Irradiation"
+
+def baseline(df, inverter_cols, report_date, irradiation_col=None, customer=None):
+    """The per-day implementation get_daily_monthly_yearly_data() had before the range engine."""
+    df = df.copy()
+    data_day = pd.to_datetime(report_date) - pd.Timedelta(days=1)
+    data_day_str = data_day.strftime("%Y-%m-%d")
+    month_start = pd.Timestamp(year=data_day.year, month=data_day.month, day=1)
+    ytd_start = pd.Timestamp(year=data_day.year, month=1, day=1)
+
+    if customer == "PGCIL":
+        inverter_cols = ["Total_Daily_Generation_kWh"]
+        df["Total_Daily_Generation_kWh"] = df["Total_Daily_Generation"].fillna(0) * 1000
+        inverter_names = ["Total_Meter_Generation"]
+    else:
+        inverter_names = [f"Inverter-{i+1}" for i in range(len(inverter_cols))]
+
+    daily_row = df.loc[df["day"] == data_day_str]
+    daily_generation = (daily_row[inverter_cols].iloc[0] if not daily_row.empty
+                        else pd.Series([0] * len(inverter_cols), index=inverter_cols))
+
+    df["day_dt"] = pd.to_datetime(df["day"])
+    df_mtd = df[(df["day_dt"] >= month_start) & (df["day_dt"] <= data_day)].copy()
+    merged_mtd = pd.DataFrame({"day_dt": pd.date_range(month_start, data_day)}).merge(df_mtd, on="day_dt", how="left")
+    df_ytd = df[(df["day_dt"] >= ytd_start) & (df["day_dt"] <= data_day)].copy()
+
+    daily_irradiation = monthly_avg_irradiation = None
+    if irradiation_col:
+        daily_irradiation = daily_row[irradiation_col].iloc[0] if not daily_row.empty else 0
+        monthly_avg_irradiation = merged_mtd[irradiation_col].fillna(0).mean()
+
+    monthly_generation = merged_mtd[inverter_cols].fillna(0).sum()
+    ytd_generation = df_ytd[inverter_cols].fillna(0).sum()
+    final_df = summary_table(inverter_names, daily_generation, monthly_generation, ytd_generation)
+    return final_df, daily_generation, monthly_generation, ytd_generation, daily_irradiation, monthly_avg_irradiation
+
+@pytest.fixture
+def frame():
+    """Feb-Apr 2025 with gaps, NaNs and days holding several rows (first row wins for Daily)."""
+    rng = np.random.default_rng(7)
+    days = [date(2025, 2, 1) + timedelta(days=i) for i in range(80)]
+    days = [d for d in days if d.day not in (3, 17) and d != date(2025, 3, 1)]  # gaps, incl. a month start
+    rows = [d for d in days for _ in range(rng.integers(1, 4))]
+    df = pd.DataFrame({"day": [str(d) for d in rows]})
+    for c in INVERTERS + ["Total_Daily_Generation", IRRADIATION]:
+        v = rng.uniform(0, 500, len(df)).round(2)
+        v[rng.random(len(df)) < 0.1] = np.nan
+        df[c] = v
+    return df
+
+REPORT_DATES = [date(2025, 2, 2), date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 18),
+                date(2025, 4, 1), date(2025, 4, 21), date(2025, 4, 25)]
+
+@pytest.mark.parametrize("customer, cols", [(None, INVERTERS), ("PGCIL", ["Total_Daily_Generation"])])
+def test_single_day_matches_baseline(frame, customer, cols):
+    for report_date in REPORT_DATES:
+        got = get_daily_monthly_yearly_data(frame, cols, report_date, IRRADIATION, customer)
+        want = baseline(frame, cols, report_date, IRRADIATION, customer)
+        pd.testing.assert_frame_equal(got[0], want[0], check_dtype=False)
+        for g, w in zip(got[1:4], want[1:4]):
+            np.testing.assert_allclose(g.to_numpy(dtype=float), w.to_numpy(dtype=float))
+        assert got[4] == pytest.approx(want[4], nan_ok=True)
+        assert got[5] == pytest.approx(want[5])
+
+def test_range_matches_baseline_for_every_day(frame):
+    start, end = date(2025, 2, 20), date(2025, 4, 20)
+    res = get_daily_monthly_yearly_range(frame, INVERTERS, start, end, IRRADIATION)
+    assert res["daily"].index[0] == pd.Timestamp(start) and res["daily"].index[-1] == pd.Timestamp(end)
+
+    for day in res["daily"].index:
+        want = baseline(frame, INVERTERS, day + pd.Timedelta(days=1), IRRADIATION)
+        np.testing.assert_allclose(res["daily"].loc[day].to_numpy(dtype=float), want[1].to_numpy(dtype=float))
+        np.testing.assert_allclose(res["mtd"].loc[day].to_numpy(dtype=float), want[2].to_numpy(dtype=float))
+        np.testing.assert_allclose(res["ytd"].loc[day].to_numpy(dtype=float), want[3].to_numpy(dtype=float))
+        assert res["monthly_avg_irradiation"].loc[day] == pytest.approx(want[5])
+
+def test_input_frame_is_not_mutated(frame):
+    before = frame.copy()
+    get_daily_monthly_yearly_data(frame, ["Total_Daily_Generation"], date(2025, 3, 18), IRRADIATION, "PGCIL")
+    pd.testing.assert_frame_equal(frame, before)
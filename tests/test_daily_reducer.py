@@ -0,0 +1,62 @@
+# tests/test_daily_reducer.py
+# DailyReducer fed in shuffled batches must match a plain pandas groupby over all samples.
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+os.environ.setdefault("DGR_MONGO_URI", "mongodb://localhost:27017")
+
+from util.data_loader import DailyReducer  # noqa: E402
+
+COLS = ["INV1", "INV2"]
+TZ = "Asia/Kolkata"
+
+@pytest.fixture
+def samples():
+    """Three local days of 10-minute samples, ~20% of values missing."""
+    rng = np.random.default_rng(3)
+    ts = pd.date_range("2025-03-01 18:00", "2025-03-04 06:00", freq="10min", tz="UTC")
+    df = pd.DataFrame({"ts": ts.as_unit("ms").asi8})
+    for c in COLS:
+        v = rng.uniform(0, 100, len(df))
+        v[rng.random(len(df)) < 0.2] = np.nan
+        df[c] = v
+    return df
+
+def reference(df: pd.DataFrame, how: str) -> pd.DataFrame:
+    local = pd.to_datetime(df["ts"], unit="ms", utc=True).dt.tz_convert(TZ)
+    g = df.assign(day=local.dt.strftime("%Y-%m-%d")).sort_values("ts").groupby("day")
+    out = g[COLS].max() if how == "max" else g[COLS].last()  # last() skips NaN
+    out["ts"] = g["ts"].max().to_numpy().view("datetime64[ms]")
+    out["rows"] = g.size()
+    return out.reset_index()
+
+def reduce(df: pd.DataFrame, how: str, batch: int) -> pd.DataFrame:
+    r = DailyReducer(COLS, how, TZ)
+    for i in range(0, len(df), batch):
+        part = df.iloc[i:i + batch]
+        r.add(part["ts"].to_numpy(), {c: part[c].to_numpy() for c in COLS})
+    return r.result()
+
+@pytest.mark.parametrize("how", ["max", "last"])
+@pytest.mark.parametrize("seed", range(5))
+def test_shuffled_batches_match_groupby(samples, how, seed):
+    shuffled = samples.sample(frac=1, random_state=seed).reset_index(drop=True)
+    got = reduce(shuffled, how, batch=37)
+    pd.testing.assert_frame_equal(got[["day"] + COLS + ["ts", "rows"]], reference(samples, how),
+                                  check_dtype=False)
+
+def test_last_is_not_shadowed_by_a_newer_row_without_the_column():
+    r = DailyReducer(COLS, "last")
+    t0 = pd.Timestamp("2025-03-01 10:00", tz="UTC").value // 10**6
+    r.add(np.array([t0]), {"INV1": np.array([5.0]), "INV2": np.array([7.0])})
+    r.add(np.array([t0 + 60_000]), {"INV1": np.array([6.0]), "INV2": np.array([np.nan])})
+    out = r.result().iloc[0]
+    assert (out["INV1"], out["INV2"], out["rows"]) == (6.0, 7.0, 2)
+
+def test_empty_and_unknown_reduction():
+    assert DailyReducer(COLS).result().empty
+    with pytest.raises(ValueError):
+        DailyReducer(COLS, "sum")
@@ -0,0 +1,73 @@
+# tests/test_disk_cache.py
+# Regression: windows loaded out of order must not leave holes served as cached.
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+os.environ.setdefault("DGR_MONGO_URI", "mongodb://localhost:27017")
+
+from util import data_loader, disk_cache  # noqa: E402
+
+CUSTOMER = "TMD"
+
+def _days(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    """_load_daily_cached() over a stubbed _load_daily: one row per day, data up to Jun 30."""
+    monkeypatch.setattr(disk_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "enabled", lambda: True)
+    fetched = []
+
+    def fake_load_daily(customer, coll_name, start, end):
+        fetched.append((start, end))
+        days = [d for d in _days(start, end) if d <= date(2025, 6, 30)]
+        return pd.DataFrame({
+            "day": [str(d) for d in days],
+            "ts": [pd.Timestamp(d) + pd.Timedelta(hours=12) for d in days],
+            "rows": 1,
+            "INV1": [float(d.toordinal()) for d in days],
+        })
+
+    monkeypatch.setattr(data_loader, "_load_daily", fake_load_daily)
+    load = lambda s, e: data_loader._load_daily_cached(CUSTOMER, "tmd_data", s, e)
+    return load, fetched
+
+def test_non_contiguous_windows_are_not_served_as_cached(loader):
+    load, fetched = loader
+    load(date(2025, 3, 1), date(2025, 3, 31))
+    load(date(2025, 6, 1), date(2025, 6, 29))
+
+    april = load(date(2025, 4, 1), date(2025, 4, 30))
+    assert list(april["day"]) == [str(d) for d in _days(date(2025, 4, 1), date(2025, 4, 30))]
+
+    fetched.clear()
+    df = load(date(2025, 3, 1), date(2025, 6, 29))
+    assert list(df["day"]) == [str(d) for d in _days(date(2025, 3, 1), date(2025, 6, 29))]
+    # May was never loaded; Mar 31 / Jun 29 were the watermark day when fetched
+    assert fetched == [
+        (date(2025, 3, 31), date(2025, 3, 31)),
+        (date(2025, 5, 1), date(2025, 5, 31)),
+        (date(2025, 6, 29), date(2025, 6, 29)),
+    ]
+
+def test_watermark_day_stays_open(loader):
+    load, fetched = loader
+    load(date(2025, 6, 1), date(2025, 6, 30))
+    assert disk_cache.coverage(CUSTOMER) == [(date(2025, 6, 1), date(2025, 6, 29))]
+    fetched.clear()
+    load(date(2025, 6, 1), date(2025, 6, 30))
+    assert fetched == [(date(2025, 6, 30), date(2025, 6, 30))]
+
+def test_invalidate_month_drops_only_that_month(loader):
+    load, fetched = loader
+    load(date(2025, 3, 1), date(2025, 5, 31))
+    disk_cache.invalidate(CUSTOMER, "2025-04")
+    fetched.clear()
+    df = load(date(2025, 3, 1), date(2025, 5, 31))
+    assert len(df) == 92
+    assert fetched == [(date(2025, 4, 1), date(2025, 4, 30)), (date(2025, 5, 31), date(2025, 5, 31))]
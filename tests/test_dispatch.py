@@ -0,0 +1,73 @@
+# tests/test_dispatch.py
+# Regression: Mongo errors must not kill a worker, lose a job or resend a delivered mail.
+import pytest
+from pymongo.errors import AutoReconnect
+
+mongomock = pytest.importorskip("mongomock")
+
+from services import dispatch  # noqa: E402
+from services.dispatch import MailDispatcher  # noqa: E402
+
+class FlakyReports:
+    """mongomock collection; the first `fail[status]` writes of that delivery status raise AutoReconnect."""
+    def __init__(self):
+        self.coll = mongomock.MongoClient()["scada_db"]["dgr_reports"]
+        self.fail = {}
+
+    def update_one(self, flt, update, **kwargs):
+        status = update["$set"].get("delivery.status")
+        if self.fail.get(status):
+            self.fail[status] -= 1
+            raise AutoReconnect("primary stepped down")
+        return self.coll.update_one(flt, update, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.coll, name)
+
+class FakeSMTP:
+    def __init__(self, sent):
+        self.sent = sent
+
+    def noop(self):
+        return (250, b"ok")
+
+    def send_message(self, msg):
+        self.sent.append(msg)
+
+    def quit(self):
+        pass
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    monkeypatch.setattr(dispatch, "build_report_email", lambda to, subject, body, att, name: (to, att))
+    reports, sent = FlakyReports(), []
+    reports.coll.insert_one({"_id": 1, "status": "approved", "file_path": "DGR_TMD.xlsx"})
+    d = MailDispatcher(reports=reports, workers=1, backoff=0.01, idle_close=0.05,
+                       connect=lambda: FakeSMTP(sent)).start()
+    yield d, reports, sent
+    d.stop()
+
+def test_mongo_error_before_sending_is_retried(dispatcher):
+    d, reports, sent = dispatcher
+    reports.fail = {"sending": 1}
+    d.enqueue(1, ["ops@example.com"])
+
+    assert d.drain(5)
+    assert len(sent) == 1
+    assert d.stats()["workers"] == 1
+    assert reports.coll.find_one({"_id": 1})["delivery"]["status"] == "sent"
+
+def test_unsaved_outcome_is_written_later_not_resent(dispatcher):
+    d, reports, sent = dispatcher
+    reports.fail = {"sent": 10 ** 6}  # Mongo refuses the outcome write
+    d.enqueue(1, ["ops@example.com"])
+    assert d.drain(5)
+    assert d.stats()["unsaved"] == 1
+
+    assert d.recover_stale(stale_after=0) == 0  # "sending" in Mongo, but ours and delivered
+    reports.fail = {}
+    d.stop()  # flushes what is still unsaved
+    assert len(sent) == 1
+    assert d.stats()["unsaved"] == 0
+    doc = reports.coll.find_one({"_id": 1})
+    assert doc["status"] == "sent" and doc["delivery"]["status"] == "sent"
@@ -0,0 +1,47 @@
+# tests/test_manual_inputs.py
+# Regression: blank days are reported, duplicated documents do not block saving.
+import io
+from datetime import date
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+
+mongomock = pytest.importorskip("mongomock")
+
+from services import manual_inputs  # noqa: E402
+
+CUSTOMERS = ["TMD", "PGCIL"]
+
+@pytest.mark.parametrize("day", [None, float("nan"), "", "  ", pd.NaT])
+def test_blank_day_is_reported(day):
+    df = pd.DataFrame([{"customer": "TMD", "day": day, "notes": "inverter trip"}])
+    records, errors = manual_inputs.validate(df, CUSTOMERS)
+    assert records == []
+    assert errors == ["row 1: invalid day (empty)"]
+
+def test_csv_row_with_blank_day():
+    csv = io.StringIO("customer,day,breakdown_hours,notes\n"
+                      "TMD,2025-03-01,1.5,\n"
+                      "TMD,,2,grid outage\n"
+                      "PGCIL,not a day,,x\n")
+    records, errors = manual_inputs.validate(pd.read_csv(csv), CUSTOMERS)
+    assert [r["day"] for r in records] == ["2025-03-01"]
+    assert errors == ["row 2: invalid day (empty)", "row 3: invalid day 'not a day'"]
+
+def test_duplicated_documents_prefetch_once_and_save():
+    coll = mongomock.MongoClient()["scada_db"][manual_inputs.COLLECTION]
+    coll.insert_many([
+        {"_id": ObjectId("000000000000000000000001"), "customer": "TMD", "day": "2025-03-01", "notes": "old"},
+        {"_id": ObjectId("000000000000000000000002"), "customer": "TMD", "day": "2025-03-01", "notes": "new"},
+    ])
+    day = date(2025, 3, 1)
+
+    grid = manual_inputs.prefetch(coll, CUSTOMERS, day, day)
+    assert len(grid) == 2
+    assert grid.set_index("customer").loc["TMD", "notes"] == "new"
+
+    grid.loc[grid["customer"] == "TMD", "breakdown_hours"] = 2.0
+    records, errors = manual_inputs.validate(grid, CUSTOMERS)
+    assert errors == []
+    assert manual_inputs.changed(records, manual_inputs.prefetch(coll, CUSTOMERS, day, day)) == records
@@ -0,0 +1,78 @@
+# tests/test_rollup.py
+# Regression: days before the first rollup refresh are not covered by dgr_daily_rollup.
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+os.environ.setdefault("DGR_MONGO_URI", "mongodb://localhost:27017")
+
+from util import data_loader  # noqa: E402
+
+CUSTOMER = "TMD"
+
+def _days(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+def _rows(start: date, end: date):
+    return [{"day": str(d), "ts": datetime(d.year, d.month, d.day, 12), "rows": 1,
+             "INV1": float(d.toordinal())} for d in _days(start, end)]
+
+@pytest.fixture
+def rollup(monkeypatch):
+    """mongomock database; raw data up to Jan 10 2026, raw fetches recorded."""
+    db = mongomock.MongoClient()["scada_db"]
+    monkeypatch.setattr(data_loader, "mongo", lambda: db)
+    monkeypatch.setattr(data_loader, "DAILY_REDUCER", "server")
+    # mongomock's bulk_write predates pymongo's UpdateOne(sort=...)
+    monkeypatch.setattr(mongomock.Collection, "bulk_write", lambda self, ops, ordered=True: [
+        self.update_one(op._filter, op._doc, upsert=op._upsert) for op in ops])
+    last_raw = date(2026, 1, 10)
+
+    def fake_docs(coll, customer, start_day, end_day, how="max"):
+        s = datetime.strptime(start_day, "%Y-%m-%d").date()
+        e = min(datetime.strptime(end_day, "%Y-%m-%d").date(), last_raw)
+        return _rows(s, e), ["INV1"], []
+
+    fetched = []
+
+    def fake_fetch(coll_name, start_str, end_str, customer=None):
+        s = datetime.strptime(start_str, "%d-%b-%Y").date()
+        e = datetime.strptime(end_str, "%d-%b-%Y").date()
+        fetched.append((s, e))
+        return pd.DataFrame(_rows(s, min(e, last_raw)))
+
+    monkeypatch.setattr(data_loader, "_daily_rollup_docs", fake_docs)
+    monkeypatch.setattr(data_loader, "fetch_daily_rollup", fake_fetch)
+    return db, fetched
+
+def test_window_before_first_refresh_comes_from_raw(rollup):
+    db, fetched = rollup
+    assert data_loader.refresh_daily_rollup(CUSTOMER, since=date(2026, 1, 1)) == 10
+    assert db[data_loader.ROLLUP_STATE_COLLECTION].find_one()["first_day"] == "2026-01-01"
+
+    df = data_loader._load_daily(CUSTOMER, "tmd_data", date(2025, 12, 20), date(2026, 1, 5))
+
+    # Dec 20-31 were never rolled up; Jan 1-5 are stored and closed
+    assert fetched == [(date(2025, 12, 20), date(2025, 12, 31))]
+    assert list(df["day"]) == [str(d) for d in _days(date(2025, 12, 20), date(2026, 1, 5))]
+
+def test_window_entirely_before_first_refresh(rollup):
+    db, fetched = rollup
+    data_loader.refresh_daily_rollup(CUSTOMER, since=date(2026, 1, 1))
+
+    df = data_loader._load_daily(CUSTOMER, "tmd_data", date(2025, 12, 1), date(2025, 12, 16))
+
+    assert fetched == [(date(2025, 12, 1), date(2025, 12, 16))]
+    assert len(df) == 16
+
+def test_watermark_day_and_prefix_both_come_from_raw(rollup):
+    db, fetched = rollup
+    data_loader.refresh_daily_rollup(CUSTOMER, since=date(2026, 1, 1))
+
+    df = data_loader._load_daily(CUSTOMER, "tmd_data", date(2025, 12, 30), date(2026, 1, 10))
+
+    assert fetched == [(date(2025, 12, 30), date(2025, 12, 31)), (date(2026, 1, 10), date(2026, 1, 10))]
+    assert list(df["day"]) == [str(d) for d in _days(date(2025, 12, 30), date(2026, 1, 10))]
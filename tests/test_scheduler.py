@@ -0,0 +1,48 @@
+# tests/test_scheduler.py
+# Cron parsing / matching used by the precompute scheduler.
+import os
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault("DGR_MONGO_URI", "mongodb://localhost:27017")
+
+from services.scheduler import Cron  # noqa: E402
+
+def test_fields_ranges_steps_and_lists():
+    c = Cron("*/15 6-8 1,15 * 1-5")
+    assert c.minute == {0, 15, 30, 45}
+    assert c.hour == {6, 7, 8}
+    assert c.dom == {1, 15}
+    assert c.month == set(range(1, 13))
+    assert c.dow == {1, 2, 3, 4, 5}
+
+def test_step_from_a_single_value_runs_to_the_end():
+    assert Cron("5/20 * * * *").minute == {5, 25, 45}
+
+def test_sunday_is_0_and_7():
+    assert Cron("0 0 * * 7").dow == Cron("0 0 * * 0").dow == {0}
+    assert Cron("30 6 * * 0").matches(datetime(2025, 11, 9, 6, 30))      # a Sunday
+    assert not Cron("30 6 * * 0").matches(datetime(2025, 11, 10, 6, 30))  # Monday
+
+def test_day_fields_match_either_when_both_restricted():
+    c = Cron("0 6 1 * 1")  # the 1st, or any Monday
+    assert c.matches(datetime(2025, 11, 1, 6, 0))   # Saturday the 1st
+    assert c.matches(datetime(2025, 11, 10, 6, 0))  # Monday the 10th
+    assert not c.matches(datetime(2025, 11, 11, 6, 0))
+
+def test_day_fields_both_required_when_one_is_any():
+    c = Cron("0 6 1 * *")
+    assert c.matches(datetime(2025, 11, 1, 6, 0))
+    assert not c.matches(datetime(2025, 11, 10, 6, 0))
+
+def test_fired_since():
+    c = Cron("30 6 * * *")
+    assert c.fired_since(datetime(2025, 11, 7, 6, 29, 30), datetime(2025, 11, 7, 6, 30))
+    assert not c.fired_since(datetime(2025, 11, 7, 6, 31), datetime(2025, 11, 8, 6, 29))
+
+@pytest.mark.parametrize("spec", ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *",
+                                  "* * * * 8", "5-1 * * * *", "x * * * *"])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        Cron(spec)
@@ -0,0 +1,77 @@
+# tests/test_singleflight.py
+# Concurrent identical loads run once; errors and timeouts reach every waiter.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from util.singleflight import SingleFlight
+
+def _wait_until(pred, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+def _leader_running(sf, key, fn):
+    """Start sf.do(key, fn) in a thread and return once it is in flight."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    fut = pool.submit(sf.do, key, fn)
+    _wait_until(lambda: key in sf.in_flight())
+    pool.shutdown(wait=False)
+    return fut
+
+def test_concurrent_callers_share_one_call():
+    sf, release, calls = SingleFlight(), threading.Event(), []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return {"rows": 42}
+
+    leader = _leader_running(sf, "k", load)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        followers = [pool.submit(sf.do, "k", load) for _ in range(4)]
+        _wait_until(lambda: sf.in_flight().get("k") == 4)
+        release.set()
+        results = [f.result(5) for f in followers] + [leader.result(5)]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert sf.stats() == {"leaders": 1, "coalesced": 4, "timeouts": 0, "errors": 0, "in_flight": 0}
+
+def test_leader_error_is_raised_in_followers():
+    sf, release = SingleFlight(), threading.Event()
+
+    def load():
+        release.wait(5)
+        raise RuntimeError("mongo down")
+
+    leader = _leader_running(sf, "k", load)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        follower = pool.submit(sf.do, "k", lambda: "never called")
+        _wait_until(lambda: sf.in_flight().get("k") == 1)
+        release.set()
+        with pytest.raises(RuntimeError, match="mongo down"):
+            follower.result(5)
+    with pytest.raises(RuntimeError):
+        leader.result(5)
+    assert sf.stats()["errors"] == 1
+    assert sf.do("k", lambda: "fresh") == "fresh"  # a failed call is not cached
+
+def test_follower_times_out_while_leader_is_busy():
+    sf, release = SingleFlight(timeout=0.05), threading.Event()
+    leader = _leader_running(sf, "k", lambda: release.wait(5) and "done")
+    with pytest.raises(TimeoutError):
+        sf.do("k", lambda: "never called")
+    release.set()
+    assert leader.result(5) == "done"
+    assert sf.stats()["timeouts"] == 1
+
+def test_different_keys_do_not_wait():
+    sf, release = SingleFlight(), threading.Event()
+    leader = _leader_running(sf, "a", lambda: release.wait(5))
+    assert sf.do("b", lambda: "b") == "b"
+    release.set()
+    leader.result(5)
@@ -1,63 +1,131 @@
 # util/agg.py
 import pandas as pd
 
+from util.profiles import PLANT_PROFILES, TMD_INVERTER_COLS, get_profile, resolve_columns
+from util.metrics import timed
+
 # ----------------------------
-# Your configuration constants
+# Your configuration constants (views over util/profiles.py)
 # ----------------------------
-CUSTOMER_INVERTERS = {
-    "Imagica": 18, "BEL2": 1, "BEL1": 1, "Caspro": 11, "Dunung": 13, "Kasturi": 23,
-    "Mauryaa": 13, "Paranjape": 19, "Vinathi_3": 25, "Vinathi_4": 15, "TMD": 9,
-    "PGCIL": 32, "Vinathi_2": 2
-}
-
-PLF_BASE = {
-    "Imagica": 3.06, "PGCIL": 26.56, "TMD": 10, "BEL2": 20, "Caspro": 3.05, "Dunung": 3.08,
-    "Kasturi": 3.00, "Paranjape": 2.11, "Mauryaa": 3.08, "Vinathi_3": 3.00, "Vinathi_4": 3.07,
-    "BEL1": 10.00, "Vinathi_2": 25.00
-}
-
-TMD_INVERTER_COLS = [
-    "T1_CIS01_INV1_1_GenPowerToday","T1_CIS01_INV1_2_GenPowerToday","T1_CIS01_INV1_3_GenPowerToday",
-    "T1_CIS01_INV1_4_GenPowerToday","T1_CIS02_INV1_1_GenPowerToday","T1_CIS02_INV1_2_GenPowerToday",
-    "T1_CIS02_INV1_3_GenPowerToday","T2_INV1_GenPowerToday","T2_INV2_GenPowerToday"
-]
+CUSTOMER_INVERTERS = {c: p["inverters"] for c, p in PLANT_PROFILES.items()}
+PLF_BASE = {c: p["plf_base"] for c, p in PLANT_PROFILES.items()}
 
 # ----------------------------
 # Clean + detect (from your code)
 # ----------------------------
+def detect_columns(columns, customer: str):
+    """
+    Pick generation + irradiation columns for a customer from a list of field names,
+    driven by the customer's plant profile (selection cached per column schema).
+    Shared by clean_dataframe (pandas side) and the server-side daily rollup.
+    """
+    inverter_cols, irradiation_col, irradiation_cols = resolve_columns(customer, tuple(columns))
+    return list(inverter_cols), irradiation_col, list(irradiation_cols)
+
+@timed("clean_dataframe")
 def clean_dataframe(df: pd.DataFrame, customer: str):
     """Clean and prepare data for generation and irradiation analysis."""
-    if customer == "TMD":
-        inverter_cols = [c for c in TMD_INVERTER_COLS if c in df.columns]
-    elif customer in ["BEL2", "BEL1"]:
-        inverter_cols = [c for c in df.columns if "Meter_Generation" in c]
-    elif customer == "PGCIL":
-        inverter_cols = ["Total_Daily_Generation"]
-    else:
-        inverter_cols = [
-            c for c in df.columns if any([
-                c.startswith("Daily_Generation"),
-                c.startswith("Daily_Generation_INV"),
-                c.startswith("T1_CIS"),
-                c.startswith("T2_INV"),
-                "Meter_Generation" in c
-            ])
-        ]
+    inverter_cols, irradiation_col, irradiation_cols = detect_columns(df.columns, customer)
 
     if inverter_cols:
         df[inverter_cols] = df[inverter_cols].fillna(0)
 
-    irradiation_col = None
-    for col in df.columns:
-        if "Irradiation" in col:
-            irradiation_col = col
-            df[col] = df[col].fillna(0)
+    for col in irradiation_cols:
+        df[col] = df[col].fillna(0)
 
     # Normalize day (expecting 'day' present from loader)
     df["day"] = pd.to_datetime(df["day"]).dt.strftime("%Y-%m-%d")
     df = df.sort_values("day")
     return df, inverter_cols, irradiation_col
 
+# ----------------------------
+# Vectorized Daily / MTD / YTD engine
+# ----------------------------
+def _generation_values(df: pd.DataFrame, inverter_cols, customer=None):
+    """
+    Per-row generation values in kWh for the customer's profile layout.
+    Returns (values DataFrame, inverter display names).
+    """
+    p = get_profile(customer)
+    if p["layout"] == "single":
+        col = inverter_cols[0]
+        values = df[col].fillna(0) * p["scale"] if p["scale"] != 1 else df[col]
+        return values.to_frame(p["value_label"] or col), ["Total_Meter_Generation"]
+
+    values = df[list(inverter_cols)]
+    if p["scale"] != 1:
+        values = values.fillna(0) * p["scale"]
+    return values, [f"Inverter-{i+1}" for i in range(len(inverter_cols))]
+
+@timed("daily_mtd_ytd")
+def get_daily_monthly_yearly_range(
+    df: pd.DataFrame,
+    inverter_cols,
+    start,
+    end,
+    irradiation_col=None,
+    customer=None
+):
+    """
+    Daily, strict MTD and YTD for every data day in [start, end] in one pass.
+
+    The rows are reduced once to a per-day x per-inverter matrix; MTD / YTD are
+    cumulative sums that reset at month / year boundaries. Daily values are the
+    first row of each day (0 when the day has no data). Returns a dict of
+    day-indexed frames: daily, mtd, ytd, plus daily_irradiation,
+    monthly_avg_irradiation (Series or None) and inverter_names.
+    """
+    start = pd.to_datetime(start).normalize()
+    end = pd.to_datetime(end).normalize()
+    calendar = pd.date_range(start=pd.Timestamp(year=start.year, month=1, day=1), end=end)
+
+    day_ts = pd.to_datetime(df["day"])
+    values, inverter_names = _generation_values(df, inverter_cols, customer)
+    first_rows = ~day_ts.duplicated()
+
+    # per-day matrices over the full calendar (missing days -> no rows)
+    rows_per_day = day_ts.value_counts().reindex(calendar, fill_value=0)
+    has_rows = rows_per_day > 0
+    firsts = values[first_rows].set_axis(day_ts[first_rows]).reindex(calendar)
+    daily = firsts.where(has_rows, 0, axis=0)
+    sums = values.fillna(0).groupby(day_ts).sum().reindex(calendar, fill_value=0)
+
+    month_key = calendar.to_period("M")
+    mtd = sums.groupby(month_key).cumsum()
+    ytd = sums.groupby(calendar.year).cumsum()
+
+    daily_irradiation = None
+    monthly_avg_irradiation = None
+    if irradiation_col:
+        irr = df[irradiation_col]
+        irr_first = irr[first_rows].set_axis(day_ts[first_rows]).reindex(calendar)
+        daily_irradiation = irr_first.where(has_rows, 0)
+        # strict MTD average over the month calendar: a day without rows counts once as 0
+        irr_sum = irr.fillna(0).groupby(day_ts).sum().reindex(calendar, fill_value=0)
+        slots = rows_per_day.clip(lower=1)
+        monthly_avg_irradiation = (
+            irr_sum.groupby(month_key).cumsum() / slots.groupby(month_key).cumsum()
+        )
+
+    window = (calendar >= start) & (calendar <= end)
+    return {
+        "daily": daily[window],
+        "mtd": mtd[window],
+        "ytd": ytd[window],
+        "daily_irradiation": daily_irradiation[window] if daily_irradiation is not None else None,
+        "monthly_avg_irradiation": (
+            monthly_avg_irradiation[window] if monthly_avg_irradiation is not None else None
+        ),
+        "inverter_names": inverter_names,
+    }
+
+def summary_table(inverter_names, daily_generation, monthly_generation, ytd_generation) -> pd.DataFrame:
+    """Inverter / Daily / Monthly / Yearly table shown in the Report Builder."""
+    daily_df   = pd.DataFrame({"Inverter": inverter_names, "Daily Generation (kWh)":   daily_generation.values})
+    monthly_df = pd.DataFrame({"Inverter": inverter_names, "Monthly Generation (kWh)": monthly_generation.values})
+    yearly_df  = pd.DataFrame({"Inverter": inverter_names, "Yearly Generation (kWh)":  ytd_generation.values})
+    return daily_df.merge(monthly_df, on="Inverter").merge(yearly_df, on="Inverter")
+
 # ----------------------------
 # Your Daily / MTD / YTD core
 # ----------------------------
@@ -74,108 +142,33 @@ def get_daily_monthly_yearly_data(
     - data_day = report_date - 1 day
     - MTD window = [first_of_month(data_day), data_day]
     - YTD window = [Jan 1 of data_day year, data_day]
-    """
-    data_day = pd.to_datetime(report_date) - pd.Timedelta(days=1)
-    data_day_str = data_day.strftime("%Y-%m-%d")
-
-    month_start = pd.Timestamp(year=data_day.year, month=data_day.month, day=1)
-    ytd_start   = pd.Timestamp(year=data_day.year, month=1, day=1)
-
-    # ---- DAILY ----
-    if customer == "PGCIL":
-        df["Total_Daily_Generation_kWh"] = df["Total_Daily_Generation"].fillna(0) * 1000
-        daily_row = df.loc[df["day"] == data_day_str]
-        daily_generation_val = daily_row["Total_Daily_Generation_kWh"].iloc[0] if not daily_row.empty else 0
-        daily_generation = pd.Series([daily_generation_val], index=["Total_Daily_Generation_kWh"])
-        inverter_names = ["Total_Meter_Generation"]
-
-    elif customer in ["BEL2", "BEL1"]:
-        meter_col = [c for c in inverter_cols if "Meter_Generation" in c][0]
-        daily_row = df.loc[df["day"] == data_day_str]
-        daily_generation_val = daily_row[meter_col].iloc[0] if not daily_row.empty else 0
-        daily_generation = pd.Series([daily_generation_val], index=[meter_col])
-        inverter_names = ["Total_Meter_Generation"]
-
-    else:
-        daily_row = df.loc[df["day"] == data_day_str]
-        daily_generation = (
-            daily_row[inverter_cols].iloc[0]
-            if not daily_row.empty
-            else pd.Series([0] * len(inverter_cols), index=inverter_cols)
-        )
-        inverter_names = [f"Inverter-{i+1}" for i in range(len(inverter_cols))]
 
-    # Prepare date col
-    df["day_dt"] = pd.to_datetime(df["day"])
-
-    # ---- STRICT MTD ----
-    df_mtd = df[(df["day_dt"] >= month_start) & (df["day_dt"] <= data_day)].copy()
-    month_dates = pd.date_range(start=month_start, end=data_day)
-    merged_mtd = pd.DataFrame({"day_dt": month_dates}).merge(df_mtd, on="day_dt", how="left")
+    Single-day view over get_daily_monthly_yearly_range().
+    """
+    data_day = (pd.to_datetime(report_date) - pd.Timedelta(days=1)).normalize()
+    res = get_daily_monthly_yearly_range(df, inverter_cols, data_day, data_day, irradiation_col, customer)
 
-    # ---- STRICT YTD ----
-    df_ytd = df[(df["day_dt"] >= ytd_start) & (df["day_dt"] <= data_day)].copy()
+    daily_generation = res["daily"].loc[data_day]
+    monthly_generation = res["mtd"].loc[data_day]
+    ytd_generation = res["ytd"].loc[data_day]
 
-    # Irradiation
     daily_irradiation = None
     monthly_avg_irradiation = None
     if irradiation_col:
-        drow = df.loc[df["day"] == data_day_str]
-        daily_irradiation = drow[irradiation_col].iloc[0] if not drow.empty else 0
-        if irradiation_col in merged_mtd.columns:
-            merged_mtd[irradiation_col] = merged_mtd[irradiation_col].fillna(0)
-            monthly_avg_irradiation = merged_mtd[irradiation_col].mean()
-
-    # ---- Monthly (MTD) ----
-    if customer == "PGCIL":
-        merged_mtd["Total_Daily_Generation_kWh"] = merged_mtd["Total_Daily_Generation"].fillna(0) * 1000
-        monthly_generation = pd.Series(
-            [merged_mtd["Total_Daily_Generation_kWh"].sum()],
-            index=["Total_Daily_Generation_kWh"]
-        )
-    elif customer in ["BEL2", "BEL1"]:
-        meter_col = [c for c in inverter_cols if "Meter_Generation" in c][0]
-        merged_mtd[meter_col] = merged_mtd[meter_col].fillna(0)
-        monthly_generation = pd.Series([merged_mtd[meter_col].sum()], index=[meter_col])
-    else:
-        if inverter_cols:
-            merged_mtd[inverter_cols] = merged_mtd[inverter_cols].fillna(0)
-            monthly_generation = merged_mtd[inverter_cols].sum()
-        else:
-            monthly_generation = pd.Series([], dtype=float)
-
-    # ---- Yearly (YTD) ----
-    if customer == "PGCIL":
-        df_ytd["Total_Daily_Generation_kWh"] = df_ytd["Total_Daily_Generation"].fillna(0) * 1000
-        ytd_generation = pd.Series(
-            [df_ytd["Total_Daily_Generation_kWh"].sum()],
-            index=["Total_Daily_Generation_kWh"]
-        )
-    elif customer in ["BEL2", "BEL1"]:
-        meter_col = [c for c in inverter_cols if "Meter_Generation" in c][0]
-        df_ytd[meter_col] = df_ytd[meter_col].fillna(0)
-        ytd_generation = pd.Series([df_ytd[meter_col].sum()], index=[meter_col])
-    else:
-        if inverter_cols:
-            df_ytd[inverter_cols] = df_ytd[inverter_cols].fillna(0)
-            ytd_generation = df_ytd[inverter_cols].sum()
-        else:
-            ytd_generation = pd.Series([], dtype=float)
-
-    # ---- Final table (Daily / Monthly / Yearly) ----
-    daily_df   = pd.DataFrame({"Inverter": inverter_names, "Daily Generation (kWh)":   daily_generation.values})
-    monthly_df = pd.DataFrame({"Inverter": inverter_names, "Monthly Generation (kWh)": monthly_generation.values})
-    yearly_df  = pd.DataFrame({"Inverter": inverter_names, "Yearly Generation (kWh)":  ytd_generation.values})
-    final_df = daily_df.merge(monthly_df, on="Inverter").merge(yearly_df, on="Inverter")
+        daily_irradiation = res["daily_irradiation"].loc[data_day]
+        monthly_avg_irradiation = res["monthly_avg_irradiation"].loc[data_day]
 
+    final_df = summary_table(res["inverter_names"], daily_generation, monthly_generation, ytd_generation)
     return final_df, daily_generation, monthly_generation, ytd_generation, daily_irradiation, monthly_avg_irradiation
 
 # ----------------------------
 # KPI calculation (kept same)
 # ----------------------------
+@timed("calculate_kpis")
 def calculate_kpis(customer, daily_generation, monthly_generation, yearly_generation=None):
-    num_inverters = CUSTOMER_INVERTERS.get(customer, 0)
-    plf_base = PLF_BASE.get(customer, 0)
+    profile = get_profile(customer)
+    num_inverters = profile["inverters"]
+    plf_base = profile["plf_base"]
     total_daily_gen = float(daily_generation.sum())
     total_monthly_gen = float(monthly_generation.sum())
     total_yearly_gen = float(yearly_generation.sum()) if yearly_generation is not None else None
@@ -186,3 +179,14 @@ def calculate_kpis(customer, daily_generation, monthly_generation, yearly_genera
     if yearly_generation is None:
         return total_daily_gen, total_monthly_gen, plf_percent
     return total_daily_gen, total_monthly_gen, plf_percent, total_yearly_gen
+
+def fleet_plf(daily_matrix: pd.DataFrame) -> pd.DataFrame:
+    """
+    calculate_kpis' PLF for a whole (plant x day) matrix of daily kWh at once:
+    daily / (24 * PLF_BASE * CUSTOMER_INVERTERS), denominator 1 when unknown.
+    """
+    plants = daily_matrix.index
+    base = pd.Series(PLF_BASE).reindex(plants).fillna(0)
+    inverters = pd.Series(CUSTOMER_INVERTERS).reindex(plants).fillna(0)
+    denom = 24 * base * inverters
+    return daily_matrix.div(denom.where(denom > 0, 1), axis=0)
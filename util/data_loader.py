@@ -1,13 +1,25 @@
 # util/data_loader.py
+import os
 import streamlit as st
-from pymongo import MongoClient
+from pymongo import UpdateOne, ASCENDING
 import pandas as pd
-from datetime import datetime, date
+import warnings
+import numpy as np
+import bson
+from bson.codec_options import CodecOptions, DatetimeConversion
+from datetime import datetime, date, timedelta
+from util.agg import detect_columns
+from util.profiles import get_profile, profile_key
+from util.ts_normalize import TS_FIELD, ts_expression, utc_bounds, local_date, has_ts_index
+from util.mongo_pool import MONGO_URI, get_client
+from util import disk_cache, metrics
+from util.result_cache import RESULTS
+from util.singleflight import FLIGHTS
 
 # --- App-level settings ---
-# Put MONGO_URI in .streamlit/secrets.toml
-MONGO_URI = st.secrets["MONGO_URI"]
-DATABASE_NAME = "scada_db"  # per your instruction
+# MONGO_URI (.streamlit/secrets.toml) is read by util/mongo_pool.py
+# DGR_DATABASE / DATABASE_NAME override it (benchmarks run against a scratch database)
+DATABASE_NAME = os.environ.get("DGR_DATABASE") or st.secrets.get("DATABASE_NAME", "scada_db")
 
 # Map customers -> Mongo collections (edit as needed or move to secrets)
 CUSTOMERS = ["Imagica", "Caspro"]
@@ -16,6 +28,18 @@ COLLECTION_MAP = {
     "Caspro": "Caspro"
 }
 
+# Result cache bounds (MB), TTL (s) for recent windows, the days after which a day is
+# closed and the TTL (s) of closed windows (how long other processes' refreshes go unseen)
+RESULTS.configure(
+    max_bytes=int(st.secrets.get("RESULT_CACHE_MB", 256)) * 2**20,
+    today_ttl=float(st.secrets.get("RESULT_CACHE_TODAY_TTL", 60)),
+    grace_days=int(st.secrets.get("RESULT_CACHE_GRACE_DAYS", 1)),
+    closed_ttl=float(st.secrets.get("RESULT_CACHE_CLOSED_TTL", 3600)),
+)
+# How long a session waits on another session's identical in-flight load (s)
+FLIGHTS.configure(timeout=float(st.secrets.get("LOAD_WAIT_TIMEOUT", 120)))
+metrics.register_collector("dgr_singleflight", FLIGHTS.stats)
+
 def list_customers():
     # If provided in secrets, use that instead
     return st.secrets.get("CUSTOMERS", CUSTOMERS)
@@ -25,12 +49,70 @@ def _collection_for(customer: str) -> str:
     return cmap.get(customer, customer.lower() + "_data")
 
 def mongo():
-    client = MongoClient(MONGO_URI)
-    return client[DATABASE_NAME]
+    # shared pooled client, cheap to call on every rerun
+    return get_client()[DATABASE_NAME]
 
 # -------------------------------------------------------------------
 # YOUR EXACT PIPELINE (wrapped as a function + safe export)
 # -------------------------------------------------------------------
+def _normalized_pipeline(start_date: str, end_date: str, tz: str = "UTC", indexed: bool = False) -> list:
+    """
+    Stages that normalize `timestamp` into `ts` (BSON date), derive the plant-local
+    `day` string and keep only the [start_date, end_date] window ('%Y-%m-%d').
+
+    indexed=True (collection migrated by util/ts_normalize.py) starts with a range
+    $match on the indexed `ts_utc` field; documents not yet backfilled (ts_utc
+    missing) are still picked up and normalized on the fly.
+    """
+    if indexed:
+        lo, hi = utc_bounds(datetime.strptime(start_date, "%Y-%m-%d").date(),
+                            datetime.strptime(end_date, "%Y-%m-%d").date(), tz)
+        head = [
+            {"$match": {"$or": [{TS_FIELD: {"$gte": lo, "$lt": hi}}, {TS_FIELD: None}]}},
+            {"$addFields": {"ts": {"$ifNull": ["$" + TS_FIELD, ts_expression(tz)]}}},
+        ]
+    else:
+        head = [
+            {"$match": {"timestamp": {"$exists": True, "$ne": None}}},
+            {"$addFields": {"ts": ts_expression(tz)}},
+        ]
+    return head + [
+        {"$match": {"ts": {"$ne": None}}},
+        {"$addFields": {"day": {"$dateToString": {"date": "$ts", "format": "%Y-%m-%d", "timezone": tz}}}},
+        {"$match": {"day": {"$gte": start_date, "$lte": end_date}}},
+    ]
+
+def _window_pipeline(coll, customer: str, start_date: str, end_date: str) -> list:
+    """_normalized_pipeline() with the plant timezone and the range-first plan when indexed."""
+    return _normalized_pipeline(start_date, end_date, _plant_tz(customer), has_ts_index(coll))
+
+def _plant_tz(customer: str) -> str:
+    return get_profile(customer)["timezone"] if customer else "UTC"
+
+# Raw row loads stop at RAW_ROW_LIMIT rows; hitting it is reported, never silent.
+# Windows larger than that should go through the daily reduction (load_period(daily=True)).
+RAW_ROW_LIMIT = int(st.secrets.get("RAW_ROW_LIMIT", 200000))
+
+# Open days of daily loads: "server" ($group in MongoDB) or "stream" (client-side DailyReducer)
+DAILY_REDUCER = st.secrets.get("DAILY_REDUCER", "server")
+
+class TruncatedLoadWarning(UserWarning):
+    """A raw load hit RAW_ROW_LIMIT; the frame is missing part of the window."""
+
+def _check_truncation(df: pd.DataFrame, collection_name: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """Trim the one look-ahead row and flag the frame (df.attrs["truncated"]) if the limit was hit."""
+    truncated = len(df) > RAW_ROW_LIMIT
+    if truncated:
+        df = df.iloc[:RAW_ROW_LIMIT]
+        metrics.count("raw_load_truncated")
+        warnings.warn(
+            f"{collection_name} [{start_date}, {end_date}]: more than {RAW_ROW_LIMIT} rows, "
+            f"result truncated; use the daily reduction for long windows",
+            TruncatedLoadWarning, stacklevel=3,
+        )
+    df.attrs["truncated"] = truncated
+    return df
+
 def fetch_cleaned_data(collection_name: str, start_date_str: str, end_date_str: str, customer: str = None):
     """
     Fetch documents for the [start_date, end_date] window (inclusive by day).
@@ -39,68 +121,456 @@ def fetch_cleaned_data(collection_name: str, start_date_str: str, end_date_str:
     start_date = datetime.strptime(start_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
     end_date = datetime.strptime(end_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
 
-    client = MongoClient(MONGO_URI)
-    coll = client[DATABASE_NAME][collection_name]
-
-    pipeline = [
-        {"$match": {"timestamp": {"$exists": True, "$ne": None}}},
-        {
-            "$addFields": {
-                "ts": {
-                    "$switch": {
-                        "branches": [
-                            {  # Proper ISODate stored as BSON date
-                                "case": {"$eq": [{"$type": "$timestamp"}, "date"]},
-                                "then": "$timestamp"
-                            },
-                            {  # 'YYYY-MM-DD HH:MM' string format
-                                "case": {
-                                    "$and": [
-                                        {"$eq": [{"$type": "$timestamp"}, "string"]},
-                                        {"$regexMatch": {
-                                            "input": "$timestamp",
-                                            "regex": "^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}$"
-                                        }}
-                                    ]
-                                },
-                                "then": {
-                                    "$dateFromString": {
-                                        "dateString": "$timestamp",
-                                        "format": "%Y-%m-%d %H:%M"
-                                    }
-                                }
-                            },
-                        ],
-                        "default": None
-                    }
-                }
-            }
-        },
-        {"$match": {"ts": {"$ne": None}}},
-        {"$addFields": {"day": {"$dateToString": {"date": "$ts", "format": "%Y-%m-%d"}}}},
-        {"$match": {"day": {"$gte": start_date, "$lte": end_date}}},
-        {"$limit": 200000}  # safety limit
+    coll = mongo()[collection_name]
+
+    pipeline = _window_pipeline(coll, customer, start_date, end_date) + [
+        {"$limit": RAW_ROW_LIMIT + 1}  # one extra row tells us the limit was hit
+    ]
+    if st.secrets.get("METRICS_EXPLAIN", False):
+        metrics.explain_aggregate(coll, pipeline)
+
+    with metrics.stage("mongo_aggregate"):
+        raw_data = list(coll.aggregate(pipeline, allowDiskUse=True))
+    with metrics.stage("dataframe_build"):
+        df = pd.DataFrame(raw_data)
+
+        # Local sort (no memory pressure on Mongo)
+        if "ts" in df.columns:
+            df = df.sort_values("ts")
+
+    return _check_truncation(df, collection_name, start_date, end_date)
+
+# -------------------------------------------------------------------
+# Compact typed frames (raw rows without per-row dicts / object columns)
+# -------------------------------------------------------------------
+_MS_PER_DAY = 86_400_000
+_RAW_CODEC = CodecOptions(datetime_conversion=DatetimeConversion.DATETIME_MS)
+
+def _as_float(v):
+    return v if isinstance(v, (int, float)) else np.nan
+
+def typed_frame_from_batches(raw_batches, value_cols, capacity: int = 1 << 16, tz: str = "UTC") -> pd.DataFrame:
+    """
+    Decode raw BSON cursor batches (documents carrying `ts` + value_cols) straight
+    into preallocated typed arrays: ts -> datetime64[ms], values -> float32,
+    day_key -> int32 (days since epoch) and `day` as a categorical 'YYYY-MM-DD'.
+    Only one batch of decoded documents is alive at a time.
+    """
+    n = 0
+    ts = np.empty(capacity, dtype="int64")
+    vals = {c: np.empty(capacity, dtype="float32") for c in value_cols}
+
+    for raw in raw_batches:
+        docs = bson.decode_all(raw, _RAW_CODEC)
+        m = len(docs)
+        if n + m > len(ts):
+            cap = max(2 * len(ts), n + m)
+            ts.resize(cap, refcheck=False)
+            for arr in vals.values():
+                arr.resize(cap, refcheck=False)
+        ts[n:n + m] = [int(d["ts"]) for d in docs]
+        for c, arr in vals.items():
+            arr[n:n + m] = [_as_float(d.get(c)) for d in docs]
+        n += m
+
+    ts.resize(n, refcheck=False)
+    for arr in vals.values():
+        arr.resize(n, refcheck=False)
+
+    # local sort (no memory pressure on Mongo), only if the cursor was not already ordered
+    if n > 1 and (ts[1:] < ts[:-1]).any():
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        vals = {c: arr[order] for c, arr in vals.items()}
+
+    local_ms = ts
+    if tz not in (None, "", "UTC"):
+        # shift to plant-local wall time so days split at local midnight
+        local = pd.DatetimeIndex(ts.view("datetime64[ms]")).tz_localize("UTC").tz_convert(tz).tz_localize(None)
+        local_ms = local.as_unit("ms").asi8
+    day_key = (local_ms // _MS_PER_DAY).astype("int32")
+    uniq, codes = np.unique(day_key, return_inverse=True)
+    day_names = pd.to_datetime(uniq.astype("int64"), unit="D").strftime("%Y-%m-%d")
+
+    cols = {
+        "ts": ts.view("datetime64[ms]"),
+        "day": pd.Categorical.from_codes(codes.astype("int32"), categories=day_names),
+        "day_key": day_key,
+    }
+    cols.update(vals)
+    return pd.DataFrame(cols, copy=False)
+
+def fetch_typed_frame(collection_name: str, start_date_str: str, end_date_str: str,
+                      customer: str = None, batch_size: int = 10000) -> pd.DataFrame:
+    """
+    Raw rows of the window like fetch_cleaned_data(), but projected to `ts` + the
+    customer's generation / irradiation columns and built as compact typed columns
+    (no _id / timestamp / duplicate date columns, float32 values).
+    """
+    start_date = datetime.strptime(start_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
+    end_date = datetime.strptime(end_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
+
+    coll = mongo()[collection_name]
+    inverter_cols, _, irradiation_cols = detect_columns(_sample_fields(coll), customer)
+    value_cols = list(dict.fromkeys(inverter_cols + irradiation_cols))
+
+    pipeline = _window_pipeline(coll, customer, start_date, end_date) + [
+        {"$project": {"_id": 0, "ts": 1, **{c: 1 for c in value_cols}}},
+        {"$limit": RAW_ROW_LIMIT + 1},  # same limit as fetch_cleaned_data
+    ]
+    with metrics.stage("mongo_aggregate_typed"):
+        batches = coll.aggregate_raw_batches(pipeline, allowDiskUse=True, batchSize=batch_size)
+        df = typed_frame_from_batches(batches, value_cols, tz=_plant_tz(customer))
+    return _check_truncation(df, collection_name, start_date, end_date)
+
+# -------------------------------------------------------------------
+# Streaming client-side daily reduction (memory ~ days x columns)
+# -------------------------------------------------------------------
+def _decode_batch(raw, value_cols):
+    """One raw BSON batch -> (ts int64 ms array, {col: float32 array})."""
+    docs = bson.decode_all(raw, _RAW_CODEC)
+    m = len(docs)
+    ts = np.fromiter((int(d["ts"]) for d in docs), dtype="int64", count=m)
+    vals = {c: np.fromiter((_as_float(d.get(c)) for d in docs), dtype="float32", count=m)
+            for c in value_cols}
+    return ts, vals
+
+class DailyReducer:
+    """
+    Running per-day, per-column reduction fed batch by batch: the day's max (or
+    latest numeric sample by ts) of each column, the number of rows and the latest ts.
+    Same result as daily_rollup_pipeline(), computed client-side.
+
+    For "last" every column carries the ts of its own latest sample ("<col>@ts"),
+    so a batch whose newest row lacks a column cannot shadow an older value.
+    """
+
+    def __init__(self, value_cols, how: str = "max", tz: str = "UTC"):
+        if how not in ("max", "last"):
+            raise ValueError(f"Unsupported daily reduction: {how}")
+        self.value_cols = list(value_cols)
+        self.how = how
+        self.tz = tz
+        self.samples = 0
+        self._acc = None  # DataFrame indexed by day_key
+
+    def _reduce(self, part: pd.DataFrame) -> pd.DataFrame:
+        g = part.groupby(level=0, sort=False)
+        if self.how == "max":
+            out = g[self.value_cols].max()
+        else:
+            out = pd.DataFrame(index=g["ts"].max().index)
+            for c in self.value_cols:
+                tc = f"{c}@ts"
+                sub = part.loc[part[c].notna(), [c, tc]].sort_values(tc, kind="stable")
+                last = sub.groupby(level=0, sort=False).last()
+                out[c] = last[c]
+                out[tc] = last[tc]
+        out["ts"] = g["ts"].max()
+        out["rows"] = g["rows"].sum()
+        return out
+
+    def add(self, ts_ms: np.ndarray, vals: dict):
+        if len(ts_ms) == 0:
+            return
+        local_ms = ts_ms
+        if self.tz not in (None, "", "UTC"):
+            local = pd.DatetimeIndex(ts_ms.view("datetime64[ms]")).tz_localize("UTC").tz_convert(self.tz)
+            local_ms = local.tz_localize(None).as_unit("ms").asi8
+        part = pd.DataFrame(vals, index=pd.Index(local_ms // _MS_PER_DAY, name="day_key"), copy=False)
+        if self.how == "last":
+            part = part.assign(**{f"{c}@ts": ts_ms for c in self.value_cols})
+        part["ts"] = ts_ms
+        part["rows"] = 1
+        self.samples += len(ts_ms)
+        red = self._reduce(part)
+        self._acc = red if self._acc is None else self._reduce(pd.concat([self._acc, red]))
+
+    def result(self) -> pd.DataFrame:
+        """One row per day like fetch_daily_rollup(): day, value columns, rows, ts."""
+        if self._acc is None:
+            return pd.DataFrame()
+        out = self._acc.sort_index().drop(columns=[f"{c}@ts" for c in self.value_cols], errors="ignore")
+        out.insert(0, "day", pd.to_datetime(out.index.to_numpy(), unit="D").strftime("%Y-%m-%d"))
+        out["ts"] = out["ts"].to_numpy().view("datetime64[ms]")
+        return out.reset_index(drop=True)
+
+def _month_windows(start: date, end: date):
+    """[start, end] split at month boundaries."""
+    s = start
+    while s <= end:
+        nxt = (s.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield s, min(end, nxt - timedelta(days=1))
+        s = nxt
+
+def fetch_daily_streaming(collection_name: str, start_date_str: str, end_date_str: str,
+                          customer: str = None, how: str = "max", batch_size: int = 10000):
+    """
+    fetch_daily_rollup() computed client-side without any row limit: one
+    month-sized sub-query at a time, raw cursor batches folded into a
+    DailyReducer. Only one batch of samples is decoded at a time.
+    """
+    start = datetime.strptime(start_date_str, "%d-%b-%Y").date()
+    end = datetime.strptime(end_date_str, "%d-%b-%Y").date()
+
+    coll = mongo()[collection_name]
+    inverter_cols, _, irradiation_cols = detect_columns(_sample_fields(coll), customer)
+    value_cols = list(dict.fromkeys(inverter_cols + irradiation_cols))
+    reducer = DailyReducer(value_cols, how, _plant_tz(customer))
+
+    with metrics.stage("mongo_stream_reduce"):
+        for s, e in _month_windows(start, end):
+            pipeline = _window_pipeline(coll, customer, str(s), str(e)) + [
+                {"$project": {"_id": 0, "ts": 1, **{c: 1 for c in value_cols}}},
+            ]
+            for raw in coll.aggregate_raw_batches(pipeline, allowDiskUse=True, batchSize=batch_size):
+                reducer.add(*_decode_batch(raw, value_cols))
+    return reducer.result()
+
+def _sample_fields(coll, n: int = 50) -> list:
+    """Field names seen in the latest `n` documents (insertion order kept)."""
+    fields = {}
+    for doc in coll.find({}, sort=[("_id", -1)], limit=n):
+        fields.update(dict.fromkeys(doc))
+    return list(fields)
+
+def daily_rollup_pipeline(start_date: str, end_date: str, value_cols, how: str = "max",
+                          tz: str = "UTC", indexed: bool = False) -> list:
+    """
+    Pipeline returning one document per `day` with the daily reduction of
+    each column in `value_cols` ("max" or the latest numeric sample of the day),
+    plus `rows` (raw sample count) and `ts` (latest sample of the day).
+    """
+    if how not in ("max", "last"):
+        raise ValueError(f"Unsupported daily reduction: {how}")
+
+    pipeline = _normalized_pipeline(start_date, end_date, tz, indexed)
+
+    group = {"_id": "$day", "rows": {"$sum": 1}, "ts": {"$max": "$ts"}}
+    for c in value_cols:
+        if how == "max":
+            group[c] = {"$max": f"${c}"}
+        else:
+            # max of {t, v} pairs = the latest sample that has a number (null sorts lowest)
+            group[c] = {"$max": {"$cond": [{"$isNumber": f"${c}"}, {"t": "$ts", "v": f"${c}"}, None]}}
+
+    pipeline += [
+        {"$group": group},
+        {"$addFields": {"day": "$_id", **({c: f"${c}.v" for c in value_cols} if how == "last" else {})}},
+        {"$project": {"_id": 0}},
+        {"$sort": {"day": 1}},
     ]
+    return pipeline
 
-    raw_data = list(coll.aggregate(pipeline, allowDiskUse=True))
-    df = pd.DataFrame(raw_data)
+def _daily_rollup_docs(coll, customer: str, start_date: str, end_date: str, how: str = "max"):
+    """Run the per-day rollup on `coll`; returns (docs, inverter_cols, irradiation_cols)."""
+    inverter_cols, _, irradiation_cols = detect_columns(_sample_fields(coll), customer)
+    value_cols = list(dict.fromkeys(inverter_cols + irradiation_cols))
 
-    # Local sort (no memory pressure on Mongo)
-    if "ts" in df.columns:
-        df = df.sort_values("ts")
+    pipeline = daily_rollup_pipeline(start_date, end_date, value_cols, how,
+                                     _plant_tz(customer), has_ts_index(coll))
+    with metrics.stage("mongo_rollup_aggregate"):
+        docs = list(coll.aggregate(pipeline, allowDiskUse=True))
+    return docs, inverter_cols, irradiation_cols
+
+def fetch_daily_rollup(collection_name: str, start_date_str: str, end_date_str: str,
+                       customer: str = None, how: str = "max"):
+    """
+    Same window as fetch_cleaned_data(), but reduced inside MongoDB to one row
+    per day: generation counters (*_GenPowerToday / Daily_Generation* ...) and
+    irradiation columns, detected with the same rules as clean_dataframe().
+    """
+    start_date = datetime.strptime(start_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
+    end_date = datetime.strptime(end_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
+
+    coll = mongo()[collection_name]
+
+    docs, _, _ = _daily_rollup_docs(coll, customer, start_date, end_date, how)
+    df = pd.DataFrame(docs)
 
-    client.close()
     return df
 
+# -------------------------------------------------------------------
+# Materialized daily rollup (dgr_daily_rollup)
+# -------------------------------------------------------------------
+# One document per (customer, day):
+#   {customer, day, generation: {col: kWh}, irradiation: {col: value}, rows, ts, updated_at}
+# dgr_rollup_state keeps the per-customer `ts_watermark` (latest raw sample rolled up)
+# and `first_day`, the earliest day ever rolled up: days before it were never
+# materialized and still come from the raw collection.
+ROLLUP_COLLECTION = "dgr_daily_rollup"
+ROLLUP_STATE_COLLECTION = "dgr_rollup_state"
+
+def refresh_daily_rollup(customer: str, since: date = None) -> int:
+    """
+    Recompute only the days at/after the customer's `ts` watermark (or from
+    `since` / Jan 1 on the first run) and upsert them into dgr_daily_rollup.
+    Returns the number of day documents written.
+    """
+    db = mongo()
+    state = db[ROLLUP_STATE_COLLECTION].find_one({"customer": customer}) or {}
+    watermark = state.get("ts_watermark")
+    if watermark is not None:
+        start_day = local_date(watermark, _plant_tz(customer)).strftime("%Y-%m-%d")
+    else:
+        start_day = (since or date(date.today().year, 1, 1)).strftime("%Y-%m-%d")
+    end_day = date.today().strftime("%Y-%m-%d")
+
+    coll = db[_collection_for(customer)]
+    docs, inverter_cols, irradiation_cols = _daily_rollup_docs(coll, customer, start_day, end_day)
+    if not docs:
+        return 0
+
+    now = datetime.utcnow()
+    ops = []
+    for d in docs:
+        ops.append(UpdateOne(
+            {"customer": customer, "day": d["day"]},
+            {"$set": {
+                "customer": customer,
+                "day": d["day"],
+                "generation": {c: d.get(c) for c in inverter_cols},
+                "irradiation": {c: d.get(c) for c in irradiation_cols},
+                "rows": d["rows"],
+                "ts": d["ts"],
+                "updated_at": now,
+            }},
+            upsert=True
+        ))
+
+    rollup = db[ROLLUP_COLLECTION]
+    rollup.create_index([("customer", ASCENDING), ("day", ASCENDING)], unique=True)
+    rollup.bulk_write(ops, ordered=False)
+    RESULTS.purge_customer(customer)  # cached loads / reports may predate these days
+
+    update = {"$set": {"customer": customer, "refreshed_at": now},
+              "$min": {"first_day": start_day}}
+    new_watermark = max(d["ts"] for d in docs)
+    if watermark is None or new_watermark > watermark:
+        update["$set"]["ts_watermark"] = new_watermark
+    db[ROLLUP_STATE_COLLECTION].update_one({"customer": customer}, update, upsert=True)
+    return len(ops)
+
+def read_daily_rollup(customer: str, start: date, end: date):
+    """
+    Read the materialized days of [start, end] that are closed and were
+    actually rolled up, i.e. in [first_day, watermark day) and before today.
+    Returns (df, served): served is the (first, last) day range the df covers,
+    or None; every other day of the window has to come from the raw collection.
+    """
+    db = mongo()
+    state = db[ROLLUP_STATE_COLLECTION].find_one({"customer": customer})
+    if not state or state.get("ts_watermark") is None or not state.get("first_day"):
+        return pd.DataFrame(), None
+
+    first_day = datetime.strptime(state["first_day"], "%Y-%m-%d").date()
+    fresh_until = min(local_date(state["ts_watermark"], _plant_tz(customer)), date.today())
+    lo = max(start, first_day)
+    hi = min(end, fresh_until - timedelta(days=1))
+    if hi < lo:
+        return pd.DataFrame(), None
+
+    cursor = db[ROLLUP_COLLECTION].find(
+        {"customer": customer,
+         "day": {"$gte": lo.strftime("%Y-%m-%d"), "$lte": hi.strftime("%Y-%m-%d")}},
+        {"_id": 0, "day": 1, "ts": 1, "rows": 1, "generation": 1, "irradiation": 1}
+    ).sort("day", ASCENDING)
+
+    rows = []
+    for d in cursor:
+        row = {"day": d["day"], "ts": d.get("ts"), "rows": d.get("rows", 0)}
+        row.update(d.get("generation") or {})
+        row.update(d.get("irradiation") or {})
+        rows.append(row)
+    return pd.DataFrame(rows), (lo, hi)
+
+def _load_daily(customer: str, coll_name: str, start: date, end: date) -> pd.DataFrame:
+    """Rolled-up closed days from dgr_daily_rollup, the rest of the window from the raw rollup."""
+    stored, served = read_daily_rollup(customer, start, end)
+    if served is None:
+        windows = [(start, end)]
+    else:
+        # raw before the first refresh, the stored days, raw from the watermark day on
+        windows = [(start, served[0] - timedelta(days=1)), stored,
+                   (served[1] + timedelta(days=1), end)]
+
+    fetch = fetch_daily_streaming if DAILY_REDUCER == "stream" else fetch_daily_rollup
+    parts = []
+    for w in windows:
+        if isinstance(w, pd.DataFrame):
+            part = w
+        elif w[0] <= w[1]:
+            part = fetch(coll_name, w[0].strftime("%d-%b-%Y"), w[1].strftime("%d-%b-%Y"), customer)
+        else:
+            continue
+        if not part.empty:
+            parts.append(part)
+    if not parts:
+        return pd.DataFrame()
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+def _load_daily_cached(customer: str, coll_name: str, start: date, end: date) -> pd.DataFrame:
+    """
+    _load_daily() behind the on-disk Parquet cache: days inside the cached
+    ranges come from disk, every uncovered sub-range of [start, end] is fetched
+    and appended (and becomes covered once it is before the watermark day).
+    """
+    if not disk_cache.enabled():
+        return _load_daily(customer, coll_name, start, end)
+
+    gaps = disk_cache.missing(customer, start, end)
+    frames = []
+    if gaps != [(start, end)]:
+        cached = disk_cache.read_period(customer, start, end)
+        if not cached.empty:
+            gap_day = np.zeros(len(cached), dtype=bool)
+            for s, e in gaps:
+                gap_day |= (cached["day"] >= str(s)).to_numpy() & (cached["day"] <= str(e)).to_numpy()
+            frames.append(cached[~gap_day])
+
+    fetched = [_load_daily(customer, coll_name, s, e) for s, e in gaps]
+    fetched = [f for f in fetched if not f.empty]
+    if gaps:
+        disk_cache.append(customer, pd.concat(fetched, ignore_index=True) if fetched else pd.DataFrame(),
+                          gaps, _plant_tz(customer))
+    frames += fetched
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    return pd.concat(frames, ignore_index=True).sort_values("day", kind="stable").reset_index(drop=True)
+
 # Convenience wrapper used by pages to get a date-window as a DataFrame
-def load_period(customer: str, start: date, end: date) -> pd.DataFrame:
+def load_period(customer: str, start: date, end: date, daily: bool = False,
+                typed: bool = False) -> pd.DataFrame:
     """
     Calls fetch_cleaned_data() with the required %d-%b-%Y strings.
+    daily=True returns one row per day instead of the raw SCADA rows:
+    closed days from dgr_daily_rollup, open days rolled up server-side.
+    typed=True returns the raw rows as a compact typed frame (see fetch_typed_frame).
+
+    Results are kept in the process-wide result cache (closed windows never
+    expire, windows reaching today use a short TTL); callers must not mutate them.
+    On a miss, concurrent identical loads share one query (util.singleflight).
     """
+    key = ("load_period", customer, start, end, daily, typed, profile_key(customer))
+    return RESULTS.get_or_compute(
+        key, lambda: FLIGHTS.do(key, lambda: _load_period(customer, start, end, daily, typed)), end,
+        _plant_tz(customer),
+    )
+
+@metrics.timed("load_period")
+def _load_period(customer: str, start: date, end: date, daily: bool, typed: bool) -> pd.DataFrame:
     coll_name = _collection_for(customer)
     start_str = start.strftime("%d-%b-%Y")  # e.g., 01-Nov-2025
     end_str   = end.strftime("%d-%b-%Y")
-    df = fetch_cleaned_data(coll_name, start_str, end_str, customer)
+    if daily:
+        df = _load_daily_cached(customer, coll_name, start, end)
+    elif typed:
+        # already has ts / day / day_key; no extra date columns
+        return fetch_typed_frame(coll_name, start_str, end_str, customer)
+    else:
+        df = fetch_cleaned_data(coll_name, start_str, end_str, customer)
     # ensure a uniform day string & date
     if "day" in df.columns:
         df["day_str"] = df["day"].astype(str)
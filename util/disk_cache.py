@@ -0,0 +1,205 @@
+# util/disk_cache.py
+# Local Parquet cache of per-customer daily frames, one file per month:
+#   {CACHE_DIR}/{customer}/{YYYY-MM}.parquet  +  {customer}/_meta.json
+# _meta.json records the closed day ranges actually fetched ("ranges") and the
+# latest sample seen ("ts_watermark"); only days inside a range are served from
+# disk, every other day of a window is fetched - windows may be loaded in any order.
+#
+#   python -m util.disk_cache invalidate Imagica [--month 2025-03]
+#   python -m util.disk_cache rebuild Imagica --year 2025
+import argparse
+import json
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+import pandas as pd
+import streamlit as st
+from util.result_cache import RESULTS
+from util.ts_normalize import local_date
+
+# optional pyarrow (pandas Parquet engine); without it the cache is simply disabled
+try:
+    import pyarrow  # noqa: F401
+    _HAS_PARQUET = True
+except Exception:
+    _HAS_PARQUET = False
+
+CACHE_DIR = os.environ.get("DGR_CACHE_DIR") or st.secrets.get("CACHE_DIR", os.path.join(".cache", "dgr"))
+_lock = threading.Lock()
+
+def enabled() -> bool:
+    return _HAS_PARQUET and bool(st.secrets.get("DISK_CACHE", True))
+
+def _customer_dir(customer: str) -> str:
+    return os.path.join(CACHE_DIR, customer)
+
+def _month_path(customer: str, month: str) -> str:
+    return os.path.join(_customer_dir(customer), f"{month}.parquet")
+
+def _meta_path(customer: str) -> str:
+    return os.path.join(_customer_dir(customer), "_meta.json")
+
+def _months(start: date, end: date):
+    for p in pd.period_range(start=start, end=end, freq="M"):
+        yield p.strftime("%Y-%m")
+
+def read_meta(customer: str) -> dict:
+    try:
+        with open(_meta_path(customer)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_meta(customer: str, meta: dict):
+    tmp = _meta_path(customer) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(customer))
+
+def _day(s: str) -> date:
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+def _merge(ranges) -> list:
+    """Sorted, merged (start, end) date ranges; adjacent ranges are joined."""
+    out = []
+    for s, e in sorted(ranges):
+        if out and s <= out[-1][1] + timedelta(days=1):
+            out[-1] = (out[-1][0], max(out[-1][1], e))
+        else:
+            out.append((s, e))
+    return out
+
+def _subtract(ranges, start: date, end: date) -> list:
+    """ranges minus [start, end]."""
+    out = []
+    for s, e in ranges:
+        if e < start or s > end:
+            out.append((s, e))
+            continue
+        if s < start:
+            out.append((s, start - timedelta(days=1)))
+        if e > end:
+            out.append((end + timedelta(days=1), e))
+    return out
+
+def coverage(customer: str) -> list:
+    """Closed (start, end) day ranges held by the cache, merged and sorted."""
+    meta = read_meta(customer)
+    # caches written before ranges were tracked only have first_day: not trusted
+    return _merge((_day(s), _day(e)) for s, e in meta.get("ranges", []))
+
+def missing(customer: str, start: date, end: date) -> list:
+    """Sub-ranges of [start, end] the cache does not cover (to be fetched)."""
+    gaps, cursor = [], start
+    for s, e in coverage(customer):
+        if e < cursor or s > end:
+            continue
+        if s > cursor:
+            gaps.append((cursor, s - timedelta(days=1)))
+        cursor = max(cursor, e + timedelta(days=1))
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+def read_period(customer: str, start: date, end: date) -> pd.DataFrame:
+    """Cached daily rows for [start, end] (all months overlapping the window)."""
+    frames = []
+    for month in _months(start, end):
+        path = _month_path(customer, month)
+        if os.path.exists(path):
+            frames.append(pd.read_parquet(path))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    mask = (df["day"] >= start.strftime("%Y-%m-%d")) & (df["day"] <= end.strftime("%Y-%m-%d"))
+    return df[mask].reset_index(drop=True)
+
+def append(customer: str, df: pd.DataFrame, ranges=(), tz: str = "UTC"):
+    """
+    Merge daily rows into their month files (rows for the same day are replaced)
+    and mark the fetched `ranges` as covered up to the day before the watermark
+    day - the latest day with samples may still grow.
+    """
+    with _lock:
+        os.makedirs(_customer_dir(customer), exist_ok=True)
+        if not df.empty:
+            for month, part in df.groupby(df["day"].str[:7]):
+                path = _month_path(customer, month)
+                if os.path.exists(path):
+                    old = pd.read_parquet(path)
+                    old = old[~old["day"].isin(part["day"])]
+                    part = pd.concat([old, part], ignore_index=True)
+                part = part.sort_values("day").reset_index(drop=True)
+                tmp = path + ".tmp"
+                part.to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+
+        meta = read_meta(customer)
+        ts = pd.NaT
+        if not df.empty:
+            ts = pd.to_datetime(df["ts"]).max() if "ts" in df.columns else pd.NaT
+            if pd.isna(ts):
+                ts = pd.Timestamp(df["day"].max())
+        if meta.get("ts_watermark"):
+            ts = pd.Timestamp(meta["ts_watermark"]) if pd.isna(ts) else max(ts, pd.Timestamp(meta["ts_watermark"]))
+        if pd.isna(ts):
+            return  # nothing seen yet: no day can be called closed
+
+        last_closed = local_date(ts.to_pydatetime(), tz) - timedelta(days=1)
+        covered = coverage(customer) + [(s, min(e, last_closed)) for s, e in ranges if s <= last_closed]
+        _write_meta(customer, {
+            "ranges": [[str(s), str(e)] for s, e in _merge(covered)],
+            "ts_watermark": ts.isoformat(),
+        })
+
+def invalidate(customer: str = None, month: str = None):
+    """
+    Drop cached data: one month of a customer, a whole customer, or everything.
+    In-memory results (util.result_cache) of the customer are purged as well.
+    """
+    if customer is None:
+        RESULTS.purge()
+    else:
+        RESULTS.purge_customer(customer)
+    with _lock:
+        if customer is None:
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+            return
+        if month is None:
+            shutil.rmtree(_customer_dir(customer), ignore_errors=True)
+            return
+
+        path = _month_path(customer, month)
+        if os.path.exists(path):
+            os.remove(path)
+        meta = read_meta(customer)
+        if meta:
+            first = _day(f"{month}-01")
+            last = (pd.Period(month, freq="M").end_time).date()
+            meta["ranges"] = [[str(s), str(e)] for s, e in _subtract(coverage(customer), first, last)]
+            _write_meta(customer, meta)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the on-disk DGR daily cache.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    inv = sub.add_parser("invalidate", help="Drop cached months (e.g. after SCADA corrections)")
+    inv.add_argument("customer", nargs="?")
+    inv.add_argument("--month", help="YYYY-MM (default: whole customer)")
+    reb = sub.add_parser("rebuild", help="Invalidate and re-download a year")
+    reb.add_argument("customer")
+    reb.add_argument("--year", type=int, default=date.today().year)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "invalidate":
+        invalidate(args.customer, args.month)
+        print(f"Invalidated {args.customer or 'all customers'}{' ' + args.month if args.month else ''}")
+    else:
+        from util.data_loader import load_period
+        invalidate(args.customer)
+        end = min(date.today(), date(args.year, 12, 31))
+        df = load_period(args.customer, date(args.year, 1, 1), end, daily=True)
+        print(f"Rebuilt {args.customer} {args.year}: {len(df)} day(s) cached")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# util/downsample.py
+# Shape-preserving downsampling of time series to a fixed point budget, so
+# intraday charts send a few hundred points per series instead of every sample.
+#   lttb    Largest-Triangle-Three-Buckets: keeps visually significant points
+#   minmax  min and max of each bucket: keeps every spike / dip
+import numpy as np
+import pandas as pd
+
+METHODS = ("lttb", "minmax")
+
+def lttb(x, y, n: int) -> np.ndarray:
+    """Indices of the n points LTTB keeps (all indices if n >= len(x) or n < 3)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    m = len(x)
+    if n >= m or n < 3:
+        return np.arange(m)
+
+    # first and last points are fixed; the m-2 points between form n-2 buckets
+    edges = np.linspace(1, m - 1, n - 1).astype(np.int64)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, m - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i < n - 3:
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[m - 1], y[m - 1]
+        # twice the triangle area (selected point a, candidate, next bucket's centroid)
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def minmax(y, n: int) -> np.ndarray:
+    """Sorted indices of each bucket's min and max (plus both ends), about n points."""
+    y = np.asarray(y, dtype=np.float64)
+    m = len(y)
+    if n >= m:
+        return np.arange(m)
+    nb = max(n // 2, 1)
+    bucket = np.arange(m) * nb // m
+    order = np.lexsort((y, bucket))          # by bucket, then value
+    starts = np.searchsorted(bucket[order], np.arange(nb))
+    ends = np.r_[starts[1:], m]
+    return np.unique(np.r_[order[starts], order[ends - 1], 0, m - 1])
+
+def downsample_series(ts: pd.Series, values: pd.Series, points: int, method: str = "lttb"):
+    """(ts, values) reduced to about `points` samples; NaNs are dropped first."""
+    ok = values.notna().to_numpy()
+    ts, values = ts[ok], values[ok]
+    if method == "lttb":
+        idx = lttb(ts.to_numpy().astype("datetime64[ms]").astype(np.int64), values.to_numpy(), points)
+    elif method == "minmax":
+        idx = minmax(values.to_numpy(), points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return ts.iloc[idx], values.iloc[idx]
+
+def downsample_frame(df: pd.DataFrame, value_cols, points: int = 500, method: str = "lttb",
+                     ts_col: str = "ts") -> pd.DataFrame:
+    """
+    Long frame (ts, series, value) with every column of `value_cols` downsampled
+    independently to about `points` samples, ready for st.line_chart(color="series").
+    """
+    df = df.sort_values(ts_col)
+    parts = []
+    for col in value_cols:
+        ts, vals = downsample_series(df[ts_col], df[col], points, method)
+        parts.append(pd.DataFrame({"ts": ts.to_numpy(), "series": col, "value": vals.to_numpy()}))
+    if not parts:
+        return pd.DataFrame(columns=["ts", "series", "value"])
+    return pd.concat(parts, ignore_index=True)
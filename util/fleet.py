@@ -0,0 +1,98 @@
+# util/fleet.py
+# Fleet-wide Daily / MTD / YTD / PLF as (plant x day) matrices.
+#
+#   from util.fleet import fleet_matrix
+#   m = fleet_matrix(date(2025, 1, 1), date(2025, 12, 31))
+#   m["plf"].loc["TMD"]            # daily PLF series of one plant
+#
+#   python -m util.fleet --start 2025-01-01 --end 2025-12-31 --metric ytd --csv ytd.csv
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+
+from util.agg import clean_dataframe, get_daily_monthly_yearly_range, fleet_plf
+from util.data_loader import list_customers, load_period
+from util.metrics import timed
+from util.profiles import get_profile, profile_key
+from util.result_cache import RESULTS
+
+METRICS = ("daily", "mtd", "ytd", "plf")
+
+def plant_series(customer: str, start: date, end: date) -> dict:
+    """
+    Plant totals (summed over inverters) per day of [start, end]:
+    {"daily", "mtd", "ytd"} Series, empty when the plant has no data.
+    Loads from Jan 1 of start's year so MTD / YTD are complete.
+    """
+    df = load_period(customer, date(start.year, 1, 1), end, daily=True)
+    if df.empty:
+        return {}
+    df_clean, inverter_cols, irradiation_col = clean_dataframe(df.copy(), customer)
+    if not inverter_cols:
+        return {}
+    res = get_daily_monthly_yearly_range(df_clean, inverter_cols, start, end, irradiation_col, customer)
+    return {k: res[k].sum(axis=1) for k in ("daily", "mtd", "ytd")}
+
+@timed("fleet_matrix")
+def _fleet_matrix(customers: tuple, start: date, end: date, workers: int) -> dict:
+    days = pd.date_range(start, end)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        per_plant = dict(zip(customers, pool.map(lambda c: plant_series(c, start, end), customers)))
+
+    out = {}
+    for k in ("daily", "mtd", "ytd"):
+        out[k] = pd.DataFrame(
+            {c: s[k] for c, s in per_plant.items() if s}, index=days
+        ).T.reindex(list(customers)).fillna(0.0)
+        out[k].index.name = "plant"
+    out["plf"] = fleet_plf(out["daily"])
+    return out
+
+def fleet_matrix(start: date, end: date, customers=None, workers: int = 8) -> dict:
+    """
+    {"daily", "mtd", "ytd", "plf"} -> DataFrame indexed by plant, one column per day
+    of [start, end]. Plants without data are all-zero rows. Cached like load_period().
+    """
+    customers = tuple(customers or list_customers())
+    key = ("fleet", customers, start, end, tuple(profile_key(c) for c in customers))
+    return RESULTS.get_or_compute(key, lambda: _fleet_matrix(customers, start, end, workers), end,
+                                  [get_profile(c)["timezone"] for c in customers])
+
+def rankings(m: dict) -> pd.DataFrame:
+    """One row per plant: range generation, last YTD, mean / last PLF; sorted by mean PLF."""
+    last = m["daily"].columns[-1]
+    out = pd.DataFrame({
+        "Generation in range (kWh)": m["daily"].sum(axis=1),
+        "YTD (kWh)": m["ytd"][last],
+        "Mean PLF": m["plf"].mean(axis=1),
+        "Last-day PLF": m["plf"][last],
+    })
+    out = out.sort_values("Mean PLF", ascending=False)
+    out.insert(0, "Rank", range(1, len(out) + 1))
+    return out
+
+def monthly_generation(m: dict) -> pd.DataFrame:
+    """(month x plant) generation totals for trend charts."""
+    daily = m["daily"].T
+    out = daily.groupby(daily.index.to_period("M")).sum()
+    out.index = out.index.strftime("%Y-%m")
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet Daily / MTD / YTD / PLF matrix.")
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--metric", choices=METRICS, default="plf")
+    parser.add_argument("--csv", help="Write the (plant x day) matrix here")
+    parser.add_argument("customers", nargs="*", help="Plants (default: all)")
+    args = parser.parse_args(argv)
+
+    m = fleet_matrix(date.fromisoformat(args.start), date.fromisoformat(args.end), args.customers or None)
+    print(rankings(m).to_string())
+    if args.csv:
+        m[args.metric].to_csv(args.csv)
+
+if __name__ == "__main__":
+    main()
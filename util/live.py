@@ -0,0 +1,216 @@
+# util/live.py
+# Live running totals for today, kept in memory per plant and updated
+# incrementally from new SCADA documents:
+#   - change stream on the plant's collection (replica set / Atlas), or
+#   - polling on the indexed `ts_utc` field when change streams are unavailable.
+#
+# Generation counters (*_GenPowerToday, Daily_Generation_INV* ...) are cumulative
+# for the day, so a running total is the day's max per column - the same
+# reduction as the daily rollup. max() is idempotent, so documents seen by both
+# the seeding aggregation and the stream are harmless.
+#
+# Pages read snapshots (no Mongo round-trip) from an st.fragment(run_every=...).
+#
+#   python -m util.live TMD          # print updates as documents arrive
+import argparse
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import pandas as pd
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from util.agg import detect_columns, _generation_values
+from util.data_loader import mongo, _collection_for, _daily_rollup_docs, _sample_fields
+from util.profiles import get_profile
+from util.ts_normalize import TS_FIELD, to_utc, local_date, utc_bounds, has_ts_index
+
+POLL_SECONDS = 10
+IDLE_STOP_SECONDS = 600  # watcher stops when nobody read a snapshot for this long
+
+class LiveTotals:
+    def __init__(self, customer: str, poll_seconds: float = POLL_SECONDS,
+                 idle_stop: float = IDLE_STOP_SECONDS):
+        self.customer = customer
+        self.tz = get_profile(customer)["timezone"]
+        self.poll_seconds = poll_seconds
+        self.idle_stop = idle_stop
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = None            # "change_stream" | "polling"
+        self.error = None
+        self.version = 0
+        self.last_read = time.monotonic()
+        self._reset(self._today())
+
+    # ----------------------------
+    # State
+    # ----------------------------
+    def _today(self) -> date:
+        return local_date(datetime.now(timezone.utc).replace(tzinfo=None), self.tz)
+
+    def _reset(self, day: date):
+        self.day = day
+        self.totals = {}
+        self.rows = 0
+        self.last_ts = None
+
+    def _apply(self, doc: dict, value_cols, rows: int = 1):
+        """Fold one SCADA document (or one pre-reduced rollup doc) into today's totals. Lock held."""
+        ts = doc.get(TS_FIELD) or to_utc(doc.get("timestamp") if "timestamp" in doc else doc.get("ts"), self.tz)
+        if ts is None:
+            return False
+        day = local_date(ts, self.tz)
+        if day > self.day:
+            self._reset(day)
+        elif day < self.day:
+            return False
+        for c in value_cols:
+            v = doc.get(c)
+            if isinstance(v, (int, float)) and (c not in self.totals or v > self.totals[c]):
+                self.totals[c] = float(v)
+        self.rows += rows
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        self.version += 1
+        self._changed.notify_all()
+        return True
+
+    def snapshot(self) -> dict:
+        """Today's running totals in kWh (profile scaling / names applied)."""
+        with self._lock:
+            self.last_read = time.monotonic()
+            totals = dict(self.totals)
+            snap = {"customer": self.customer, "day": str(self.day), "rows": self.rows,
+                    "last_ts": self.last_ts, "version": self.version, "mode": self.mode,
+                    "error": self.error}
+        inverter_cols, irradiation_col, _ = detect_columns(list(totals), self.customer)
+        generation = {}
+        if totals and inverter_cols:
+            row = pd.DataFrame([totals]).reindex(columns=list(dict.fromkeys([*totals, *inverter_cols])))
+            values, names = _generation_values(row, inverter_cols, self.customer)
+            generation = dict(zip(names, values.iloc[0].fillna(0).astype(float)))
+        snap["generation"] = generation
+        snap["total_kwh"] = float(sum(generation.values()))
+        snap["irradiation"] = totals.get(irradiation_col) if irradiation_col else None
+        return snap
+
+    def wait_for_change(self, version: int, timeout: float) -> bool:
+        """Block until version moves past `version` (for CLI / tests)."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version > version, timeout)
+
+    # ----------------------------
+    # Watcher
+    # ----------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"dgr-live-{self.customer}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _idle(self) -> bool:
+        return self._stop.is_set() or time.monotonic() - self.last_read > self.idle_stop
+
+    def _seed(self, coll, value_cols):
+        """Today's max per column in one aggregation (the daily rollup pipeline)."""
+        today = self._today()
+        docs, _, _ = _daily_rollup_docs(coll, self.customer, str(today), str(today))
+        with self._lock:
+            self._reset(today)
+            for d in docs:
+                if d.get("ts") is not None:
+                    self._apply(d, value_cols, rows=d.get("rows", 0))
+
+    def _coll(self):
+        # resolved per use so a reconnect (mongo_pool.reset_client) is picked up
+        return mongo()[_collection_for(self.customer)]
+
+    def _run(self):
+        self.error = None
+        coll = self._coll()
+        inverter_cols, _, irradiation_cols = detect_columns(_sample_fields(coll), self.customer)
+        value_cols = list(dict.fromkeys(inverter_cols + irradiation_cols))
+        try:
+            try:
+                self._watch(coll, value_cols)
+            except OperationFailure as e:
+                # standalone mongod: "The $changeStream stage is only supported on replica sets"
+                self.error = None if e.code == 40573 else repr(e)
+                self._poll(coll, value_cols)
+        except PyMongoError as e:
+            # stream and polling both failed (or the client was retired under the
+            # stream); the next get_live() restarts the watcher on the current client
+            self.error = repr(e)
+
+    def _watch(self, coll, value_cols):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace", "update"]}}}]
+        # open the stream before seeding so nothing between the two is missed
+        with coll.watch(pipeline, full_document="updateLookup") as stream:
+            self.mode = "change_stream"
+            self._seed(coll, value_cols)
+            while not self._idle():
+                change = stream.try_next()
+                if change is None:
+                    time.sleep(0.2)
+                    continue
+                doc = change.get("fullDocument")
+                if doc:
+                    with self._lock:
+                        self._apply(doc, value_cols)
+
+    def _poll(self, coll, value_cols):
+        self.mode = "polling"
+        self._seed(coll, value_cols)
+        while not self._stop.wait(self.poll_seconds) and not self._idle():
+            coll = self._coll()
+            if not has_ts_index(coll):
+                self._seed(coll, value_cols)  # no ts_utc index: re-reduce today server-side
+                continue
+            with self._lock:
+                since = self.last_ts
+            lo, hi = utc_bounds(self._today(), self._today(), self.tz)
+            rng = {"$gt": since} if since and since >= lo else {"$gte": lo}
+            q = {TS_FIELD: {**rng, "$lt": hi}}
+            proj = {"_id": 0, TS_FIELD: 1, **{c: 1 for c in value_cols}}
+            for doc in coll.find(q, proj).sort(TS_FIELD, ASCENDING):
+                with self._lock:
+                    self._apply(doc, value_cols)
+
+_live = {}
+_live_lock = threading.Lock()
+
+def get_live(customer: str) -> LiveTotals:
+    """Process-wide LiveTotals for a plant, (re)started on demand."""
+    with _live_lock:
+        lt = _live.get(customer)
+        if lt is None:
+            lt = _live[customer] = LiveTotals(customer)
+        lt.last_read = time.monotonic()
+        return lt.start()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow today's running totals for a plant.")
+    parser.add_argument("customer")
+    args = parser.parse_args(argv)
+
+    lt = get_live(args.customer)
+    version = -1
+    while True:
+        lt.wait_for_change(version, timeout=30)
+        snap = lt.snapshot()
+        version = snap["version"]
+        print(f"{snap['last_ts']}  [{snap['mode']}]  rows={snap['rows']}  total={snap['total_kwh']:.1f} kWh"
+              f"  irradiation={snap['irradiation']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# util/metrics.py
+# Lightweight, in-process instrumentation for the report pipeline:
+#   - stage timers        with stage("clean_dataframe"): ...   /   @timed("excel_render")
+#   - Mongo commands      CommandMetrics listener (duration, documents returned, reply bytes)
+#   - explain() capture   explain_aggregate(coll, pipeline)
+#   - Prometheus export   write_prometheus(path) for the node exporter textfile collector
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import bson
+from pymongo import monitoring
+
+_lock = threading.Lock()
+_stages = {}       # name -> {"calls", "seconds", "last", "max"}
+_collectors = {}   # prefix -> fn() returning {gauge_name: value}
+_explains = {}     # collection name -> last explain() output
+_events = {}       # name -> count (e.g. truncated loads)
+
+# ----------------------------
+# Stage timers
+# ----------------------------
+def record_stage(name: str, seconds: float):
+    with _lock:
+        s = _stages.setdefault(name, {"calls": 0, "seconds": 0.0, "last": 0.0, "max": 0.0})
+        s["calls"] += 1
+        s["seconds"] += seconds
+        s["last"] = seconds
+        s["max"] = max(s["max"], seconds)
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def stage_stats() -> dict:
+    with _lock:
+        return {k: dict(v) for k, v in _stages.items()}
+
+def count(name: str, n: int = 1):
+    """Bump an event counter (exported as dgr_events_total{event=...})."""
+    with _lock:
+        _events[name] = _events.get(name, 0) + n
+
+def event_counts() -> dict:
+    with _lock:
+        return dict(_events)
+
+# ----------------------------
+# Mongo command listener
+# ----------------------------
+def _documents_in(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    return int(reply.get("n", 0) or 0)
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per command name: calls, failures, seconds, documents returned, reply bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = {}
+
+    def _entry(self, name):
+        return self.commands.setdefault(
+            name, {"calls": 0, "failures": 0, "seconds": 0.0, "documents": 0, "reply_bytes": 0}
+        )
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        try:
+            size = len(bson.encode(event.reply))
+        except Exception:
+            size = 0
+        docs = _documents_in(event.reply)
+        with self._lock:
+            e = self._entry(event.command_name)
+            e["calls"] += 1
+            e["seconds"] += event.duration_micros / 1e6
+            e["documents"] += docs
+            e["reply_bytes"] += size
+
+    def failed(self, event):
+        with self._lock:
+            e = self._entry(event.command_name)
+            e["calls"] += 1
+            e["failures"] += 1
+            e["seconds"] += event.duration_micros / 1e6
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: dict(v) for k, v in self.commands.items()}
+
+    def clear(self):
+        with self._lock:
+            self.commands.clear()
+
+COMMANDS = CommandMetrics()
+
+# ----------------------------
+# explain() capture
+# ----------------------------
+def explain_aggregate(coll, pipeline: list, verbosity: str = "executionStats") -> dict:
+    """Run explain on an aggregation and keep the result for the admin panel."""
+    with stage("mongo_explain"):
+        out = coll.database.command(
+            "explain", {"aggregate": coll.name, "pipeline": pipeline, "cursor": {}},
+            verbosity=verbosity,
+        )
+    with _lock:
+        _explains[coll.name] = out
+    return out
+
+def last_explains() -> dict:
+    with _lock:
+        return dict(_explains)
+
+# ----------------------------
+# Prometheus exposition
+# ----------------------------
+def register_collector(prefix: str, fn):
+    """fn() -> {name: number}; exported as gauges named <prefix>_<name>."""
+    with _lock:
+        _collectors[prefix] = fn
+
+def merge(stages: dict = None, commands: dict = None):
+    """Fold snapshots taken in another process (e.g. batch workers) into this one."""
+    with _lock:
+        for name, v in (stages or {}).items():
+            s = _stages.setdefault(name, {"calls": 0, "seconds": 0.0, "last": 0.0, "max": 0.0})
+            s["calls"] += v["calls"]
+            s["seconds"] += v["seconds"]
+            s["last"] = v["last"]
+            s["max"] = max(s["max"], v["max"])
+    with COMMANDS._lock:
+        for name, v in (commands or {}).items():
+            e = COMMANDS._entry(name)
+            for k in e:
+                e[k] += v.get(k, 0)
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _explains.clear()
+        _events.clear()
+    COMMANDS.clear()
+
+def _metric(lines, name, mtype, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {mtype}")
+    for labels, value in samples:
+        lab = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"{name}{{{lab}}} {value}" if lab else f"{name} {value}")
+
+def render_prometheus() -> str:
+    stages = stage_stats()
+    cmds = COMMANDS.snapshot()
+    lines = []
+    _metric(lines, "dgr_stage_seconds_total", "counter", "Time spent per report pipeline stage.",
+            [({"stage": k}, v["seconds"]) for k, v in stages.items()])
+    _metric(lines, "dgr_stage_calls_total", "counter", "Calls per report pipeline stage.",
+            [({"stage": k}, v["calls"]) for k, v in stages.items()])
+    _metric(lines, "dgr_stage_last_seconds", "gauge", "Duration of the latest call per stage.",
+            [({"stage": k}, v["last"]) for k, v in stages.items()])
+    _metric(lines, "dgr_stage_max_seconds", "gauge", "Slowest call per stage.",
+            [({"stage": k}, v["max"]) for k, v in stages.items()])
+    _metric(lines, "dgr_events_total", "counter", "Notable pipeline events (e.g. truncated loads).",
+            [({"event": k}, v) for k, v in event_counts().items()])
+    _metric(lines, "dgr_mongo_commands_total", "counter", "Mongo commands issued.",
+            [({"command": k}, v["calls"]) for k, v in cmds.items()])
+    _metric(lines, "dgr_mongo_command_failures_total", "counter", "Mongo commands that failed.",
+            [({"command": k}, v["failures"]) for k, v in cmds.items()])
+    _metric(lines, "dgr_mongo_command_seconds_total", "counter", "Server round-trip time per command.",
+            [({"command": k}, v["seconds"]) for k, v in cmds.items()])
+    _metric(lines, "dgr_mongo_documents_returned_total", "counter", "Documents returned in replies.",
+            [({"command": k}, v["documents"]) for k, v in cmds.items()])
+    _metric(lines, "dgr_mongo_reply_bytes_total", "counter", "BSON bytes received in replies.",
+            [({"command": k}, v["reply_bytes"]) for k, v in cmds.items()])
+
+    with _lock:
+        collectors = dict(_collectors)
+    for prefix, fn in collectors.items():
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for k, v in values.items():
+            _metric(lines, f"{prefix}_{k}", "gauge", f"{prefix} {k}.", [({}, v)])
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str):
+    """Atomically write the exposition text (node exporter textfile collector friendly)."""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
@@ -0,0 +1,125 @@
+# util/mongo_pool.py
+# One pooled MongoClient per process, shared by every page, session and loader.
+# Callers resolve handles through get_client() / data_loader.mongo() on each use
+# rather than keeping them: reset_client() swaps in a fresh client and retires
+# the old one only after in-flight operations had time to finish.
+import atexit
+import os
+import threading
+import streamlit as st
+from pymongo import MongoClient, monitoring
+from pymongo.errors import ConnectionFailure, PyMongoError
+from util import metrics
+
+# Put MONGO_URI in .streamlit/secrets.toml (DGR_MONGO_URI env var wins, for CLI / benchmark runs)
+MONGO_URI = os.environ.get("DGR_MONGO_URI") or st.secrets["MONGO_URI"]
+
+# Optional [MONGO_POOL] table in secrets.toml overrides any of these
+POOL_DEFAULTS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 300000,
+    "serverSelectionTimeoutMS": 5000,
+    "connectTimeoutMS": 10000,
+    "socketTimeoutMS": 120000,
+}
+
+class _PoolStats(monitoring.ConnectionPoolListener):
+    """Counts pool events so connection churn is visible (see pool_stats())."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys([
+            "pools_created", "pools_cleared", "pools_closed",
+            "connections_created", "connections_closed",
+            "checkouts", "checkins", "checkout_failures",
+        ], 0)
+
+    def _inc(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def pool_created(self, event): self._inc("pools_created")
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): self._inc("pools_cleared")
+    def pool_closed(self, event): self._inc("pools_closed")
+    def connection_created(self, event): self._inc("connections_created")
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): self._inc("connections_closed")
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): self._inc("checkout_failures")
+    def connection_checked_out(self, event): self._inc("checkouts")
+    def connection_checked_in(self, event): self._inc("checkins")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["open_connections"] = stats["connections_created"] - stats["connections_closed"]
+        stats["in_use"] = stats["checkouts"] - stats["checkins"]
+        return stats
+
+_STATS = _PoolStats()
+_client = None
+_client_lock = threading.Lock()
+
+def _pool_options() -> dict:
+    opts = dict(POOL_DEFAULTS)
+    opts.update(st.secrets.get("MONGO_POOL", {}))
+    return opts
+
+def _new_client() -> MongoClient:
+    return MongoClient(MONGO_URI, appname="dgr-suite", event_listeners=[_STATS, metrics.COMMANDS], **_pool_options())
+
+def _retire_seconds() -> float:
+    # long enough for any operation still running on the old client (socket timeout + margin)
+    return _pool_options().get("socketTimeoutMS", 120000) / 1000 + 30
+
+def get_client() -> MongoClient:
+    """The process-wide pooled client (created lazily on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _new_client()
+    return _client
+
+def reset_client():
+    """
+    Swap in a fresh client; later get_client() calls use the new pool. The old
+    client is not closed under its users: it is closed after _retire_seconds().
+    """
+    global _client
+    with _client_lock:
+        old, _client = _client, _new_client()
+    if old is not None:
+        timer = threading.Timer(_retire_seconds(), old.close)
+        timer.daemon = True
+        timer.start()
+
+@atexit.register
+def _close():
+    if _client is not None:
+        _client.close()
+
+def ping(reconnect: bool = True) -> bool:
+    """Health check; on a connection failure optionally swap in a fresh client and retry once."""
+    try:
+        get_client().admin.command("ping")
+        return True
+    except ConnectionFailure:
+        if not reconnect:
+            return False
+    except PyMongoError:
+        return False  # reachable but refusing (auth, ...): a new pool would not help
+    reset_client()
+    try:
+        get_client().admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+def pool_stats() -> dict:
+    """Connection pool counters since process start."""
+    return _STATS.snapshot()
+
+metrics.register_collector("dgr_mongo_pool", pool_stats)
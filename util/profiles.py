@@ -0,0 +1,109 @@
+# util/profiles.py
+# Declarative plant profiles: which columns hold generation / irradiation, how to
+# scale them, inverter count and PLF base. Adding a plant = adding an entry here
+# (or in the JSON file pointed to by DGR_PLANT_PROFILES).
+import json
+import os
+from functools import lru_cache
+
+TMD_INVERTER_COLS = [
+    "T1_CIS01_INV1_1_GenPowerToday","T1_CIS01_INV1_2_GenPowerToday","T1_CIS01_INV1_3_GenPowerToday",
+    "T1_CIS01_INV1_4_GenPowerToday","T1_CIS02_INV1_1_GenPowerToday","T1_CIS02_INV1_2_GenPowerToday",
+    "T1_CIS02_INV1_3_GenPowerToday","T2_INV1_GenPowerToday","T2_INV2_GenPowerToday"
+]
+
+# Fields (all optional, missing ones come from DEFAULT_PROFILE):
+#   generation_columns   explicit generation columns (only the ones present are used)
+#   keep_missing         use generation_columns even if absent from the data
+#   generation_prefixes  / generation_contains   pattern match when no explicit list
+#   layout               "inverters" (one row per column) | "single" (first column = plant meter)
+#   scale                multiplier to kWh (missing values become 0 when scaled)
+#   value_label          index label of the generation Series (default: column name)
+#   irradiation_contains pattern for the irradiation column (last match wins)
+#   inverters, plf_base  PLF denominator = 24 * plf_base * inverters
+#   timezone             IANA zone used to read legacy string timestamps and split days
+DEFAULT_PROFILE = {
+    "generation_columns": None,
+    "keep_missing": False,
+    "generation_prefixes": ["Daily_Generation", "Daily_Generation_INV", "T1_CIS", "T2_INV"],
+    "generation_contains": ["Meter_Generation"],
+    "layout": "inverters",
+    "scale": 1,
+    "value_label": None,
+    "irradiation_contains": ["Irradiation"],
+    "inverters": 0,
+    "plf_base": 0,
+    "timezone": os.environ.get("DGR_PLANT_TZ", "UTC"),
+}
+
+_METER = {"generation_prefixes": [], "generation_contains": ["Meter_Generation"], "layout": "single"}
+
+PLANT_PROFILES = {
+    "Imagica":   {"inverters": 18, "plf_base": 3.06},
+    "BEL2":      dict(_METER, inverters=1, plf_base=20),
+    "BEL1":      dict(_METER, inverters=1, plf_base=10.00),
+    "Caspro":    {"inverters": 11, "plf_base": 3.05},
+    "Dunung":    {"inverters": 13, "plf_base": 3.08},
+    "Kasturi":   {"inverters": 23, "plf_base": 3.00},
+    "Mauryaa":   {"inverters": 13, "plf_base": 3.08},
+    "Paranjape": {"inverters": 19, "plf_base": 2.11},
+    "Vinathi_3": {"inverters": 25, "plf_base": 3.00},
+    "Vinathi_4": {"inverters": 15, "plf_base": 3.07},
+    "TMD":       {"generation_columns": TMD_INVERTER_COLS, "inverters": 9, "plf_base": 10},
+    "PGCIL": {
+        "generation_columns": ["Total_Daily_Generation"], "keep_missing": True,
+        "layout": "single", "scale": 1000, "value_label": "Total_Daily_Generation_kWh",
+        "inverters": 32, "plf_base": 26.56,
+    },
+    "Vinathi_2": {"inverters": 2, "plf_base": 25.00},
+}
+
+def load_profiles(path: str = None):
+    """
+    Merge plant profiles from a JSON file ({"Plant": {...fields...}}) into the
+    registry. Defaults to $DGR_PLANT_PROFILES; no-op if unset / missing.
+    """
+    path = path or os.environ.get("DGR_PLANT_PROFILES")
+    if not path or not os.path.exists(path):
+        return
+    with open(path) as f:
+        overrides = json.load(f)
+    for customer, fields in overrides.items():
+        PLANT_PROFILES[customer] = dict(PLANT_PROFILES.get(customer, {}), **fields)
+    resolve_columns.cache_clear()
+
+def get_profile(customer: str) -> dict:
+    """Full profile for a customer (unknown customers get DEFAULT_PROFILE)."""
+    return dict(DEFAULT_PROFILE, **PLANT_PROFILES.get(customer, {}))
+
+def profile_key(customer: str) -> tuple:
+    """Hashable signature of a plant's profile, for cache keys of results derived from it."""
+    return tuple(sorted((k, repr(v)) for k, v in get_profile(customer).items()))
+
+@lru_cache(maxsize=256)
+def resolve_columns(customer: str, columns: tuple):
+    """
+    Compiled column selection for one (customer, column-set) schema:
+    (generation_cols, irradiation_col, irradiation_cols). Cached, so the
+    pattern scan runs once per schema instead of once per rerun.
+    """
+    p = get_profile(customer)
+    if p["generation_columns"] is not None:
+        if p["keep_missing"]:
+            generation_cols = list(p["generation_columns"])
+        else:
+            present = set(columns)
+            generation_cols = [c for c in p["generation_columns"] if c in present]
+    else:
+        prefixes = tuple(p["generation_prefixes"])
+        contains = p["generation_contains"]
+        generation_cols = [
+            c for c in columns
+            if (prefixes and c.startswith(prefixes)) or any(s in c for s in contains)
+        ]
+
+    irradiation_cols = [c for c in columns if any(s in c for s in p["irradiation_contains"])]
+    irradiation_col = irradiation_cols[-1] if irradiation_cols else None
+    return generation_cols, irradiation_col, irradiation_cols
+
+load_profiles()
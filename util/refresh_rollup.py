@@ -0,0 +1,21 @@
+# util/refresh_rollup.py
+# Incremental refresher for the dgr_daily_rollup collection.
+#   python -m util.refresh_rollup                 # all customers
+#   python -m util.refresh_rollup Imagica Caspro  # subset
+import argparse
+from datetime import datetime
+from util.data_loader import list_customers, refresh_daily_rollup
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the materialized DGR daily rollup.")
+    parser.add_argument("customers", nargs="*", help="Customers to refresh (default: all)")
+    parser.add_argument("--since", help="First day to roll up when no watermark exists (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+    for customer in args.customers or list_customers():
+        written = refresh_daily_rollup(customer, since=since)
+        print(f"{customer}: {written} day(s) refreshed")
+
+if __name__ == "__main__":
+    main()
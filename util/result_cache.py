@@ -0,0 +1,134 @@
+# util/result_cache.py
+# Memory-bounded, process-wide LRU cache for loaded frames and report computations.
+# Results for closed days (before the plant-local today minus a grace period, so
+# late SCADA rows and the nightly rollup refresh land first) live for closed_ttl,
+# recent windows for a short TTL. Data changes made in this process purge a
+# customer's entries explicitly (purge_customer); closed_ttl bounds how long another
+# process (CLI, scheduler) takes to see them. Cached objects are shared: treat them
+# as read-only.
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import pandas as pd
+
+from util.ts_normalize import zone
+
+def sizeof(value) -> int:
+    """Approximate memory footprint of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    def __init__(self, max_bytes: int = 256 * 2**20, today_ttl: float = 60.0, grace_days: int = 1,
+                 closed_ttl: float = 3600.0):
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.grace_days = grace_days
+        self.closed_ttl = closed_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size, expires_at | None)
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def configure(self, max_bytes: int = None, today_ttl: float = None, grace_days: int = None,
+                  closed_ttl: float = None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if today_ttl is not None:
+                self.today_ttl = today_ttl
+            if grace_days is not None:
+                self.grace_days = grace_days
+            if closed_ttl is not None:
+                self.closed_ttl = closed_ttl
+            self._shrink()
+
+    def closed_before(self, tz="UTC") -> date:
+        """First day that is not closed yet: plant-local today minus the grace days.
+        tz may be a list of zones (fleet results): the earliest local day wins."""
+        zones = [tz] if isinstance(tz, str) else list(tz) or ["UTC"]
+        today = min(datetime.now(zone(z)).date() for z in zones)
+        return today - timedelta(days=self.grace_days)
+
+    def ttl_for(self, last_day: date, tz="UTC"):
+        """closed_ttl for windows that end on a closed day, else the short TTL."""
+        return self.closed_ttl if last_day < self.closed_before(tz) else self.today_ttl
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return False, None
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._drop(key)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return True, value
+
+    def put(self, key, value, ttl: float = None):
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return  # would evict everything else; don't cache
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            self._shrink()
+
+    def get_or_compute(self, key, fn, last_day: date, tz="UTC"):
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = fn()
+        self.put(key, value, self.ttl_for(last_day, tz))
+        return value
+
+    def purge(self, predicate=None) -> int:
+        """Drop all entries (or those whose key matches predicate). Returns count dropped."""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for k in keys:
+                self._drop(k)
+            return len(keys)
+
+    def purge_customer(self, customer: str) -> int:
+        """Drop every entry computed from a customer's data (keys are (kind, customer | customers, ...))."""
+        def mentions(key):
+            who = key[1] if isinstance(key, tuple) and len(key) > 1 else None
+            return who == customer or (isinstance(who, tuple) and customer in who)
+        return self.purge(mentions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._bytes,
+                        max_bytes=self.max_bytes)
+
+    # -- internals (lock held) --
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _shrink(self):
+        while self._bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.counters["evictions"] += 1
+
+RESULTS = ResultCache()
@@ -0,0 +1,73 @@
+# util/singleflight.py
+# Request coalescing: while a fetch for a key is in flight, concurrent callers
+# asking for the same key wait for that result instead of issuing their own query.
+# The leader's exception is re-raised in every waiting caller.
+import threading
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, timeout: float = 120.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self.counters = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def configure(self, timeout: float = None):
+        if timeout is not None:
+            self.timeout = timeout
+
+    def do(self, key, fn, timeout: float = None):
+        """
+        Run fn() once per key at a time. Followers wait up to `timeout` seconds
+        (default self.timeout) and raise TimeoutError if the leader is still busy.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["leaders"] += 1
+            else:
+                call.waiters += 1
+                self.counters["coalesced"] += 1
+
+        if leader:
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+                with self._lock:
+                    self.counters["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.value
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise TimeoutError(f"timed out waiting for in-flight load {key!r}")
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def in_flight(self) -> dict:
+        """key -> number of callers waiting on it."""
+        with self._lock:
+            return {k: c.waiters for k, c in self._calls.items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+FLIGHTS = SingleFlight()
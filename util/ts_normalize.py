@@ -0,0 +1,138 @@
+# util/ts_normalize.py
+# Normalized, indexed timestamp for SCADA collections.
+#
+# Raw documents carry `timestamp` either as a BSON date or as a legacy
+# 'YYYY-MM-DD HH:MM' string (plant local time). `ts_utc` stores the same instant
+# as a BSON date so the loader can start every query with an indexed range $match.
+#
+#   python -m util.ts_normalize                 # backfill + index all customers' collections
+#   python -m util.ts_normalize Imagica --dry-run
+#
+# Ingest side: pass every new document through normalize_doc() (or use
+# insert_normalized()) so it is indexed from the start.
+import argparse
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from pymongo import ASCENDING
+
+TS_FIELD = "ts_utc"
+LEGACY_FORMAT = "%Y-%m-%d %H:%M"
+LEGACY_REGEX = "^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}$"
+
+def zone(tz: str):
+    # datetime.timezone.utc avoids needing tzdata for the default on Windows
+    return timezone.utc if tz in (None, "", "UTC") else ZoneInfo(tz)
+
+def ts_expression(tz: str = "UTC") -> dict:
+    """Aggregation expression turning `timestamp` into a BSON date (None if unparseable)."""
+    return {
+        "$switch": {
+            "branches": [
+                {  # Proper ISODate stored as BSON date
+                    "case": {"$eq": [{"$type": "$timestamp"}, "date"]},
+                    "then": "$timestamp"
+                },
+                {  # 'YYYY-MM-DD HH:MM' string format, in plant local time
+                    "case": {
+                        "$and": [
+                            {"$eq": [{"$type": "$timestamp"}, "string"]},
+                            {"$regexMatch": {"input": "$timestamp", "regex": LEGACY_REGEX}}
+                        ]
+                    },
+                    "then": {
+                        "$dateFromString": {
+                            "dateString": "$timestamp",
+                            "format": "%Y-%m-%d %H:%M",
+                            "timezone": tz or "UTC"
+                        }
+                    }
+                },
+            ],
+            "default": None
+        }
+    }
+
+def to_utc(value, tz: str = "UTC"):
+    """Python twin of ts_expression(): naive-UTC datetime, or None."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, str):
+        try:
+            local = datetime.strptime(value, LEGACY_FORMAT)
+        except ValueError:
+            return None
+        return local.replace(tzinfo=zone(tz)).astimezone(timezone.utc).replace(tzinfo=None)
+    return None
+
+def normalize_doc(doc: dict, tz: str = "UTC") -> dict:
+    """Ingest hook: set `ts_utc` on a raw SCADA document (in place) and return it."""
+    if doc.get(TS_FIELD) is None:
+        ts = to_utc(doc.get("timestamp"), tz)
+        if ts is not None:
+            doc[TS_FIELD] = ts
+    return doc
+
+def insert_normalized(coll, docs, tz: str = "UTC"):
+    """insert_many with the ingest hook applied."""
+    return coll.insert_many([normalize_doc(d, tz) for d in docs], ordered=False)
+
+def utc_bounds(start_day: date, end_day: date, tz: str = "UTC"):
+    """[local midnight of start_day, local midnight after end_day) as naive-UTC datetimes."""
+    z = zone(tz)
+    lo = datetime.combine(start_day, time.min, z).astimezone(timezone.utc).replace(tzinfo=None)
+    hi = datetime.combine(end_day + timedelta(days=1), time.min, z).astimezone(timezone.utc).replace(tzinfo=None)
+    return lo, hi
+
+def local_date(ts: datetime, tz: str = "UTC") -> date:
+    """Plant-local calendar day of a naive-UTC datetime."""
+    return ts.replace(tzinfo=timezone.utc).astimezone(zone(tz)).date()
+
+_indexed = set()  # (db, collection) known to have the ts_utc index
+
+def has_ts_index(coll) -> bool:
+    """True once the collection has been migrated (index on ts_utc). Positive results are cached."""
+    key = (coll.database.name, coll.name)
+    if key in _indexed:
+        return True
+    try:
+        infos = coll.index_information().values()
+    except Exception:
+        return False
+    if any(info.get("key", [])[:1] == [(TS_FIELD, ASCENDING)] for info in infos):
+        _indexed.add(key)
+        return True
+    return False
+
+def backfill(coll, tz: str = "UTC", dry_run: bool = False) -> int:
+    """
+    Set `ts_utc` on every document missing it (server-side pipeline update,
+    MongoDB >= 4.2) and create the index. Returns the number of documents updated.
+    """
+    missing = {TS_FIELD: {"$exists": False}, "timestamp": {"$exists": True, "$ne": None}}
+    if dry_run:
+        return coll.count_documents(missing)
+    res = coll.update_many(missing, [{"$set": {TS_FIELD: ts_expression(tz)}}])
+    coll.create_index([(TS_FIELD, ASCENDING)], name=f"{TS_FIELD}_1")
+    return res.modified_count
+
+def main(argv=None):
+    from util.data_loader import list_customers, mongo, _collection_for
+    from util.profiles import get_profile
+
+    parser = argparse.ArgumentParser(description="Backfill + index the normalized ts_utc field.")
+    parser.add_argument("customers", nargs="*", help="Customers to migrate (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents to update")
+    args = parser.parse_args(argv)
+
+    db = mongo()
+    for customer in args.customers or list_customers():
+        coll_name = _collection_for(customer)
+        tz = get_profile(customer)["timezone"]
+        n = backfill(db[coll_name], tz, dry_run=args.dry_run)
+        verb = "would update" if args.dry_run else "updated"
+        print(f"{customer} ({coll_name}, {tz}): {verb} {n} document(s)")
+
+if __name__ == "__main__":
+    main()